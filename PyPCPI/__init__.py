@@ -1,3 +1,6 @@
+import cache
+import pruning
+import forwardModelIO
 import layeredMedia
 import voxelizedMedia
 import signalPostProcessing
@@ -0,0 +1,337 @@
+""" FILE: cache.py
+
+Module implementing a content-addressed on-disk cache for the stages of
+the PyPCPI pipeline, e.g. the polar convolution and the Poisson integral
+solvers, and readers such as layeredMedia.dataIO.mcmlio.fetchRawData. 
+(MCML output files can in addition be kept in sidecar files by the reader,
+see layeredMedia.dataIO.mcmlio.fetchMcoData.)
+
+A result is stored under a key obtained by hashing the name and version
+of the function it stems from and the source, or compiled code, of the
+modules it depends on, together with the content of all array arguments,
+the values of all other arguments and, for readers, the content of the
+files read. Results consisting of a single numpy array are stored
+as .npy file, (nested) tuples of numpy arrays as .npz file. The total size
+of the cache directory is bounded; if it is exceeded, the least recently
+used results are evicted.
+
+The cache is disabled unless a cache directory is set, either by calling
+enable or by the environment variable PYPCPI_CACHE_DIR (the size limit in
+bytes can be set by PYPCPI_CACHE_SIZE).
+
+Example:
+    import PyPCPI
+    PyPCPI.cache.enable('./pcpiCache', maxBytes=2**30)
+    Wrz = PyPCPI.layeredMedia.polarConvolution.convolveROI(r, z, Arz, fr)
+
+"""
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import os
+import sys
+import inspect
+import hashlib
+import tempfile
+import functools
+import numpy as np
+
+# VERSION OF KEY DERIVATION AND STORAGE FORMAT
+_FORMAT = 2
+# DEFAULT BOUND ON THE TOTAL SIZE OF THE CACHE DIRECTORY [BYTES]
+MAX_BYTES = 2**30
+
+_cacheDir = os.environ.get('PYPCPI_CACHE_DIR') or None
+_maxBytes = int(os.environ.get('PYPCPI_CACHE_SIZE', MAX_BYTES))
+
+
+class _Uncacheable(Exception):
+        """Raised for arguments or results that cannot be cached."""
+        pass
+
+
+def enable(cacheDir, maxBytes=MAX_BYTES):
+        """Enable caching.
+
+        Args:
+            cacheDir (str): directory holding the cached results, created if
+                it does not exist.
+            maxBytes (int): bound on the total size of the cached results
+                (default: maxBytes=MAX_BYTES).
+        """
+        global _cacheDir, _maxBytes
+        if not os.path.isdir(cacheDir):
+            os.makedirs(cacheDir)
+        _cacheDir, _maxBytes = cacheDir, int(maxBytes)
+        _evict()
+
+
+def disable():
+        """Disable caching, cached results are kept on disk."""
+        global _cacheDir
+        _cacheDir = None
+
+
+def clear():
+        """Remove all cached results from the cache directory."""
+        for fName, size, mtime in _entries():
+            os.remove(fName)
+
+
+def _update(h, obj):
+        """Feed type and content of obj to hash object h."""
+        if isinstance(obj, np.ndarray) or isinstance(obj, np.generic):
+            a = np.ascontiguousarray(obj)
+            if a.dtype.hasobject:
+                raise _Uncacheable('object array')
+            h.update('a%s%r' % (a.dtype.str, a.shape))
+            h.update(a.view(np.uint8).ravel().data if a.size else '')
+        elif isinstance(obj, (tuple, list)):
+            h.update('%s%d(' % (type(obj).__name__, len(obj)))
+            for item in obj:
+                _update(h, item)
+            h.update(')')
+        elif isinstance(obj, dict):
+            h.update('dict%d(' % len(obj))
+            for key in sorted(obj):
+                _update(h, key)
+                _update(h, obj[key])
+            h.update(')')
+        elif obj is None or isinstance(obj, (bool, int, long, float, complex,
+                                             str, unicode)):
+            h.update('%s%r' % (type(obj).__name__, obj))
+        elif hasattr(obj, 'cacheKey'):
+            h.update(type(obj).__name__)
+            _update(h, obj.cacheKey())
+        else:
+            raise _Uncacheable(type(obj).__name__)
+
+
+def _updateFile(h, fName):
+        """Feed content of file fName to hash object h."""
+        h.update('file(')
+        with open(fName, 'rb') as f:
+            for chunk in iter(lambda: f.read(2**20), ''):
+                h.update(chunk)
+        h.update(')')
+
+
+def _moduleDigest(module):
+        """Digest of the source, or compiled code, of a module."""
+        fName = getattr(module, '__file__', None)
+        if fName is None:
+            return '-'
+        if fName[-4:] in ('.pyc', '.pyo') and os.path.isfile(fName[:-1]):
+            fName = fName[:-1]
+        h = hashlib.sha1()
+        try:
+            _updateFile(h, fName)
+        except (IOError, OSError):
+            return '-'
+        return h.hexdigest()[:16]
+
+
+def _boundArgs(func, spec, args, kwargs):
+        """Positional and keyword arguments of a call, normalized such that
+        equivalent calls, e.g. f(x, a=2.) and f(x, 2.), coincide."""
+        callArgs = inspect.getcallargs(func, *args, **kwargs)
+        # TUPLE PARAMETERS ARE BOUND ELEMENTWISE
+        bound = lambda name: (tuple(bound(n) for n in name)
+                              if isinstance(name, list) else callArgs[name])
+        args = tuple(bound(name) for name in spec.args)
+        if spec.varargs is not None:
+            args += callArgs[spec.varargs]
+        return args, (callArgs[spec.keywords] if spec.keywords else {})
+
+
+def digest(tag, args, kwargs={}, fileArgs=()):
+        """Key of a function call.
+
+        Args:
+            tag (str): identifier of the function and its version.
+            args (tuple): positional arguments.
+            kwargs (dict): keyword arguments (default: kwargs={}).
+            fileArgs (tuple, ints): positions of arguments naming files
+                whose content enters the key (default: fileArgs=()).
+
+        Returns:
+            key (str): hexadecimal SHA-1 digest.
+
+        Notes:
+            Objects providing a method cacheKey enter the key by their type
+            name and the value returned by this method. Raises _Uncacheable
+            if an argument is neither such an object, nor a numpy array, nor
+            a plain Python scalar or string, nor a tuple, list or dict of
+            such.
+        """
+        h = hashlib.sha1('PyPCPI%d:%s' % (_FORMAT, tag))
+        for pos, arg in enumerate(args):
+            if pos in fileArgs:
+                _updateFile(h, arg)
+            else:
+                _update(h, arg)
+        _update(h, kwargs)
+        return h.hexdigest()
+
+
+def _entries():
+        """Cached results as list of (fileName, size, mtime) tuples."""
+        entries = []
+        if _cacheDir is None or not os.path.isdir(_cacheDir):
+            return entries
+        for name in os.listdir(_cacheDir):
+            if name.endswith('.npy') or name.endswith('.npz'):
+                fName = os.path.join(_cacheDir, name)
+                try:
+                    st = os.stat(fName)
+                except OSError:
+                    continue
+                entries.append((fName, st.st_size, st.st_mtime))
+        return entries
+
+
+def _evict():
+        """Remove least recently used results until the size bound holds."""
+        entries = sorted(_entries(), key=lambda e: e[2])
+        total = sum(size for fName, size, mtime in entries)
+        for fName, size, mtime in entries:
+            if total <= _maxBytes:
+                break
+            try:
+                os.remove(fName)
+            except OSError:
+                pass
+            total -= size
+
+
+def _load(key):
+        """Cached result for key, None if there is none."""
+        for ext in ['.npy', '.npz']:
+            fName = os.path.join(_cacheDir, key + ext)
+            try:
+                if ext == '.npy':
+                    res = np.load(fName)
+                else:
+                    with np.load(fName) as f:
+                        res = _unflatten(dict((tuple(int(i) for i in 
+                                name.split('_')[1:]), f[name]) for name in f.files))
+            except (IOError, OSError, ValueError):
+                continue
+            # MARK AS RECENTLY USED
+            try:
+                os.utime(fName, None)
+            except OSError:
+                pass
+            return res
+        return None
+
+
+def _flatten(res, path=()):
+        """Arrays of (nested) tuple of arrays res, keyed by their index path."""
+        if isinstance(res, np.ndarray) and not res.dtype.hasobject:
+            return {path: res}
+        if not isinstance(res, tuple) or len(res) == 0:
+            raise _Uncacheable(type(res).__name__)
+        arrays = {}
+        for i, item in enumerate(res):
+            arrays.update(_flatten(item, path + (i,)))
+        return arrays
+
+
+def _unflatten(arrays):
+        """Inverse of _flatten."""
+        if () in arrays:
+            return arrays[()]
+        n = 1 + max(path[0] for path in arrays)
+        return tuple(_unflatten(dict((path[1:], a) for path, a in 
+                                     arrays.items() if path[0] == i)) 
+                     for i in range(n))
+
+
+def _store(key, res):
+        """Store result under key, atomically replacing a previous one."""
+        arrays = _flatten(res)
+        if () in arrays:
+            ext, save = '.npy', lambda f: np.save(f, res)
+        else:
+            kwds = dict(('arr_' + '_'.join(str(i) for i in path), a) 
+                        for path, a in arrays.items())
+            ext, save = '.npz', lambda f: np.savez(f, **kwds)
+        fd, tmpName = tempfile.mkstemp(suffix='.tmp', dir=_cacheDir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                save(f)
+            os.rename(tmpName, os.path.join(_cacheDir, key + ext))
+        except Exception:
+            os.remove(tmpName)
+            raise
+        _evict()
+
+
+def memoize(version=1, fileArgs=(), depends=()):
+        """Decorator caching the results of a pipeline stage on disk.
+
+        Args:
+            version (int): version of the decorated function; increase it
+                whenever the results of the function change without a
+                change of the modules it is derived from (default:
+                version=1).
+            fileArgs (tuple, ints): positions of arguments naming files
+                whose content enters the key, e.g. for readers (default:
+                fileArgs=()).
+            depends (tuple, modules): modules, besides that of the
+                decorated function, whose results enter those of the
+                decorated function, e.g. compiled solver kernels (default:
+                depends=()).
+
+        Returns:
+            decorator (function): decorator for functions returning a numpy
+                array or a (nested) tuple of numpy arrays.
+
+        Notes:
+            The version enters the key together with the source of the
+            module of the decorated function and the source, or compiled
+            code, of the modules it depends on. Hence, editing a solver or
+            rebuilding a kernel invalidates the cached results. Arguments 
+            are bound to the parameters of the decorated function before 
+            hashing, so that passing an argument by position or by keyword,
+            or omitting an argument with default value, yield the same key.
+
+            If the cache is disabled, or if an argument (e.g. a generator)
+            or the result cannot be cached, the decorated function is called
+            as is. Results other than numpy arrays and (nested) tuples of
+            such, e.g. the statistics returned along with the pruned source
+            by pruneSource, cannot be cached. Cached results are returned as
+            fresh arrays.
+        """
+        def decorator(func):
+            spec = inspect.getargspec(func)
+            modules = [sys.modules.get(func.__module__)] + list(depends)
+            tag = '%s.%s:%s:%s' % (func.__module__, func.__name__, version,
+                                   ','.join(_moduleDigest(m) for m in modules))
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if _cacheDir is None:
+                    return func(*args, **kwargs)
+                try:
+                    key = digest(tag, *_boundArgs(func, spec, args, kwargs),
+                                 fileArgs=fileArgs)
+                except (_Uncacheable, TypeError, ValueError):
+                    # INVALID CALLS RAISE THEIR ERROR IN THE FUNCTION ITSELF
+                    return func(*args, **kwargs)
+                res = _load(key)
+                if res is None:
+                    res = func(*args, **kwargs)
+                    try:
+                        _store(key, res)
+                    except (_Uncacheable, IOError, OSError):
+                        pass
+                return res
+            return wrapper
+        return decorator
+
+# EOF: cache.py
@@ -0,0 +1,34 @@
+""" FILE: forwardModelIO.py
+
+Module implementing the storage of sparse forward model matrices in .npz
+files, shared by the forward models for layered and voxelized media, see
+layeredMedia.poissonIntegralSolver.forwardModel and
+voxelizedMedia.poissonIntegralSolver.forwardModel.
+
+"""
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import numpy as np
+import scipy.sparse
+
+
+def writeForwardModel(tau,A,fName='forwardModel.npz'):
+        """Save forward model matrix to compressed .npz file."""
+        A = A.tocsr()
+        np.savez_compressed(fName, tau=tau, data=A.data, indices=A.indices,
+                            indptr=A.indptr, shape=A.shape)
+
+
+def readForwardModel(fName):
+        """Load forward model matrix from .npz file."""
+        npzDict = np.load(fName)
+        A = scipy.sparse.csr_matrix(
+                (npzDict['data'], npzDict['indices'], npzDict['indptr']),
+                shape=tuple(npzDict['shape']))
+        return npzDict['tau'], A
+
+# EOF: forwardModelIO.py
@@ -1,3 +1,4 @@
 import dataIO
 import polarConvolution
 import poissonIntegralSolver
+import batchConvolution
@@ -0,0 +1,211 @@
+""" FILE: batchConvolution.py
+
+Module implementing a batch driver that reads many MCML output files,
+convolves the material response to an infinitely narrow photon beam with a
+given irradiation source profile, and writes the resulting regions of
+interest (ROIs), using a pool of worker processes.
+
+Example:
+    import glob
+    import PyPCPI.layeredMedia as lm
+    isp = lm.polarConvolution.isp
+    lm.batchConvolution.convolveMcoFiles(sorted(glob.glob('./mco/*.mco')),
+                        './ROI', isp.GaussianProfile(0.,0.15), nProc=4)
+
+"""
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import os
+import time
+import hashlib
+import tempfile
+import collections
+import multiprocessing
+import numpy as np
+from dataIO import mcmlio, npz
+from polarConvolution import convolveROI, HankelPlan
+try:
+    from PyPCPI.cache import digest
+except ImportError:
+    # CACHE LAYER UNAVAILABLE OUTSIDE OF THE PyPCPI PACKAGE
+    digest = lambda tag, args: hashlib.sha1(tag + repr(args)).hexdigest()
+
+# HANKEL TRANSFORM PLAN OF THE LAST RADIAL GRID SEEN BY THIS PROCESS
+_plan = [None]
+
+
+def outFileName(inFileName, outDir, suffix='_Wrz.npz'):
+        """Name of ROI file written for MCML output file inFileName."""
+        base = os.path.splitext(os.path.basename(inFileName))[0]
+        return os.path.join(outDir, base + suffix)
+
+
+def parameterDigest(fr, P):
+        """Digest of the convolution parameters stored in the output files.
+
+        Profile objects enter by their cache key, profiles given as
+        functions by their module and name, see convolveMcoFiles.
+        """
+        key = lambda f: (('function', f.__module__, f.__name__)
+                         if callable(f) and not hasattr(f, 'hankel') else f)
+        fr = map(key, fr) if isinstance(fr, list) else key(fr)
+        return digest('batchConvolution.convolveMcoFiles', (fr, P))
+
+
+def isUpToDate(inFileName, outFileName, pDigest=None):
+        """Check whether output file exists, is not older than input file
+        and, unless pDigest is None, stems from the parameters of digest
+        pDigest, see parameterDigest."""
+        if not (os.path.isfile(outFileName) and
+                os.path.getmtime(outFileName) >= os.path.getmtime(inFileName)):
+            return False
+        if pDigest is None:
+            return True
+        try:
+            with np.load(outFileName) as f:
+                return 'digest' in f.files and str(f['digest']) == pDigest
+        except Exception:
+            return False
+
+
+def _convolveFile((inFileName,outFileName,fr,P,pDigest)):
+        """Read, convolve and write a single file, return timing record."""
+        t0 = time.time()
+        try:
+            r, z, Arz = mcmlio.fetchRawData(inFileName)
+            t1 = time.time()
+            if _plan[0] is None or not np.array_equal(_plan[0].r, r):
+                _plan[0] = HankelPlan(r)
+            # PROFILES GIVEN AS FUNCTIONS ARE SAMPLED ON THE RADIAL GRID
+            sample = lambda f: (f(r) if callable(f) and not hasattr(f, 'hankel')
+                                else f)
+            fr = map(sample, fr) if isinstance(fr, list) else sample(fr)
+            Wrz = convolveROI(r, z, Arz, fr, P, _plan[0])
+            t2 = time.time()
+            # WRITE TO TEMPORARY FILE FIRST, SO THAT AN INTERRUPTED RUN
+            # LEAVES NO OUTPUT FILE THAT APPEARS UP TO DATE
+            fd, tmpName = tempfile.mkstemp(suffix='.npz',
+                                dir=os.path.dirname(os.path.abspath(outFileName)))
+            os.close(fd)
+            try:
+                npz.writeROI(r, z, Wrz, tmpName, digest=pDigest)
+                os.rename(tmpName, outFileName)
+            except Exception:
+                os.remove(tmpName)
+                raise
+            t3 = time.time()
+        except Exception as e:
+            return (inFileName, 'failed (%s: %s)' % (type(e).__name__, e),
+                    time.time()-t0, 0., 0., 0.)
+        return (inFileName, 'ok', t3-t0, t1-t0, t2-t1, t3-t2)
+
+
+def _writeSummary(fName, records, tWall):
+        """Write per-file timing summary."""
+        with open(fName, 'w') as f:
+            f.write('# (1) total [s] (2) read [s] (3) convolve [s] (4) write [s] '
+                    '(5) file (6) status\n')
+            for inFileName, status, tTot, tRead, tConv, tWrite in records:
+                f.write('%lf %lf %lf %lf %s %s\n' %
+                        (tTot, tRead, tConv, tWrite, inFileName, status))
+            nOk = sum(1 for rec in records if rec[1] == 'ok')
+            nSkip = sum(1 for rec in records if rec[1] == 'skipped')
+            f.write('# files: %d, converted: %d, skipped: %d, failed: %d\n' %
+                    (len(records), nOk, nSkip, len(records)-nOk-nSkip))
+            f.write('# cpu time [s]: %lf, wall time [s]: %lf\n' %
+                    (sum(rec[2] for rec in records), tWall))
+
+
+def convolveMcoFiles(inFileNames,outDir,fr,P=1.0,nProc=None,maxPending=None,
+                     force=False,summary='timing.dat'):
+        """Convolve material responses of many MCML output files.
+
+        For each MCML output file, reads the response to an infinitely
+        narrow photon beam, convolves it with the irradiation source profile
+        and writes the ROI (r, z, Wrz) to an .npz file in outDir, see
+        dataIO.npz.writeROI.
+
+        Args:
+            inFileNames (list of str): names of .mco files.
+            outDir (str): output directory, created if it does not exist.
+            fr (beam profile object or function): irradiation source profile
+                with closed-form Hankel transform, e.g.
+                polarConvolution.isp.GaussianProfile, or function returning
+                the profile sampled on the radial grid of each file, e.g.
+                polarConvolution.isp.topHat. A list of such profiles yields
+                the responses to all of them, see convolveROI.
+            P (float): beam intensity (default: 1.0).
+            nProc (int): number of worker processes (default: nProc=None,
+                i.e. number of CPUs). For nProc=1 the files are processed in
+                the calling process.
+            maxPending (int): maximal number of files submitted to the pool
+                but not yet finished (default: maxPending=None, i.e. 2*nProc).
+            force (bool): also process files whose output is up to date,
+                i.e. not older than the .mco file and obtained for the same
+                profile and beam intensity (default: force=False).
+            summary (str): name of timing summary file in outDir (default:
+                summary='timing.dat'), or None.
+
+        Returns:
+            records (list of tuples): for each file (in the order of
+                inFileNames) its name, status ('ok', 'skipped' or
+                'failed (...)'), and the times spent in total, for reading,
+                convolving and writing.
+
+        Notes:
+            Profiles and functions are passed to the workers by pickling,
+            hence they must be defined at module level (no lambdas). The
+            output files hold the digest of the profile and beam intensity,
+            see parameterDigest. Functions enter the digest by module and
+            name only, hence a changed function body requires force=True.
+            Each worker keeps the Hankel transform plan of the last radial
+            grid, which is reused for files sharing that grid. A failure for
+            one file is recorded in its status and does not stop the batch.
+        """
+        tStart = time.time()
+        if not os.path.isdir(outDir):
+            os.makedirs(outDir)
+        nProc = nProc or multiprocessing.cpu_count()
+        maxPending = maxPending or 2*nProc
+
+        records = [None]*len(inFileNames)
+        tasks = []
+        pDigest = parameterDigest(fr, P)
+        for i, inFileName in enumerate(inFileNames):
+            oName = outFileName(inFileName, outDir)
+            if not force and isUpToDate(inFileName, oName, pDigest):
+                records[i] = (inFileName, 'skipped', 0., 0., 0., 0.)
+            else:
+                tasks.append((i, (inFileName, oName, fr, P, pDigest)))
+
+        if nProc == 1:
+            for i, task in tasks:
+                records[i] = _convolveFile(task)
+        else:
+            pool = multiprocessing.Pool(nProc)
+            try:
+                # BOUNDED QUEUE OF SUBMITTED TASKS
+                pending = collections.deque()
+                for i, task in tasks:
+                    if len(pending) >= maxPending:
+                        j, res = pending.popleft()
+                        records[j] = res.get()
+                    pending.append((i, pool.apply_async(_convolveFile, (task,))))
+                while pending:
+                    j, res = pending.popleft()
+                    records[j] = res.get()
+                pool.close()
+            finally:
+                pool.terminate()
+                pool.join()
+
+        if summary is not None:
+            _writeSummary(os.path.join(outDir, summary), records,
+                          time.time()-tStart)
+        return records
+
+# EOF: batchConvolution.py
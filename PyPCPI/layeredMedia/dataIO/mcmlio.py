@@ -1,33 +1,176 @@
+""" FILE: mcmlio.py
+
+Module implementing functions to read the output (.mco files) of the MCML
+C-code available under Ref. [1].
+
+Refs:
+    [1] MCML - Monte Carlo modeling of light transport in multi-layered
+        tissues
+        Wang, L. and Jacques, S. L. and Zheng, L.
+        Computer Methods and Programs in Biomedicine 47 (1995) 131
+        http://omlc.org/software/mc/
+
+"""
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import os
+import re
+import tempfile
 import numpy as np
+try:
+    from PyPCPI.cache import memoize
+except ImportError:
+    # CACHE LAYER UNAVAILABLE OUTSIDE OF THE PyPCPI PACKAGE
+    memoize = lambda *args, **kwargs: (lambda func: func)
+
+# MCML DATA CATEGORIES AND THEIR SHAPES IN TERMS OF (Nz,Nr,Na,Nl)
+_SECTIONS = {'A_l': lambda Nz,Nr,Na,Nl: (Nl,),
+             'A_z': lambda Nz,Nr,Na,Nl: (Nz,),
+             'Rd_r': lambda Nz,Nr,Na,Nl: (Nr,),
+             'Rd_a': lambda Nz,Nr,Na,Nl: (Na,),
+             'Tt_r': lambda Nz,Nr,Na,Nl: (Nr,),
+             'Tt_a': lambda Nz,Nr,Na,Nl: (Na,),
+             'A_rz': lambda Nz,Nr,Na,Nl: (Nr,Nz),
+             'Rd_ra': lambda Nz,Nr,Na,Nl: (Nr,Na),
+             'Tt_ra': lambda Nz,Nr,Na,Nl: (Nr,Na)}
+_HEADER = re.compile(r'^(%s|RAT|InParm)\b[^\n]*\n' % '|'.join(_SECTIONS), re.M)
+_BLANK = re.compile(r'\n[ \t\r]*(\n|$)')
 
-def fetchRawData(inFileName):
-        rArray   = []
-        zArray   = []
-        ArzArray = []
-        ctr = 0
+# KEEP BINARY COPIES OF PARSED .mco FILES IN SIDECAR FILES BY DEFAULT
+SIDECAR = False
+
+
+def _parseMco(inFileName):
+        """Parse all data categories of .mco file in bulk."""
         with open(inFileName,'r') as f:
-            for line in f:
-                    c = line.split()
-                    # FILTER FOR r,z MESH PROPERTIES --------------------------
-                    if len(c)>1 and c[0]!='#':
-                        ctr+=1
-                        if ctr == 5: 
-                            dz, dr = float(c[0]), float(c[1])
-                        if ctr == 6:
-                            Nz, Nr = int(c[0]), int(c[1])
-
-                    # FILTER FOR INTERNAL PHOTON DISTRIBUTION -----------------
-                    if len(c)==1 and c[0]=='A_rz':
-                            c = f.next().split()
-                            while(len(c)>=1):
-                                ArzArray.append(c)
-                                c = f.next().split()
-
-        #print Nz,Nr
-        #print Nz*Nr
-        #print np.asarray(ArzArray,dtype=float).size
-        rAxis = np.linspace(0,dr*Nr,Nr,endpoint=False)
-        zAxis = np.linspace(0,dz*Nz,Nz,endpoint=False)
-        ArzArray = np.asarray(ArzArray,dtype=float).reshape((Nr,Nz))
-
-        return rAxis,zAxis,ArzArray
+            text = f.read()
+        blocks = {}
+        headers = list(_HEADER.finditer(text))
+        for m, mNext in zip(headers, headers[1:] + [None]):
+            if m.group(1) == 'InParm':
+                # INPUT PARAMETERS SPAN SEVERAL BLANK-SEPARATED PARAGRAPHS
+                end = mNext.start() if mNext else len(text)
+            else:
+                end = _BLANK.search(text, m.end()-1)
+                end = end.start() if end else len(text)
+            blocks[m.group(1)] = text[m.end():end]
+        if 'InParm' not in blocks:
+            raise ValueError("%s is not an MCML output file" % inFileName)
+
+        # FIRST TOKENS OF LINES, SKIPPING COMMENT LINES ----------------------
+        head = lambda block: [line.split() for line in block.splitlines()
+                              if line.split() and line.split()[0][0] != '#']
+        inParm = head(blocks['InParm'])
+        dz, dr = float(inParm[2][0]), float(inParm[2][1])
+        Nz, Nr, Na = int(inParm[3][0]), int(inParm[3][1]), int(inParm[3][2])
+        Nl = int(inParm[4][0])
+        layers = np.asarray([c[:5] for c in inParm[6:6+Nl]], dtype=float)
+
+        data = {'r': np.linspace(0,dr*Nr,Nr,endpoint=False),
+                'z': np.linspace(0,dz*Nz,Nz,endpoint=False),
+                'a': np.linspace(0,0.5*np.pi,Na,endpoint=False),
+                'layers': layers}
+        if 'RAT' in blocks:
+            data['RAT'] = np.asarray([c[0] for c in head(blocks['RAT'])], dtype=float)
+        for name, shape in _SECTIONS.items():
+            if name not in blocks:
+                continue
+            shape = shape(Nz,Nr,Na,Nl)
+            values = np.fromstring(blocks[name], dtype=float, sep=' ')
+            if values.size != np.prod(shape):
+                raise ValueError("%s: %s holds %d values, expected %d" %
+                                 (inFileName, name, values.size, np.prod(shape)))
+            data[name] = values.reshape(shape)
+        return data
+
+
+def fetchMcoData(inFileName, sidecar=None):
+        """Read all data categories of MCML output file.
+
+        Args:
+            inFileName (str): name of .mco file.
+            sidecar (bool): keep binary copy of the data in the sidecar file
+                `inFileName.npz`, which is used instead of the .mco file as
+                long as modification time and size of the latter are
+                unchanged (default: sidecar=None, i.e. as set by the module
+                variable SIDECAR, which is False unless changed).
+
+        Returns:
+            data (dict): numpy arrays keyed by
+                r, z, a: equi-spaced grids for radial, depth and angular
+                    coordinate (left bin boundaries),
+                layers: layer parameters (n, mua, mus, g, d), one row each,
+                RAT: specular and diffuse reflectance, absorbed fraction,
+                    transmittance,
+                A_l, A_z, Rd_r, Rd_a, Tt_r, Tt_a: 1D data categories,
+                A_rz, Rd_ra, Tt_ra: 2D data categories with shapes (Nr,Nz),
+                    (Nr,Na), (Nr,Na).
+                Data categories missing in the .mco file are omitted.
+
+        Notes:
+            The data blocks are parsed by numpy in bulk. Raises ValueError
+            if the number of values of a data category does not match the
+            grid sizes given in the input parameters. If the sidecar file
+            cannot be written, e.g. in a read-only directory, the data is
+            returned nevertheless.
+        """
+        sidecar = SIDECAR if sidecar is None else sidecar
+        st = os.stat(inFileName)
+        key = np.array([st.st_mtime, st.st_size], dtype=float)
+        fName = inFileName + '.npz'
+        if sidecar and os.path.isfile(fName):
+            try:
+                with np.load(fName) as f:
+                    if np.array_equal(f['mcoStat'], key):
+                        return dict((k, f[k]) for k in f.files if k != 'mcoStat')
+            except (IOError, OSError, ValueError, KeyError):
+                pass
+
+        data = _parseMco(inFileName)
+        if sidecar:
+            try:
+                fd, tmpName = tempfile.mkstemp(suffix='.tmp',
+                                        dir=os.path.dirname(os.path.abspath(fName)))
+            except (IOError, OSError):
+                return data
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    np.savez(f, mcoStat=key, **data)
+                os.rename(tmpName, fName)
+            except (IOError, OSError):
+                os.remove(tmpName)
+        return data
+
+
+@memoize(fileArgs=(0,))
+def fetchRawData(inFileName, sidecar=None):
+        """Read absorption A_rz of MCML output file.
+
+        Args:
+            inFileName (str): name of .mco file.
+            sidecar (bool): keep binary copy of the data in a sidecar file,
+                see fetchMcoData (default: sidecar=None, i.e. as set by the
+                module variable SIDECAR).
+
+        Returns:
+            rAxis (numpy array, ndim=1): equi-spaced radial grid.
+            zAxis (numpy array, ndim=1): equi-spaced depth grid.
+            ArzArray (numpy array, ndim=2): absorption with shape (Nr,Nz).
+
+        Notes:
+            If the PyPCPI cache is enabled, the result is cached keyed by 
+            the content of the .mco file, see PyPCPI.cache, independent of
+            the sidecar file.
+
+        See Also:
+            fetchMcoData: all data categories, optionally cached in a
+                sidecar file.
+        """
+        data = fetchMcoData(inFileName, sidecar)
+        return data['r'], data['z'], data['A_rz']
+
+# EOF: mcmlio.py
@@ -1,8 +1,8 @@
 import numpy as np
 
 
-def writeROI(r,z,Wrz,fName='Wrz_dataROI.npz'):
-        np.savez_compressed(fName, r=r, z=z, Wrz=Wrz)
+def writeROI(r,z,Wrz,fName='Wrz_dataROI.npz',**attrs):
+        np.savez_compressed(fName, r=r, z=z, Wrz=Wrz, **attrs)
 
 def readROI(fName):
         npzDict = np.load(fName)
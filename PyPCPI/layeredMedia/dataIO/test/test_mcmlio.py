@@ -0,0 +1,286 @@
+""" FILE: test_mcmlio.py
+
+Unittest module for mcmlio.py
+"""
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import sys; sys.path.append("../"); sys.path.append("../../../../")
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import mcmlio
+from PyPCPI import cache
+
+
+def fetchRawDataLineByLine(inFileName):
+        """Line-by-line reader of absorption A_rz as implemented by earlier
+        versions of mcmlio.fetchRawData, used as reference."""
+        ArzArray = []
+        ctr = 0
+        with open(inFileName,'r') as f:
+            for line in f:
+                    c = line.split()
+                    if len(c)>1 and c[0]!='#':
+                        ctr+=1
+                        if ctr == 5:
+                            dz, dr = float(c[0]), float(c[1])
+                        if ctr == 6:
+                            Nz, Nr = int(c[0]), int(c[1])
+                    if len(c)==1 and c[0]=='A_rz':
+                            c = f.next().split()
+                            while(len(c)>=1):
+                                ArzArray.append(c)
+                                c = f.next().split()
+        rAxis = np.linspace(0,dr*Nr,Nr,endpoint=False)
+        zAxis = np.linspace(0,dz*Nz,Nz,endpoint=False)
+        ArzArray = np.asarray(ArzArray,dtype=float).reshape((Nr,Nz))
+        return rAxis,zAxis,ArzArray
+
+
+def writeMco(fName, (dz,dr), layers, data):
+        """Write MCML output file in the layout of the MCML C-code.
+
+        Args:
+            fName (str): name of .mco file.
+            (dz,dr) (2-tuple, floats): depth and radial spacing.
+            layers (numpy array, ndim=2): layer parameters (n,mua,mus,g,d).
+            data (dict): RAT and data categories keyed as in
+                mcmlio.fetchMcoData. The numbers of mesh-points are taken
+                from A_rz and Rd_ra.
+        """
+        (Nr, Nz), Na = data['A_rz'].shape, data['Rd_ra'].shape[1]
+        with open(fName, 'w') as f:
+            f.write("A1 \t# Version number of the file format.\n\n")
+            f.write("####\n# Data categories include: \n# InParm, RAT, \n"
+                    "# A_l, A_z, Rd_r, Rd_a, Tt_r, Tt_a, \n"
+                    "# A_rz, Rd_ra, Tt_ra \n####\n\n")
+            f.write("# User time:        0.73 sec =    0.00 hr.\n\n")
+            f.write("InParm \t\t\t# Input parameters. cm is used.\n")
+            f.write("%s \tA\t\t# output file name, ASCII.\n" % fName)
+            f.write("10000 \t\t\t# No. of photons\n")
+            f.write("%g\t%g\t\t# dz, dr [cm]\n" % (dz, dr))
+            f.write("%d\t%d\t%d\t# No. of dz, dr, da.\n\n" % (Nz, Nr, Na))
+            f.write("%d\t\t\t\t\t# Number of layers\n" % len(layers))
+            f.write("#n\tmua\tmus\tg\td\t# One line for each layer\n")
+            f.write("1\t\t\t\t\t# n for medium above\n")
+            for i, layer in enumerate(layers):
+                f.write("%G\t%G\t%G\t%G\t%G\t# layer %d\n" % (tuple(layer)+(i+1,)))
+            f.write("1\t\t\t\t\t# n for medium below\n\n")
+            f.write("RAT #Reflectance, absorption, transmission. \n")
+            for v, c in zip(data['RAT'], ['Specular reflectance',
+                    'Diffuse reflectance', 'Absorbed fraction', 'Transmittance']):
+                f.write("%-14.6G \t#%s [-]\n" % (v, c))
+            f.write("\n")
+            for name in ['A_l', 'A_z', 'Rd_r', 'Rd_a', 'Tt_r', 'Tt_a']:
+                f.write("%s #%s[0], [1],..%s[n-1]. \n" % (name, name, name))
+                for v in data[name]:
+                    f.write("%12.4E\n" % v)
+                f.write("\n")
+            for name in ['A_rz', 'Rd_ra', 'Tt_ra']:
+                f.write("# %s[r][.]. \n# %s[0][0], [0][1],..\n%s\n" %
+                        (name, name, name))
+                for i, v in enumerate(data[name].ravel()):
+                    f.write("%12.4E " % v + ("\n" if i % 5 == 4 else ""))
+                f.write("\n\n")
+
+
+class McmlioTestCase(unittest.TestCase):
+        """Unit test for mcmlio.py.
+
+        Implements unit tests on the reader of a synthesized MCML output
+        file holding all data categories.
+        Inherits from unittest.TestCase.
+        """
+
+        def setUp(self):
+            """Sets up unit test prerequisits.
+
+            Attributes:
+                tmpDir (str): temporary directory holding the .mco file.
+                fName (str): name of .mco file.
+                d (tuple, floats): depth and radial spacing.
+                layers (numpy array, ndim=2): layer parameters.
+                data (dict): data written to the .mco file, rounded to the
+                    precision of the file.
+            """
+            cache.disable()
+            np.random.seed(24)
+            Nz, Nr, Na = 7, 10, 3
+            rnd = lambda *shape: np.array([float('%12.4E' % v) for v in
+                        np.random.rand(*shape).ravel()]).reshape(shape)
+            self.d = (0.01, 0.02)
+            self.layers = np.array([[1.37, 1., 100., 0.9, 0.03],
+                                    [1.4, 2.5, 10., 0., 0.04]])
+            self.data = {'RAT': np.array([0.0243, 0.123, 0.5, 0.3]),
+                         'A_l': rnd(2), 'A_z': rnd(Nz),
+                         'Rd_r': rnd(Nr), 'Rd_a': rnd(Na),
+                         'Tt_r': rnd(Nr), 'Tt_a': rnd(Na),
+                         'A_rz': rnd(Nr,Nz), 'Rd_ra': rnd(Nr,Na),
+                         'Tt_ra': rnd(Nr,Na)}
+            self.tmpDir = tempfile.mkdtemp()
+            self.fName = os.path.join(self.tmpDir, 'synth.mco')
+            writeMco(self.fName, self.d, self.layers, self.data)
+
+
+        def tearDown(self):
+            """Deletes all attributes set by method setUp()."""
+            shutil.rmtree(self.tmpDir)
+            mcmlio.SIDECAR = False
+            cache.disable()
+            del self.tmpDir
+            del self.fName
+            del self.d
+            del self.layers
+            del self.data
+
+
+        def test_fetchRawData(self):
+            """Perform unit test on reading the absorption A_rz.
+
+            Grids and absorption have to agree bitwise with those of the
+            line-by-line reader, with and without sidecar file.
+            """
+            rRef, zRef, ArzRef = fetchRawDataLineByLine(self.fName)
+            for sidecar in [False, True, True]:
+                r, z, Arz = mcmlio.fetchRawData(self.fName, sidecar)
+                self.assertTrue(np.array_equal(r, rRef))
+                self.assertTrue(np.array_equal(z, zRef))
+                self.assertTrue(np.array_equal(Arz, ArzRef))
+            self.assertTrue(np.array_equal(Arz, self.data['A_rz']))
+
+
+        def test_fetchMcoData(self):
+            """Perform unit test on reading all data categories.
+
+            Grids, layer parameters and all data categories have to agree
+            with those written, and a data category whose number of values
+            does not match the grid sizes has to raise a ValueError.
+            """
+            data = mcmlio.fetchMcoData(self.fName)
+            (dz, dr), (Nr, Nz) = self.d, self.data['A_rz'].shape
+            self.assertTrue(np.allclose(data['r'], dr*np.arange(Nr)))
+            self.assertTrue(np.allclose(data['z'], dz*np.arange(Nz)))
+            self.assertTrue(np.allclose(data['a'], np.pi/6*np.arange(3)))
+            self.assertTrue(np.array_equal(data['layers'], self.layers))
+            self.assertEqual(set(data), set(self.data) | set('rza') |
+                             set(['layers']))
+            for name in self.data:
+                self.assertEqual(data[name].shape, self.data[name].shape)
+                self.assertTrue(np.array_equal(data[name], self.data[name]))
+
+            # MISSING DATA CATEGORIES ARE OMITTED
+            self.data.pop('Tt_a')
+            self.data['Tt_r'] = self.data['Tt_r'][:-1]
+            with open(self.fName) as f:
+                text = f.read()
+            with open(self.fName, 'w') as f:
+                f.write(text.replace('Tt_a #', 'Tt_a_ #'))
+            self.assertTrue('Tt_a' not in mcmlio.fetchMcoData(self.fName))
+            writeMco(self.fName, self.d, self.layers, dict(self.data,
+                                                            Tt_a=np.ones(3)))
+            self.assertRaisesRegexp(ValueError, 'Tt_r holds 9 values, '
+                                    'expected 10', mcmlio.fetchMcoData,
+                                    self.fName)
+            with open(self.fName, 'w') as f:
+                f.write('A1 \t# Version number of the file format.\n')
+            self.assertRaises(ValueError, mcmlio.fetchMcoData, self.fName)
+
+
+        def test_sidecar(self):
+            """Perform unit test on the sidecar file.
+
+            The sidecar file has to be written only on request, either by
+            argument or by the module variable SIDECAR. It has to be used
+            as long as modification time and size of the .mco file are
+            unchanged, and to be replaced otherwise.
+            """
+            sName = self.fName + '.npz'
+            mcmlio.fetchRawData(self.fName)
+            mcmlio.fetchMcoData(self.fName)
+            self.assertFalse(os.path.exists(sName))
+            mcmlio.SIDECAR = True
+            mcmlio.fetchRawData(self.fName)
+            self.assertTrue(os.path.isfile(sName))
+            os.remove(sName)
+            mcmlio.fetchMcoData(self.fName, sidecar=True)
+            self.assertTrue(os.path.isfile(sName))
+
+            def tamper():
+                """Replace A_rz in the sidecar file by zeros."""
+                with np.load(sName) as f:
+                    data = dict((k, f[k]) for k in f.files)
+                data['A_rz'] = np.zeros_like(data['A_rz'])
+                np.savez(sName, **data)
+
+            tamper()
+            self.assertFalse(mcmlio.fetchRawData(self.fName)[2].any())
+            self.assertTrue(np.array_equal(mcmlio.fetchRawData(self.fName,
+                                           False)[2], self.data['A_rz']))
+
+            # CHANGED MODIFICATION TIME
+            st = os.stat(self.fName)
+            os.utime(self.fName, (st.st_atime, st.st_mtime+10))
+            Arz = mcmlio.fetchRawData(self.fName)[2]
+            self.assertTrue(np.array_equal(Arz, self.data['A_rz']))
+            tamper()
+            self.assertFalse(mcmlio.fetchRawData(self.fName)[2].any())
+
+            # CHANGED SIZE AT UNCHANGED MODIFICATION TIME
+            st = os.stat(self.fName)
+            with open(self.fName, 'a') as f:
+                f.write('\n')
+            os.utime(self.fName, (st.st_atime, st.st_mtime))
+            Arz = mcmlio.fetchRawData(self.fName)[2]
+            self.assertTrue(np.array_equal(Arz, self.data['A_rz']))
+            with np.load(sName) as f:
+                self.assertEqual(f['mcoStat'][1], st.st_size+1)
+
+
+        def test_cache(self):
+            """Perform unit test on caching the reader by PyPCPI.cache.
+
+            With the cache enabled, repeated reads of an unchanged .mco file
+            have to be served from the cache without parsing the file, and
+            a changed file content has to be parsed anew, with and without
+            sidecar file.
+            """
+            parsed = []
+            def spy(inFileName):
+                parsed.append(inFileName)
+                return parseMco(inFileName)
+            parseMco, mcmlio._parseMco = mcmlio._parseMco, spy
+            try:
+                cache.enable(os.path.join(self.tmpDir, 'cache'))
+                r, z, Arz = mcmlio.fetchRawData(self.fName)
+                rC, zC, ArzC = mcmlio.fetchRawData(self.fName)
+                self.assertEqual(len(parsed), 1)
+                self.assertTrue(np.array_equal(r, rC))
+                self.assertTrue(np.array_equal(z, zC))
+                self.assertTrue(np.array_equal(ArzC, self.data['A_rz']))
+
+                self.data['A_rz'][2,3] = 0.5
+                writeMco(self.fName, self.d, self.layers, self.data)
+                Arz = mcmlio.fetchRawData(self.fName)[2]
+                self.assertEqual(len(parsed), 2)
+                self.assertTrue(np.array_equal(Arz, self.data['A_rz']))
+
+                mcmlio.fetchRawData(self.fName, True)
+                mcmlio.fetchRawData(self.fName, True)
+                self.assertEqual(len(parsed), 3)
+                cache.disable()
+                mcmlio.fetchRawData(self.fName)
+                self.assertEqual(len(parsed), 4)
+            finally:
+                mcmlio._parseMco = parseMco
+
+
+if __name__ == "__main__":
+        unittest.main()
+
+# EOF: test_mcmlio.py
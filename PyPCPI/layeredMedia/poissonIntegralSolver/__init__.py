@@ -1 +1,2 @@
-from acousticObservables import pressure
+from acousticObservables import pressure, pressure_multiDetector, pruneSource
+import forwardModel
@@ -19,9 +19,87 @@ import scipy
 import scipy.special as scs
 import numpy as np 
 from poissonIntegral_cython import polarPoissonIntegralSolver
+from poissonIntegral_cython import polarPoissonIntegralSolver_multiDetector
+from poissonIntegral_cython import polarPoissonIntegralSolver_parallel
+from poissonIntegral_cython import polarPoissonIntegralSolver_analytic
+from poissonIntegral_cython import polarPoissonIntegralSolver_linear
+from poissonIntegral_cython import customPolarSolverMcml
+try:
+    from PyPCPI import pruning
+except ImportError:
+    # OUTSIDE OF THE PyPCPI PACKAGE THE SHARED MODULE IS LOADED FROM ITS FILE
+    import os, imp
+    pruning = imp.load_source('pruning', os.path.join(os.path.dirname(
+                    os.path.abspath(__file__)), os.pardir, os.pardir, 'pruning.py'))
+pruneMask = pruning.pruneMask
+try:
+    from PyPCPI.cache import memoize
+except ImportError:
+    # CACHE LAYER UNAVAILABLE OUTSIDE OF THE PyPCPI PACKAGE
+    memoize = lambda *args, **kwargs: (lambda func: func)
 
 
-def pressure((r,z,p0rz),(rD,zD),c0=1.,Nphi=360):
+def pruneSource((r,z,p0rz),(rD,zD),epsL1):
+        """Discard smallest contributions to the Poisson integral.
+
+        Sets to zero the mesh-points of the ROI with the smallest 
+        contributions to the Poisson integral at the detector position, 
+        such that the relative L1 error of the Poisson integral does not 
+        exceed epsL1.
+
+        Args:
+            r (numpy array, ndim=1): equispaced 1D grid for radial coordinate.
+            z (numpy array, ndim=1): equispaced 1D grid for z-coordinate.
+            p0rz (numpy array, ndim=2): initial acoustic stress profile.
+            rD (float): axial deflection of detector position from beam axis.
+            zD (float): z-position of detector relative to first layer.
+            epsL1 (float): relative L1 error bound.
+
+        Returns:
+            p0rz (numpy array, ndim=2): pruned initial acoustic stress profile.
+            epsAchieved (float): achieved bound on the relative L1 error.
+            nKept (int): number of nonzero mesh-points kept.
+
+        Notes:
+            Ring (r,z) contributes 2*r*|p0|*dV/d per azimuthal mesh-point, 
+            where the distance d to the detector lies within 
+            [sqrt((r-rD)^2+z^2), sqrt((r+rD)^2+z^2)]. Mesh-points are 
+            discarded according to the upper bound of their contribution,
+            and the summed upper bounds of the discarded mesh-points are 
+            measured relative to the summed lower bounds of all mesh-points.
+            Hence, epsAchieved bounds sum(|I-Ipruned|)/sum(|I|) from above 
+            for a nonnegative profile without evaluating the azimuthal 
+            integral. 
+        """
+        rr, zz, rD = r[:,np.newaxis], z[np.newaxis,:] - zD, abs(rD)
+        a = np.abs(p0rz)*rr
+        with np.errstate(divide='ignore'):
+            wMax = a/np.sqrt((rr-rD)**2 + zz**2)
+        wTot = np.sum(a/np.sqrt((rr+rD)**2 + zz**2))
+        keep, epsAchieved = pruneMask(wMax,epsL1,wTot)
+        return np.where(keep,p0rz,0.), epsAchieved, int(np.count_nonzero(keep))
+
+
+def _poissonIntegral((r,z,p0rz),(rD,zD),Nphi,nthreads,c0t=None):
+        """Dispatch Poisson integral to serial or multi-threaded solver."""
+        if c0t is not None:
+            if Nphi is None:
+                raise ValueError(
+                    "linear time binning requires a finite number Nphi of "
+                    "azimuthal mesh-points")
+            return polarPoissonIntegralSolver_linear(
+                        r, z, p0rz, rD, zD, Nphi, c0t, nthreads)
+        if Nphi is None:
+            return polarPoissonIntegralSolver_analytic(
+                        r, z, p0rz, rD, zD, nthreads)
+        if nthreads == 1:
+            return polarPoissonIntegralSolver(r, z, p0rz, rD, zD, Nphi)
+        return polarPoissonIntegralSolver_parallel(
+                        r, z, p0rz, rD, zD, Nphi, nthreads)
+
+
+@memoize(depends=(customPolarSolverMcml, pruning))
+def pressure((r,z,p0rz),(rD,zD),c0=1.,Nphi=360,nthreads=1,t=None,epsL1=None):
         """Compute acoustic observables.
 
         Compute on-axis and off-axis excess pressure signals for given 
@@ -38,7 +116,17 @@ def pressure((r,z,p0rz),(rD,zD),c0=1.,Nphi=360):
             zD (float): z-position of detector relative to first layer.
             Nphi (int): number of mesh-points for azimuthal coordinate, only
                 important if rD is different from zero, i.e. for off axis 
-                signals. 
+                signals. If Nphi=None, the azimuthal integral is carried out
+                analytically, see Notes.
+            nthreads (int): number of OpenMP threads used for the integration
+                over the ROI (default: nthreads=1, i.e. serial solver).
+            t (numpy array, ndim=1): equispaced time grid on which the signal 
+                is computed (default: t=None, i.e. time grid set up by the 
+                solver with increment given by the z-spacing). If provided, 
+                contributions are binned linearly onto c0*t.
+            epsL1 (float): relative L1 error bound up to which the smallest
+                contributions are discarded (default: epsL1=None, i.e. all
+                mesh-points are integrated), see pruneSource.
 
         Returns:
             t (numpy array, ndim=1): equi-spaced complementary grid.
@@ -55,13 +143,38 @@ def pressure((r,z,p0rz),(rD,zD),c0=1.,Nphi=360):
             volumetric energy density, then on output p = optoacoustic 
             excess pressure/Grueneisenparameter
 
+            For Nphi=None, each (r,z) ring of the ROI is distributed over the
+            distance bins according to the arc length of the ring that falls
+            into the respective spherical shell around the detector. This 
+            avoids the azimuthal sampling noise of off-axis signals and its 
+            cost does not depend on an azimuthal mesh.
+
+            If a time grid `t` is supplied, each contribution is split 
+            linearly between the two neighboring grid points (cloud-in-cell 
+            deposition), so that the resolution of the signal is decoupled 
+            from the z-spacing of the ROI. Contributions outside the range of
+            `t` are discarded.
+
+            Mesh-points with vanishing initial acoustic stress are skipped 
+            by the solvers. For a profile with long tails, e.g. far from the
+            beam axis, a small epsL1 thus saves the azimuthal integration of
+            the corresponding rings at a controlled error.
+            The achieved error bound and the number of kept mesh-points are
+            returned by pruneSource, whose pruned profile can be passed to 
+            pressure in place of p0rz.
+
         Refs:
             [1] Landau, L. D. and Lifshitz, E. M.,
                 Hydrodynamik (4th Ed.),
                 Akademie-Verlag (1981, Berlin)
 
         """
-        c0t, I = polarPoissonIntegralSolver(r, z, p0rz, rD, zD, Nphi)
+        if nthreads < 1:
+            raise ValueError('nthreads must be >= 1')
+        if epsL1 is not None:
+            p0rz = pruneSource((r,z,p0rz),(rD,zD),epsL1)[0]
+        c0t = None if t is None else c0*np.asarray(t,dtype=float)
+        c0t, I = _poissonIntegral((r,z,p0rz),(rD,zD),Nphi,nthreads,c0t)
 
         I = I/(4.*np.pi*c0)/(c0t[1]-c0t[0])
         p = np.gradient(I)*c0/(c0t[1]-c0t[0])
@@ -69,7 +182,63 @@ def pressure((r,z,p0rz),(rD,zD),c0=1.,Nphi=360):
         return c0t/c0, p 
 
 
-def velocityPotential((r,z,p0rz),(rD,zD),(Gamma,rho,c0),Nphi=360):
+def pressure_multiDetector((r,z,p0rz),(rD,zD),c0=1.,Nphi=360):
+        """Compute acoustic observables for a batch of detector positions.
+
+        Compute on-axis and off-axis excess pressure signals for given 
+        material response to extended radially symmetric transverse 
+        irradiation source profile as observed by several pointlike 
+        detectors. The region of interest is traversed only once and all 
+        signals are obtained on a shared time axis.
+
+        Args:
+            r (numpy array, ndim=1): equispaced 1D grid for radial coordinate.
+            z (numpy array, ndim=1): equispaced 1D grid for z-coordinate.
+            p0rz (numpy array, ndim=2): region of interest (ROI) containing 
+                initial acoustic stress response to extended irradiation 
+                source profile.
+            rD (numpy array, ndim=1): axial deflections of detector positions 
+                from beam axis.
+            zD (numpy array, ndim=1): z-positions of detectors relative to 
+                first layer (same size as rD, or broadcastable against rD, 
+                e.g. a scalar).
+            c0 (float): Homogeneous sonic velocity (default: c0=1.)
+            Nphi (int): number of mesh-points for azimuthal coordinate, only
+                important if rD is different from zero, i.e. for off axis 
+                signals. 
+
+        Returns:
+            t (numpy array, ndim=1): equi-spaced time grid shared by all 
+                detector signals.
+            p (numpy array, ndim=2): excess pressure as function of time, 
+                one row per detector position.
+
+        Notes:
+            The shared time axis is set up for the most distant detector. 
+            Signals of detectors closer to the ROI are zero-padded at late 
+            times, hence there is no need to truncate them to a common 
+            length.
+
+        """
+        try:
+            rD, zD = np.broadcast_arrays(np.asarray(rD,dtype=float),
+                                         np.asarray(zD,dtype=float))
+        except ValueError:
+            raise ValueError("detector positions rD and zD of shapes %s and "
+                             "%s cannot be broadcast" %
+                             (np.shape(rD), np.shape(zD)))
+        rD, zD = rD.ravel(), zD.ravel()
+        c0t, I = polarPoissonIntegralSolver_multiDetector(
+                        r, z, p0rz, rD, zD, Nphi)
+
+        I = I/(4.*np.pi*c0)/(c0t[1]-c0t[0])
+        p = np.array([np.gradient(In) for In in I])*c0/(c0t[1]-c0t[0])
+
+        return c0t/c0, p 
+
+
+def velocityPotential((r,z,p0rz),(rD,zD),(Gamma,rho,c0),Nphi=360,nthreads=1,
+                      t=None,epsL1=None):
         """Compute velocity potential at detector field point.
 
         Compute on-axis and off-axis velocity potentials for given 
@@ -86,7 +255,17 @@ def velocityPotential((r,z,p0rz),(rD,zD),(Gamma,rho,c0),Nphi=360):
             zD (float): z-position of detector relative to first layer.
             Nphi (int): number of mesh-points for azimuthal coordinate, only
                 important if rD is different from zero, i.e. for off axis 
-                signals. 
+                signals. If Nphi=None, the azimuthal integral is carried out
+                analytically, see Notes.
+            nthreads (int): number of OpenMP threads used for the integration
+                over the ROI (default: nthreads=1, i.e. serial solver).
+            t (numpy array, ndim=1): equispaced time grid on which the signal 
+                is computed (default: t=None, i.e. time grid set up by the 
+                solver with increment given by the z-spacing). If provided, 
+                contributions are binned linearly onto c0*t.
+            epsL1 (float): relative L1 error bound up to which the smallest
+                contributions are discarded (default: epsL1=None, i.e. all
+                mesh-points are integrated), see pruneSource.
 
         Returns:
             t (numpy array, ndim=1): equi-spaced time grid of detector signal.
@@ -94,7 +273,12 @@ def velocityPotential((r,z,p0rz),(rD,zD),(Gamma,rho,c0),Nphi=360):
                 function of time.
 
         """
-        c0t, I = polarPoissonIntegralSolver(r, z, p0rz, rD, zD, Nphi)
+        if nthreads < 1:
+            raise ValueError('nthreads must be >= 1')
+        if epsL1 is not None:
+            p0rz = pruneSource((r,z,p0rz),(rD,zD),epsL1)[0]
+        c0t = None if t is None else c0*np.asarray(t,dtype=float)
+        c0t, I = _poissonIntegral((r,z,p0rz),(rD,zD),Nphi,nthreads,c0t)
 
         I = I/(4.*np.pi*c0)/(c0t[1]-c0t[0])
         phi = -Gamma/rho * I
@@ -0,0 +1,109 @@
+""" FILE: forwardModel.py
+
+Module implementing a precomputed sparse representation of the polar
+coordinate based Poisson integral solver.
+
+For a fixed computational grid and detector position, the Poisson integral
+is linear in the initial acoustic stress profile. Its discretization in
+polarPoissonIntegralSolver can thus be expressed as a sparse matrix that
+maps the mesh-points of the region of interest (ROI) to the bins of the
+retarded signal depth. Once assembled, the matrix can be applied to an
+arbitrary number of initial stress profiles at the cost of a sparse
+matrix-vector product each.
+
+"""
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import numpy as np
+import scipy.sparse
+try:
+    from PyPCPI.forwardModelIO import writeForwardModel, readForwardModel
+except ImportError:
+    # OUTSIDE OF THE PyPCPI PACKAGE THE SHARED MODULE IS LOADED FROM ITS FILE
+    import os, imp
+    forwardModelIO = imp.load_source('forwardModelIO', os.path.join(
+                    os.path.dirname(os.path.abspath(__file__)), os.pardir,
+                    os.pardir, 'forwardModelIO.py'))
+    writeForwardModel = forwardModelIO.writeForwardModel
+    readForwardModel = forwardModelIO.readForwardModel
+
+
+def forwardModelMatrix((r,z),(rD,zD),Nphi=360):
+        """Assemble sparse forward model matrix.
+
+        Sets up the sparse matrix that maps the initial acoustic stress
+        profile on the (r,z) mesh to the Poisson integral at the detector
+        position, following the discretization of
+        polarPoissonIntegralSolver.
+
+        Args:
+            r (numpy array, ndim=1): equispaced 1D grid for radial coordinate.
+            z (numpy array, ndim=1): equispaced 1D grid for z-coordinate.
+            rD (float): axial deflection of detector position from beam axis.
+            zD (float): z-position of detector relative to first layer.
+            Nphi (int): number of mesh-points for azimuthal coordinate.
+
+        Returns:
+            tau (numpy array, ndim=1): retarded signal depth.
+            A (scipy csr_matrix, shape=(tau.size, r.size*z.size)): forward
+                model matrix. Column index k*z.size+i refers to mesh-point
+                (r[k],z[i]), i.e. to the C-ordered ravel of p0rz.
+
+        Notes:
+            The matrix is assembled one z-slice at a time, hence the
+            temporary memory requirement is of the order of r.size*Nphi.
+        """
+        z = z - zD
+        dz = z[1]-z[0]
+        iTauMax = int(1.5*np.sqrt(np.max(np.abs(z))**2+(np.max(r)+rD)**2)/dz + 1)
+        tau = np.linspace(0.,iTauMax*dz,iTauMax,endpoint=False)
+        cosPhi = np.cos(np.linspace(0,np.pi,Nphi,endpoint=False))
+        dV = (z[1]-z[0])*(r[1]-r[0])*np.pi/Nphi
+
+        RR = rD*rD + r[:,np.newaxis]**2 + 2.0*rD*r[:,np.newaxis]*cosPhi
+        kIdx = np.repeat(np.arange(r.size),Nphi)
+
+        rows, cols, vals = [], [], []
+        for i in range(z.size):
+            d = np.sqrt(RR + z[i]*z[i])
+            binId = (d/dz).astype(int).ravel()
+            # SUM CONTRIBUTIONS OF ALL AZIMUTHAL MESH-POINTS PER (bin,r) PAIR
+            key = binId*r.size + kIdx
+            w = np.bincount(key, (2.0*r[:,np.newaxis]*dV/d).ravel())
+            key = np.nonzero(w)[0]
+            rows.append(key//r.size)
+            cols.append((key%r.size)*z.size + i)
+            vals.append(w[key])
+
+        A = scipy.sparse.coo_matrix(
+                (np.concatenate(vals),
+                (np.concatenate(rows), np.concatenate(cols))),
+                shape=(tau.size, r.size*z.size))
+        return tau, A.tocsr()
+
+
+def applyForwardModel((tau,A),p0rz):
+        """Evaluate Poisson integral via sparse matrix-vector product.
+
+        Args:
+            tau (numpy array, ndim=1): retarded signal depth.
+            A (scipy sparse matrix): forward model matrix.
+            p0rz (numpy array, ndim=2 or ndim=3): initial acoustic stress
+                profile with shape (Nr,Nz) or stack of M such profiles with
+                shape (M,Nr,Nz).
+
+        Returns:
+            tau (numpy array, ndim=1): retarded signal depth.
+            I (numpy array, ndim=1 or ndim=2): Poisson integral with shape
+                (Ntau,) or (M,Ntau) for a stack of profiles.
+        """
+        p0rz = np.asarray(p0rz)
+        if p0rz.ndim == 2:
+            return tau, A.dot(p0rz.ravel())
+        return tau, A.dot(p0rz.reshape(p0rz.shape[0],-1).T).T
+
+# EOF: forwardModel.py
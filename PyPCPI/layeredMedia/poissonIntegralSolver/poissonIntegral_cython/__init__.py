@@ -1 +1,5 @@
 from customPolarSolverMcml import polarPoissonIntegralSolver
+from customPolarSolverMcml import polarPoissonIntegralSolver_multiDetector
+from customPolarSolverMcml import polarPoissonIntegralSolver_parallel
+from customPolarSolverMcml import polarPoissonIntegralSolver_analytic
+from customPolarSolverMcml import polarPoissonIntegralSolver_linear
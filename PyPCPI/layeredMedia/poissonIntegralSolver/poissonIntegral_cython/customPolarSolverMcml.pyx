@@ -29,10 +29,20 @@ __contact__   = "oliver.melchert@hot.uni-hannover.de"
 import  numpy as np
 cimport numpy as np
 cimport cython
+from cython cimport floating
+from cython.parallel cimport prange, threadid
+
+# initial acoustic stress profiles are accepted as float32 or float64 arrays 
+# of arbitrary memory layout (fused-type memoryviews, no copy on input), while 
+# all histograms are accumulated in double precision
 
 # prefer C function with small overhead 
 cdef extern from "math.h":
-        double sqrt(double value) 
+        double sqrt(double value) nogil
+        double acos(double value) nogil
+        double cos(double value) nogil
+        double floor(double value) nogil
+        double fabs(double value) nogil
 
 # WARNING: the following features were turned off to yield speed-up
 # (i) bound-checking for array indices
@@ -42,7 +52,7 @@ cdef extern from "math.h":
 def polarPoissonIntegralSolver(
         np.ndarray[double, ndim=1] r,\
         np.ndarray[double, ndim=1] z,\
-        np.ndarray[double, ndim=2] p0rz,\
+        const floating[:,:] p0rz,\
         double rD,\
         double zD,\
         int Nphi
@@ -71,7 +81,7 @@ def polarPoissonIntegralSolver(
         # INITIALIZATION ------------------------------------------------------
         z = z - zD
         dz = z[1]-z[0]
-        iTauMax = int(1.5*sqrt(np.max(np.abs(z))**2+(np.max(r)+rD)**2)/dz + 1)
+        iTauMax = int(1.5*sqrt(np.max(np.abs(z))**2+(np.max(r)+abs(rD))**2)/dz + 1)
         tau = np.linspace(0.,iTauMax*dz,iTauMax,endpoint=False)
         cosPhi = np.cos(np.linspace(0,np.pi,Nphi,endpoint=False))
         I = np.zeros(tau.size)
@@ -80,6 +90,8 @@ def polarPoissonIntegralSolver(
         # INTEGRATION OVER COMPUTATIONAL DOMAIN -------------------------------
         for i in range(z.size):
             for k in range(r.size):
+                if p0rz[k,i] == 0.0:
+                    continue
                 for j in range(Nphi):
                     RR = rD*rD + r[k]*r[k] + 2.0*rD*r[k]*cosPhi[j]
                     d = sqrt(RR + z[i]*z[i])
@@ -88,4 +100,305 @@ def polarPoissonIntegralSolver(
                 
         return tau, I
 
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def polarPoissonIntegralSolver_multiDetector(
+        np.ndarray[double, ndim=1] r,\
+        np.ndarray[double, ndim=1] z,\
+        const floating[:,:] p0rz,\
+        np.ndarray[double, ndim=1] rD,\
+        np.ndarray[double, ndim=1] zD,\
+        int Nphi
+        ):
+        """
+        Polar coordinate based poisson integral solver for multiple detectors
+        
+        fast solver for the optoacoustic Poisson integral for a batch of 
+        detector positions. The initial acoustic stress profile is traversed
+        only once and the contributions of each mesh-point are binned into
+        one histogram per detector. All histograms share a common time axis
+        that is long enough to accommodate the most distant detector.
+
+        \param[in]  rD    axial deflections of detector positions (ndim=1)
+        \param[in]  zD    z-coordinates of detectors (ndim=1, same size as rD)
+        \param[in]  r     r-axis (ndim=1)
+        \param[in]  z     z-axis (ndim=1)
+        \param[in]  p0rz  initial acoustic stress profile (ndim=2)
+        \param[in]  Nphi  interpolation points for azimuthal angle
+        \param[out] tau   retarded signal depth
+        \param[out] I     Poisson integral, one row per detector (ndim=2)
+        """
+        # DECLARATION ---------------------------------------------------------
+        cdef int iTauMax, i, j, k, n, binId, nD
+        cdef double dz, RR, d, dV, w, zz
+        cdef np.ndarray[double, ndim=1] tau, cosPhi
+        cdef np.ndarray[double, ndim=2] I
+        
+        # INITIALIZATION ------------------------------------------------------
+        nD = rD.size
+        if zD.size != nD:
+            raise ValueError("rD and zD must have the same size")
+        dz = z[1]-z[0]
+        iTauMax = 0
+        for n in range(nD):
+            iTauMax = max(iTauMax, int(1.5*sqrt(
+                np.max(np.abs(z-zD[n]))**2+(np.max(r)+abs(rD[n]))**2)/dz + 1))
+        tau = np.linspace(0.,iTauMax*dz,iTauMax,endpoint=False)
+        cosPhi = np.cos(np.linspace(0,np.pi,Nphi,endpoint=False))
+        I = np.zeros((nD,tau.size))
+        dV = (z[1]-z[0])*(r[1]-r[0])*np.pi/Nphi
+
+        # INTEGRATION OVER COMPUTATIONAL DOMAIN -------------------------------
+        for i in range(z.size):
+            for k in range(r.size):
+                if p0rz[k,i] == 0.0:
+                    continue
+                w = 2.0*r[k]*p0rz[k,i]*dV
+                for n in range(nD):
+                    zz = z[i]-zD[n]
+                    for j in range(Nphi):
+                        RR = rD[n]*rD[n] + r[k]*r[k] + 2.0*rD[n]*r[k]*cosPhi[j]
+                        d = sqrt(RR + zz*zz)
+                        binId = int(d/dz)
+                        I[n,binId] += w/d
+                
+        return tau, I
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def polarPoissonIntegralSolver_parallel(
+        np.ndarray[double, ndim=1] r,\
+        np.ndarray[double, ndim=1] z,\
+        const floating[:,:] p0rz,\
+        double rD,\
+        double zD,\
+        int Nphi,\
+        int nthreads
+        ):
+        """
+        Multi-threaded polar coordinate based poisson integral solver 
+        
+        OpenMP parallel variant of polarPoissonIntegralSolver. The z-axis of
+        the computational domain is split among `nthreads` threads, each of 
+        which bins its contributions into a private histogram. The private 
+        histograms are reduced in thread order once the integration is 
+        complete, so that for nthreads=1 the result is identical to that of
+        the serial solver.
+
+        \param[in]  rD        axial deflection of detector position from beam axis
+        \param[in]  zD        z-coordinate of detector (zD<0: backward mode) 
+        \param[in]  r         r-axis (ndim=1)
+        \param[in]  z         z-axis (ndim=1)
+        \param[in]  p0rz      initial acoustic stress profile (ndim=2)
+        \param[in]  Nphi      interpolation points for azimuthal angle
+        \param[in]  nthreads  number of OpenMP threads
+        \param[out] tau       retarded signal depth
+        \param[out] I         Poisson integral at detection point 
+        """
+        # DECLARATION ---------------------------------------------------------
+        cdef int iTauMax, i, j, k, n, binId, tid, Nr, Nz
+        cdef double dz, RR, d, dV
+        cdef np.ndarray[double, ndim=1] tau, cosPhi, I
+        cdef double[:] rv, zv, cv
+        cdef double[:,:] Ith
+        
+        # INITIALIZATION ------------------------------------------------------
+        z = z - zD
+        dz = z[1]-z[0]
+        iTauMax = int(1.5*sqrt(np.max(np.abs(z))**2+(np.max(r)+abs(rD))**2)/dz + 1)
+        tau = np.linspace(0.,iTauMax*dz,iTauMax,endpoint=False)
+        cosPhi = np.cos(np.linspace(0,np.pi,Nphi,endpoint=False))
+        Ith = np.zeros((nthreads,tau.size))
+        dV = (z[1]-z[0])*(r[1]-r[0])*np.pi/Nphi
+        rv, zv, cv = r, z, cosPhi
+        Nr, Nz = r.size, z.size
+
+        # INTEGRATION OVER COMPUTATIONAL DOMAIN -------------------------------
+        for i in prange(Nz, nogil=True, schedule='static', num_threads=nthreads):
+            tid = threadid()
+            for k in range(Nr):
+                if p0rz[k,i] == 0.0:
+                    continue
+                for j in range(Nphi):
+                    RR = rD*rD + rv[k]*rv[k] + 2.0*rD*rv[k]*cv[j]
+                    d = sqrt(RR + zv[i]*zv[i])
+                    binId = <int>(d/dz)
+                    Ith[tid,binId] += 2.0*rv[k]*p0rz[k,i]*dV/d
+
+        # REDUCTION OF THREAD-PRIVATE HISTOGRAMS ------------------------------
+        I = np.asarray(Ith)[0].copy()
+        for n in range(1,nthreads):
+            I += np.asarray(Ith)[n]
+                
+        return tau, I
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def polarPoissonIntegralSolver_analytic(
+        np.ndarray[double, ndim=1] r,\
+        np.ndarray[double, ndim=1] z,\
+        const floating[:,:] p0rz,\
+        double rD,\
+        double zD,\
+        int nthreads
+        ):
+        """
+        Polar coordinate based poisson integral solver, analytic azimuth
+        
+        variant of polarPoissonIntegralSolver that does not sample the 
+        azimuthal angle. Each (r,z) ring of the computational domain is 
+        spread over the distance bins it intersects according to the 
+        phi-intervals that fall into the respective spherical shells. The
+        interval boundaries follow in closed form from the law of cosines 
+
+            d(phi)^2 = rD^2 + r^2 + 2 rD r cos(phi) + z^2,  phi in [0,pi],
+
+        and the integrand 1/d is evaluated at the interval midpoint. The 
+        computational cost scales with the number of bins touched by each 
+        ring rather than with the number of azimuthal mesh-points. The 
+        z-axis is split among `nthreads` OpenMP threads with private 
+        histograms as in polarPoissonIntegralSolver_parallel.
+
+        \param[in]  rD        axial deflection of detector position from beam axis
+        \param[in]  zD        z-coordinate of detector (zD<0: backward mode) 
+        \param[in]  r         r-axis (ndim=1)
+        \param[in]  z         z-axis (ndim=1)
+        \param[in]  p0rz      initial acoustic stress profile (ndim=2)
+        \param[in]  nthreads  number of OpenMP threads
+        \param[out] tau       retarded signal depth
+        \param[out] I         Poisson integral at detection point 
+        """
+        # DECLARATION ---------------------------------------------------------
+        cdef int iTauMax, i, k, n, binId, binMin, binMax, tid, Nr, Nz
+        cdef double dz, dA, w, a, b, c, dMin, dMax, dEdge, phiLo, phiHi, dMid
+        cdef double pi = np.pi
+        cdef np.ndarray[double, ndim=1] tau, I
+        cdef double[:] rv, zv
+        cdef double[:,:] Ith
+        
+        # INITIALIZATION ------------------------------------------------------
+        z = z - zD
+        dz = z[1]-z[0]
+        iTauMax = int(1.5*sqrt(np.max(np.abs(z))**2+(np.max(r)+abs(rD))**2)/dz + 1)
+        tau = np.linspace(0.,iTauMax*dz,iTauMax,endpoint=False)
+        Ith = np.zeros((nthreads,tau.size))
+        dA = (z[1]-z[0])*(r[1]-r[0])
+        rv, zv = r, z
+        Nr, Nz = r.size, z.size
+
+        # INTEGRATION OVER COMPUTATIONAL DOMAIN -------------------------------
+        for i in prange(Nz, nogil=True, schedule='static', num_threads=nthreads):
+            tid = threadid()
+            for k in range(Nr):
+                if p0rz[k,i] == 0.0:
+                    continue
+                w = 2.0*rv[k]*p0rz[k,i]*dA
+                a = rD*rD + rv[k]*rv[k] + zv[i]*zv[i]
+                # GEOMETRY IS SYMMETRIC IN THE SIGN OF rD ---------------------
+                b = 2.0*fabs(rD)*rv[k]
+                if b == 0.0:
+                    # RING DEGENERATES TO A SINGLE DISTANCE -------------------
+                    dMid = sqrt(a)
+                    binId = <int>(dMid/dz)
+                    Ith[tid,binId] += w*pi/dMid
+                    continue
+                dMin = sqrt(max(a - b, 0.0))
+                dMax = sqrt(a + b)
+                binMin = <int>(dMin/dz)
+                binMax = <int>(dMax/dz)
+                # phi DECREASES FROM pi AT dMin TO 0 AT dMax ------------------
+                phiHi = pi
+                for binId in range(binMin, binMax+1):
+                    dEdge = min((binId+1)*dz, dMax)
+                    c = min(max((dEdge*dEdge - a)/b, -1.0), 1.0)
+                    phiLo = acos(c)
+                    dMid = sqrt(a + b*cos(0.5*(phiLo+phiHi)))
+                    Ith[tid,binId] += w*(phiHi-phiLo)/dMid
+                    phiHi = phiLo
+
+        # REDUCTION OF THREAD-PRIVATE HISTOGRAMS ------------------------------
+        I = np.asarray(Ith)[0].copy()
+        for n in range(1,nthreads):
+            I += np.asarray(Ith)[n]
+                
+        return tau, I
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def polarPoissonIntegralSolver_linear(
+        np.ndarray[double, ndim=1] r,\
+        np.ndarray[double, ndim=1] z,\
+        const floating[:,:] p0rz,\
+        double rD,\
+        double zD,\
+        int Nphi,\
+        np.ndarray[double, ndim=1] tau,\
+        int nthreads
+        ):
+        """
+        Polar coordinate based poisson integral solver, linear binning
+        
+        variant of polarPoissonIntegralSolver_parallel that bins the 
+        contributions onto a user supplied equispaced grid `tau` of the 
+        retarded signal depth. Instead of assigning each contribution to a 
+        single bin, it is split linearly between the two neighboring grid 
+        points (cloud-in-cell deposition). Hence, the resolution of the 
+        signal is decoupled from the spacing of the z-axis. Contributions 
+        outside the range of `tau` are discarded.
+
+        \param[in]  rD        axial deflection of detector position from beam axis
+        \param[in]  zD        z-coordinate of detector (zD<0: backward mode) 
+        \param[in]  r         r-axis (ndim=1)
+        \param[in]  z         z-axis (ndim=1)
+        \param[in]  p0rz      initial acoustic stress profile (ndim=2)
+        \param[in]  Nphi      interpolation points for azimuthal angle
+        \param[in]  tau       equispaced grid of retarded signal depth (ndim=1)
+        \param[in]  nthreads  number of OpenMP threads
+        \param[out] tau       retarded signal depth
+        \param[out] I         Poisson integral at detection point 
+        """
+        # DECLARATION ---------------------------------------------------------
+        cdef int i, j, k, n, binId, tid, Nr, Nz, Nt
+        cdef double dTau, tau0, RR, d, dV, u, w
+        cdef np.ndarray[double, ndim=1] cosPhi, I
+        cdef double[:] rv, zv, cv
+        cdef double[:,:] Ith
+        
+        # INITIALIZATION ------------------------------------------------------
+        z = z - zD
+        tau0 = tau[0]
+        dTau = tau[1]-tau[0]
+        cosPhi = np.cos(np.linspace(0,np.pi,Nphi,endpoint=False))
+        Ith = np.zeros((nthreads,tau.size))
+        dV = (z[1]-z[0])*(r[1]-r[0])*np.pi/Nphi
+        rv, zv, cv = r, z, cosPhi
+        Nr, Nz, Nt = r.size, z.size, tau.size
+
+        # INTEGRATION OVER COMPUTATIONAL DOMAIN -------------------------------
+        for i in prange(Nz, nogil=True, schedule='static', num_threads=nthreads):
+            tid = threadid()
+            for k in range(Nr):
+                if p0rz[k,i] == 0.0:
+                    continue
+                for j in range(Nphi):
+                    RR = rD*rD + rv[k]*rv[k] + 2.0*rD*rv[k]*cv[j]
+                    d = sqrt(RR + zv[i]*zv[i])
+                    w = 2.0*rv[k]*p0rz[k,i]*dV/d
+                    u = (d-tau0)/dTau
+                    binId = <int>floor(u)
+                    u = u - binId
+                    if binId >= 0 and binId < Nt:
+                        Ith[tid,binId] += (1.0-u)*w
+                    if binId+1 >= 0 and binId+1 < Nt:
+                        Ith[tid,binId+1] += u*w
+
+        # REDUCTION OF THREAD-PRIVATE HISTOGRAMS ------------------------------
+        I = np.asarray(Ith)[0].copy()
+        for n in range(1,nthreads):
+            I += np.asarray(Ith)[n]
+                
+        return tau, I
+
 # EOF: customPolarSolver.pyx 
@@ -13,7 +13,12 @@ import unittest
 import scipy
 import scipy.special as scs
 import numpy as np
+import acousticObservables
 from acousticObservables import pressure, velocityPotential
+from acousticObservables import pressure_multiDetector, pruneSource
+from poissonIntegral_cython import polarPoissonIntegralSolver
+from poissonIntegral_cython import polarPoissonIntegralSolver_multiDetector
+from poissonIntegral_cython import polarPoissonIntegralSolver_parallel
 
 class AcousticObservablesTestCase(unittest.TestCase):
         """Unit test for acousticObservables.py.
@@ -92,6 +97,241 @@ class AcousticObservablesTestCase(unittest.TestCase):
 
             self.assertAlmostEqual(ratio, 1.,1)
 
+        def test_multiDetectorSignalGeneration(self):
+            """Perform unit test for batched detector positions.
+
+            The signals obtained for a batch of on-axis and off-axis detector
+            positions in a single pass over the ROI are compared to those 
+            obtained for each detector position separately. The batched 
+            signals are defined on a shared time axis, hence the comparison
+            is restricted to the length of the respective individual signal.
+            Detector positions of incompatible shapes have to be rejected.
+            """
+            c0   = 1500.
+            Nphi = 8
+            r, z = self.r[::5], self.z[::5]
+            Wrz  = np.exp(-r[:,np.newaxis]/r[-1])*self.Wrz[::5,::5]
+            rD   = np.array([0.,0.5*r[-1],r[-1]])
+            zD   = np.array([-0.9*z[-1],-0.5*z[-1],0.55*z[-1]])
+
+            tB,pB = pressure_multiDetector((r,z,Wrz),(rD,zD),c0,Nphi)
+
+            self.assertEqual(pB.shape,(rD.size,tB.size))
+            for n in range(rD.size):
+                t,p = pressure((r,z,Wrz),(rD[n],zD[n]),c0,Nphi)
+                nMin = min(t.size,tB.size)-1
+                self.assertTrue(np.allclose(tB[:nMin],t[:nMin]))
+                self.assertTrue(np.allclose(pB[n,:nMin],p[:nMin],
+                                            atol=1e-8*np.abs(p).max()))
+
+            # DETECTOR POSITIONS ARE BROADCAST AGAINST EACH OTHER
+            tS,pS = pressure_multiDetector((r,z,Wrz),(rD,zD[0]),c0,Nphi)
+            tB,pB = pressure_multiDetector((r,z,Wrz),(rD,zD[[0,0,0]]),c0,Nphi)
+            self.assertTrue(np.array_equal(pS,pB))
+            self.assertRaises(ValueError, pressure_multiDetector,
+                              (r,z,Wrz),(rD,zD[:2]),c0,Nphi)
+            self.assertRaises(ValueError, polarPoissonIntegralSolver_multiDetector,
+                              r, z, Wrz, rD, zD[:2], Nphi)
+
+        def test_parallelSolver(self):
+            """Perform unit test for multi-threaded Poisson integral solver.
+
+            For a single thread the multi-threaded solver has to reproduce 
+            the serial solver bit-for-bit. For several threads the order in 
+            which contributions are summed changes, hence the results are 
+            compared up to round-off. A number of threads below one has to
+            be rejected.
+            """
+            Nphi = 8
+            r, z = self.r[::4], self.z[::4]
+            Wrz  = np.exp(-r[:,np.newaxis]/r[-1])*self.Wrz[::4,::4]
+            rD, zD = 0.3*r[-1], -0.4*z[-1]
+
+            tS,IS = polarPoissonIntegralSolver(r, z, Wrz, rD, zD, Nphi)
+            t1,I1 = polarPoissonIntegralSolver_parallel(r, z, Wrz, rD, zD, Nphi, 1)
+            t4,I4 = polarPoissonIntegralSolver_parallel(r, z, Wrz, rD, zD, Nphi, 4)
+
+            self.assertTrue(np.array_equal(tS,t1))
+            self.assertTrue(np.array_equal(IS,I1))
+            self.assertTrue(np.allclose(IS,I4,rtol=1e-12,atol=0.))
+
+            t,p   = pressure((r,z,Wrz),(rD,zD),1500.,Nphi)
+            t,pP  = pressure((r,z,Wrz),(rD,zD),1500.,Nphi,4)
+            self.assertTrue(np.allclose(p,pP,atol=1e-10*np.abs(p).max()))
+            for nthreads in [0, -1]:
+                self.assertRaises(ValueError, pressure, (r,z,Wrz),(rD,zD),
+                                  1500.,Nphi,nthreads)
+                self.assertRaises(ValueError, velocityPotential, (r,z,Wrz),
+                                  (rD,zD),(1.,1.,1500.),None,nthreads)
+
+        def test_analyticAzimuthalIntegration(self):
+            """Perform unit test for analytic azimuthal integration.
+
+            For an on-axis detector, each ring of the ROI contributes to a 
+            single distance bin, hence the analytic azimuthal integration 
+            has to agree with the solver using a single azimuthal mesh-point.
+            For an off-axis detector, the sampled solver has to converge to 
+            the result of the analytic azimuthal integration.
+            """
+            c0   = 1500.
+            r, z = self.r[::4], self.z[::4]
+            Wrz  = np.exp(-r[:,np.newaxis]/r[-1])*self.Wrz[::4,::4]
+
+            t,p  = pressure((r,z,Wrz),(0.,-0.4*z[-1]),c0,1)
+            t,pA = pressure((r,z,Wrz),(0.,-0.4*z[-1]),c0,None)
+            self.assertTrue(np.allclose(p,pA,atol=1e-10*np.abs(p).max()))
+
+            rD, zD = 0.7*r[-1], -0.4*z[-1]
+            t,IA = velocityPotential((r,z,Wrz),(rD,zD),(1.,1.,c0),None)
+            t,IS = velocityPotential((r,z,Wrz),(rD,zD),(1.,1.,c0),2000)
+            self.assertLess(np.abs(IA-IS).sum()/np.abs(IS).sum(), 5e-3)
+            self.assertAlmostEqual(IA.sum()/IS.sum(), 1., 3)
+
+        def test_negativeDeflection(self):
+            """Perform unit test for detectors at negative axial deflection.
+
+            The geometry is symmetric in the sign of rD, hence the signals 
+            for rD and -rD obtained by analytic azimuthal integration have 
+            to agree up to round-off, and the sampled solvers and the error bound of
+            pruning have to be consistent with them.
+            """
+            c0   = 1500.
+            r, z = self.r[::4], self.z[::4]
+            Wrz  = np.exp(-r[:,np.newaxis]/r[-1])*self.Wrz[::4,::4]
+            rD, zD = 0.7*r[-1], -0.4*z[-1]
+
+            t,IA  = velocityPotential((r,z,Wrz),(rD,zD),(1.,1.,c0),None)
+            tN,IN = velocityPotential((r,z,Wrz),(-rD,zD),(1.,1.,c0),None,2)
+            self.assertTrue(np.array_equal(t,tN))
+            self.assertTrue(np.allclose(IA,IN,rtol=1e-12,atol=0.))
+            tS,IS = velocityPotential((r,z,Wrz),(-rD,zD),(1.,1.,c0),2000)
+            self.assertLess(np.abs(IN-IS).sum()/np.abs(IS).sum(), 5e-3)
+
+            t,p   = pressure((r,z,Wrz),(rD,zD),c0,None)
+            tN,pN = pressure((r,z,Wrz),(-rD,zD),c0,None)
+            self.assertTrue(np.array_equal(t,tN))
+            self.assertTrue(np.array_equal(p,pN))
+
+            for sign in [1., -1.]:
+                tau, I = polarPoissonIntegralSolver(r, z, Wrz, sign*rD, zD, 16)
+                WP, epsAchieved, nKept = pruneSource((r,z,Wrz),(sign*rD,zD),1e-3)
+                tauP, IP = polarPoissonIntegralSolver(r, z, WP, sign*rD, zD, 16)
+                self.assertTrue(epsAchieved <= 1e-3)
+                self.assertTrue(np.sum(np.abs(I-IP)) <= epsAchieved*np.sum(I))
+
+        def test_linearTimeBinning(self):
+            """Perform unit test for linear binning on a custom time grid.
+
+            The Poisson integral summed over all bins has to be conserved if
+            the contributions are split linearly among the bins of a custom 
+            time grid that covers the full range of the signal. Further, 
+            the pressure signal in the middle of the medium with constant 
+            absorbed volumetric energy density has to match the initial 
+            stress when computed on a coarse ROI and a fine time grid.
+            """
+            c0   = 1500.
+            G    = 0.138
+            Nphi = 8
+            r, z = self.r[::4], self.z[::4]
+            Wrz  = self.Wrz[::4,::4]
+            rD, zD = 0.3*r[-1], -0.4*z[-1]
+            dz   = z[1]-z[0]
+            t    = np.arange(-dz,3*z[-1],0.3*dz)/c0
+
+            tN,IN = velocityPotential((r,z,Wrz),(rD,zD),(1.,1.,c0),Nphi)
+            tL,IL = velocityPotential((r,z,Wrz),(rD,zD),(1.,1.,c0),Nphi,1,t)
+            self.assertTrue(np.allclose(tL,t))
+            self.assertAlmostEqual(IL.sum()*(tL[1]-tL[0])/(IN.sum()*(tN[1]-tN[0])),
+                                   1.,10)
+
+            zD = 0.5*(z[z.size/2]+z[1+z.size/2])
+            t  = np.arange(0.,z[-1],0.25*dz)/c0
+            tL,pL = pressure((r,z,G*Wrz),(0.,zD),c0,1,1,t)
+            ratio = np.mean(pL[4:40])/G/10**6
+            self.assertAlmostEqual(ratio, 1.,1)
+
+        def test_inputPrecisionAndLayout(self):
+            """Perform unit test for single precision and Fortran ordered input.
+
+            The solvers accept the initial acoustic stress profile in single
+            or double precision and in C or Fortran memory order without 
+            copying. The results have to agree with those for C ordered 
+            double precision input up to single precision round-off. 
+            The array passed to pressure has to reach the solver as is, and
+            since the solver takes it as typed memoryview, which rejects 
+            other dtypes instead of converting them, a read-only strided 
+            single precision view is used in place.
+            """
+            r, z = self.r[::4], self.z[::4]
+            Wrz  = np.exp(-r[:,np.newaxis]/r[-1])*self.Wrz[::4,::4]
+            rD, zD = 0.3*r[-1], -0.4*z[-1]
+
+            for Nphi in [8, None]:
+                t,p = pressure((r,z,Wrz),(rD,zD),1500.,Nphi)
+                for W in [Wrz.astype(np.float32), np.asfortranarray(Wrz),
+                          np.asfortranarray(Wrz,dtype=np.float32)]:
+                    tW,pW = pressure((r,z,W),(rD,zD),1500.,Nphi)
+                    self.assertTrue(np.array_equal(t,tW))
+                    self.assertTrue(np.allclose(p,pW,atol=1e-5*np.abs(p).max()))
+
+            W = np.zeros((2*r.size,3*z.size),dtype=np.float32)[::2,::3]
+            W[:] = Wrz
+            W.flags.writeable = False
+            received = []
+            def spy(r, z, p0rz, *args):
+                received.append(p0rz)
+                return polarPoissonIntegralSolver(r, z, p0rz, *args)
+            acousticObservables.polarPoissonIntegralSolver = spy
+            try:
+                tW,pW = pressure((r,z,W),(rD,zD),1500.,8)
+            finally:
+                acousticObservables.polarPoissonIntegralSolver = \
+                        polarPoissonIntegralSolver
+            self.assertTrue(received[0] is W)
+            t,p = pressure((r,z,Wrz),(rD,zD),1500.,8)
+            self.assertTrue(np.allclose(p,pW,atol=1e-5*np.abs(p).max()))
+            self.assertRaises(TypeError, polarPoissonIntegralSolver,
+                              r, z, W.astype(np.float16), rD, zD, 8)
+
+
+        def test_errorBoundedPruning(self):
+            """Perform unit test for pruning of small contributions.
+
+            For a profile with long radial and axial tails, discarding the 
+            smallest contributions has to keep the relative L1 error of the
+            Poisson integral below the reported bound, which in turn must 
+            not exceed the requested one. Pruned mesh-points are skipped by
+            the solver and for epsL1=0 only the mesh-points on the beam axis,
+            which do not contribute, may be discarded.
+            """
+            Nphi = 16
+            r, z = self.r[::4], self.z[::4]
+            Wrz  = np.exp(-(r[:,np.newaxis]/(0.05*r[-1]))**2)*self.Wrz[::4,::4]
+            Wrz *= np.exp(-z/(0.1*z[-1]))
+            rD, zD = 0.2*r[-1], -0.3*z[-1]
+
+            tau, I = polarPoissonIntegralSolver(r, z, Wrz, rD, zD, Nphi)
+            for epsL1 in [1e-6, 1e-3]:
+                WP, epsAchieved, nKept = pruneSource((r,z,Wrz),(rD,zD),epsL1)
+                tauP, IP = polarPoissonIntegralSolver(r, z, WP, rD, zD, Nphi)
+                self.assertTrue(epsAchieved <= epsL1)
+                self.assertTrue(0 < nKept < Wrz.size)
+                self.assertEqual(nKept, np.count_nonzero(WP))
+                self.assertTrue(np.sum(np.abs(I-IP)) <= epsAchieved*np.sum(I))
+
+            WP, epsAchieved, nKept = pruneSource((r,z,Wrz),(rD,zD),0.)
+            self.assertEqual((epsAchieved, nKept),(0., np.count_nonzero(Wrz[r>0])))
+
+            WP = pruneSource((r,z,Wrz),(rD,zD),1e-3)[0]
+            t, p = pressure((r,z,WP),(rD,zD),1500.,Nphi)
+            tP, pP = pressure((r,z,Wrz),(rD,zD),1500.,Nphi,epsL1=1e-3)
+            self.assertTrue(np.array_equal(t,tP))
+            self.assertTrue(np.array_equal(p,pP))
+            t, phi = velocityPotential((r,z,WP),(rD,zD),(1.,1.,1500.),Nphi)
+            tP, phiP = velocityPotential((r,z,Wrz),(rD,zD),(1.,1.,1500.),Nphi,
+                                         epsL1=1e-3)
+            self.assertTrue(np.array_equal(phi,phiP))
+
 
 if __name__ == "__main__":
         unittest.main()
@@ -0,0 +1,93 @@
+""" FILE: test_forwardModel.py
+
+Unittest module for forwardModel.py
+"""
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import sys; sys.path.append("../")
+import os
+import tempfile
+import unittest
+import numpy as np
+from poissonIntegral_cython import polarPoissonIntegralSolver
+import forwardModel as fm
+
+class ForwardModelTestCase(unittest.TestCase):
+        """Unit test for forwardModel.py.
+        
+        Implements unit tests comparing the sparse forward model to the 
+        polar coordinate based Poisson integral solver.
+        Inherits from unittest.TestCase.
+        """
+
+        def setUp(self):
+            """Sets up unit test prerequisits.
+            
+            Attributes:
+                r: numpy array containing equidistant radial gridpoints. 
+                z: numpy array containing equidistant z-axis gridpoints.
+                Wrz: numpy array containing absorbed volumetric energy density.
+                (rD,zD): detector position.
+                Nphi: number of azimuthal mesh-points.
+            """
+            N      = 40
+            self.r = np.linspace(0.,N*20e-6,N,endpoint=False)
+            self.z = np.linspace(0.,N*20e-6,N,endpoint=False)
+            self.Wrz = np.exp(-self.r[:,np.newaxis]/self.r[-1]
+                              -self.z[np.newaxis,:]/self.z[-1])*10**6
+            self.rD, self.zD = 0.3*self.r[-1], -0.6*self.z[-1]
+            self.Nphi = 16
+
+
+        def tearDown(self):
+            """Deletes all attributes set by method setUp()."""
+            del self.r
+            del self.z
+            del self.Wrz
+
+
+        def test_forwardModel_matchesSolver(self):
+            """Perform unit test comparing forward model and solver.
+
+            The sparse matrix-vector product has to reproduce the Poisson
+            integral of the solver up to round-off. A stack of initial 
+            stress profiles is processed as multiple right hand sides.
+            """
+            tau, I = polarPoissonIntegralSolver(self.r, self.z, self.Wrz, 
+                                self.rD, self.zD, self.Nphi)
+            M = fm.forwardModelMatrix((self.r,self.z),(self.rD,self.zD),
+                                self.Nphi)
+            tauM, IM = fm.applyForwardModel(M, self.Wrz)
+
+            self.assertTrue(np.allclose(tau,tauM))
+            self.assertTrue(np.allclose(I,IM,rtol=1e-12,atol=0.))
+
+            tauM, IS = fm.applyForwardModel(M, [self.Wrz, 2*self.Wrz])
+            self.assertEqual(IS.shape,(2,tau.size))
+            self.assertTrue(np.allclose(IS[1],2*I,rtol=1e-12,atol=0.))
+
+
+        def test_forwardModel_readWrite(self):
+            """Perform unit test on storing and loading the forward model."""
+            tau, A = fm.forwardModelMatrix((self.r,self.z),(self.rD,self.zD),
+                                self.Nphi)
+            fd, fName = tempfile.mkstemp(suffix='.npz')
+            os.close(fd)
+            try:
+                fm.writeForwardModel(tau, A, fName)
+                tauR, AR = fm.readForwardModel(fName)
+            finally:
+                os.remove(fName)
+
+            self.assertTrue(np.array_equal(tau,tauR))
+            self.assertEqual((A-AR).nnz, 0)
+
+
+if __name__ == "__main__":
+        unittest.main()
+
+# EOF: test_forwardModel.py
@@ -1,2 +1,4 @@
 import irradiationSourceProfile as isp
 from convolveRadiallySymmetricFunctions import convolveROI
+from hankelTransform import HankelPlan, FFTLogPlan
+from cartesianConvolution import convolveXY
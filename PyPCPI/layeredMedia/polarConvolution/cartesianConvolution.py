@@ -0,0 +1,99 @@
+""" FILE: cartesianConvolution.py
+
+Module implementing the convolution of the material response of a layered
+medium to an infinitely narrow photon beam with a beam profile of arbitrary
+shape, e.g. an elliptical or offset beam, in cartesian coordinates.
+
+At each depth, the radially symmetric pencil beam response is resampled
+onto the lateral offsets of an equispaced (x,y) grid and convolved with the
+beam profile by FFT. The result is a voxelized volumetric energy density
+that can be passed to the Poisson integral solvers for voxelized media.
+
+"""
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import numpy as np
+import scipy.fftpack
+try:
+    from PyPCPI.cache import memoize
+except ImportError:
+    # CACHE LAYER UNAVAILABLE OUTSIDE OF THE PyPCPI PACKAGE
+    memoize = lambda *args, **kwargs: (lambda func: func)
+
+
+def _resamplingWeights(r,(dx,dy),(Nx,Ny)):
+        """Linear interpolation weights of the radial grid r at the distances
+        of all lateral offsets (i*dx, j*dy), |i|<Nx, |j|<Ny."""
+        X = dx*np.arange(-(Nx-1),Nx)
+        Y = dy*np.arange(-(Ny-1),Ny)
+        u = (np.hypot(Y[:,np.newaxis],X[np.newaxis,:]) - r[0])/(r[1]-r[0])
+        u = np.maximum(u, 0.)
+        i0 = np.floor(u).astype(int)
+        w = u - i0
+        # NO RESPONSE BEYOND THE RADIAL GRID
+        inside = i0 < r.size-1
+        i0 = np.minimum(i0, r.size-2)
+        return i0, w*inside, (1.-w)*inside
+
+
+@memoize()
+def convolveXY(r,z,grz,(x,y),fxy,P=1.0):
+        """Compute voxelized response to an arbitrary irradiation source profile.
+
+        Computes the full 2D convolution of the pencil beam response with a
+        beam profile sampled on an equispaced (x,y) grid, at each
+        z-coordinate of the region of interest (ROI).
+
+        Args:
+            r (numpy array, ndim=1): equispaced 1D grid for radial coordinate.
+            z (numpy array, ndim=1): equispaced 1D grid for depth coordinate.
+            grz (numpy array, ndim=2): response to infinitely narrow beam.
+            x (numpy array, ndim=1): equispaced 1D grid for x-coordinate.
+            y (numpy array, ndim=1): equispaced 1D grid for y-coordinate.
+            fxy (numpy array, ndim=2): beam profile with shape (Ny,Nx), e.g.
+                obtained from voxelizedMedia.pureAbsorber.
+                irradiationSourceProfile.
+            P (float): beam intensity (default: 1.0).
+
+        Returns:
+            (x,y,z) (3-tuple, numpy arrays): Equi-spaced x, y, z grids.
+            Wxyz (numpy array, ndim=3): response to spatially extended
+                irradiation source profile with shape (Nz,Ny,Nx), see
+                voxelizedMedia.poissonIntegralSolver.pressure.
+
+        Notes:
+            The beam profile is normalized to intensity P by its sum over
+            the grid, i.e. the volumetric energy density deposited by a beam
+            that lies well within the (x,y) grid is that of the radially
+            symmetric convolution, see convolveROI, up to the error due to
+            linear interpolation of the pencil beam response and due to the
+            lateral sampling. The pencil beam response is taken as zero
+            beyond the last radial gridpoint.
+
+            The cost is one FFT of size (3Ny-2)*(3Nx-2) per depth.
+        """
+        dx, dy = x[1]-x[0], y[1]-y[0]
+        Ny, Nx = np.shape(fxy)
+        if (Ny, Nx) != (y.size, x.size):
+            raise ValueError("beam profile does not match (x,y) grid")
+        Ly = scipy.fftpack.next_fast_len(3*Ny-2)
+        Lx = scipy.fftpack.next_fast_len(3*Nx-2)
+
+        # Normalized beam profile in Fourier space
+        f0 = P/(np.sum(fxy)*dx*dy)
+        F = np.fft.rfft2(np.asarray(fxy, dtype=float), (Ly,Lx))*f0*dx*dy
+
+        i0, w1, w0 = _resamplingWeights(r,(dx,dy),(Nx,Ny))
+        Wxyz = np.empty((z.size,Ny,Nx))
+        for iz in range(z.size):
+            # Pencil beam response resampled onto lateral offsets
+            K = w0*grz[i0,iz] + w1*grz[i0+1,iz]
+            Wxyz[iz] = np.fft.irfft2(F*np.fft.rfft2(K,(Ly,Lx)),
+                                     (Ly,Lx))[Ny-1:2*Ny-1,Nx-1:2*Nx-1]
+        return (x,y,z), Wxyz
+
+# EOF: cartesianConvolution.py
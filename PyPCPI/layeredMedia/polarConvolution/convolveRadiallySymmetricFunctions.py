@@ -20,6 +20,11 @@ import scipy.special as scs
 import numpy as np 
 import irradiationSourceProfile
 import hankelTransform
+try:
+    from PyPCPI.cache import memoize
+except ImportError:
+    # CACHE LAYER UNAVAILABLE OUTSIDE OF THE PyPCPI PACKAGE
+    memoize = lambda *args, **kwargs: (lambda func: func)
 
 
 def convolve(r,rho,G0,F0):
@@ -62,7 +67,8 @@ def convolve(r,rho,G0,F0):
         rhoG0F0J0 = rho*G0*F0*scs.j0(rho*r[:,np.newaxis])
         return 2*np.pi*np.trapz(rhoG0F0J0, rho, axis=1)
 
-def convolveROI(r,z,grz,fr,P=1.0):
+@memoize(version=2, depends=(hankelTransform, irradiationSourceProfile))
+def convolveROI(r,z,grz,fr,P=1.0,plan=None,method='trapz'):
         """Compute response to spatially extended irradiation source profile.
 
         Computes full 2D convolution of pencil beam response with extended
@@ -72,12 +78,25 @@ def convolveROI(r,z,grz,fr,P=1.0):
             r (numpy array, ndim=1): equispaced 1D grid for radial coordinate.
             z (numpy array, ndim=1): equispaced 1D grid for depth coordinate.
             grz (numpy array, ndim=2): response to infinitely narrow beam.
-            fr (numpy array, ndim=1): radial beam profile.
-            P (float): beam intensity (default: 1.0).
+            fr (numpy array, ndim=1, or beam profile object): radial beam 
+                profile sampled on r, or profile with closed-form Hankel 
+                transform, e.g. irradiationSourceProfile.GaussianProfile.
+                A list of such profiles, or an array with shape (Np,Nr) of 
+                Np sampled profiles, yields the responses to all of them.
+            P (float or sequence of floats): beam intensity, or one 
+                intensity per profile (default: 1.0).
+            plan (HankelPlan or FFTLogPlan): precomputed Hankel transform 
+                for the grid `r` (default: plan=None, i.e. set up for this 
+                call according to `method`).
+            method (str): Hankel transform used if no plan is given, either 
+                'trapz' for the trapezoidal rule, see HankelPlan, or 'fftlog'
+                for the fast transform on a logarithmic grid, see FFTLogPlan
+                (default: method='trapz').
 
         Returns:
             Wrz (numpy array, ndim=2): response to spatially extended 
-                irradiation source profile.
+                irradiation source profile, with shape (Np,Nr,Nz) for Np 
+                profiles.
 
         See Also:
             convolve: 2D convolution of two radially symmetric functions.
@@ -87,7 +106,27 @@ def convolveROI(r,z,grz,fr,P=1.0):
             material response to an extended photon beam with given radial 
             profile is obtained as convolution of two radially symmetric 
             functions for given z-coordinate, see Eq. (84) of Ref. [1]. For the
-            integration, a numpy native trapezoidal rule is used.
+            integration, a trapezoidal rule is used.
+
+            The Hankel transforms of the pencil beam response at all depths
+            and the subsequent convolution integrals are each evaluated as a
+            single matrix product using the kernel J0(r*rho) held by `plan`.
+            Pass a plan, possibly loaded from disk, to reuse the kernel for
+            several calls on the same radial grid. For fine radial grids,
+            method='fftlog' replaces the O(Nr^2) matrix products by FFTs on 
+            a logarithmic grid of M ~ Nr*(ln(Nr)+4.6) mesh-points, which is
+            faster beyond about Nr = 1500, see FFTLogPlan. The depths are 
+            processed in blocks, such that the transforms of a block hold
+            at most 2**22 floats per profile.
+
+            For a beam profile object, its exact Hankel transform and 
+            normalization are used, avoiding the truncation error of the 
+            numerical transform of a sampled profile with sharp edges.
+
+            For several profiles, the transform of the pencil beam response
+            is computed once and the convolution integrals for all profiles
+            and depths are evaluated as one stacked matrix product, which 
+            requires two arrays of Np*Nr*Nz floats.
 
         Refs:
             [1] Operational and convolution properties of two-dimensional 
@@ -95,24 +134,41 @@ def convolveROI(r,z,grz,fr,P=1.0):
                 Baddour, N.
                 J. Opt. Soc. Am. A 26 (2009) 1767-1777 
         """
-        Wrz  = np.zeros(grz.shape)
-
-        # Normalize beam profile using function from isp module
-        f0 = irradiationSourceProfile.beamProfNormalization(r,fr,P)
-        # Hankel transform of beam profile will be used repeatedly so 
-        # precompute it here for time-efficiency 
-        rho,F0 = hankelTransform.zeroOrderHankelTrafo(r,fr)
-
-        for iz in range(z.size):
-            # Hankel transform of response to pencil beam
-            rho,G0 = hankelTransform.zeroOrderHankelTrafo(r,grz[:,iz])
-            # Gibbs-phenomenon workaround: trimm off all negative valued 
-            # contributions to volumetric energy density at given depth
-            hr = convolve(r,rho,G0,F0)
-            hr = np.abs(hr)
-            #hr = np.maximum(hr,np.zeros(hr.size))
-            # Normalize contribution to volumetric energy density
-            Wrz[:,iz] = f0*hr
-        return Wrz
+        if plan is None:
+            if method not in ('trapz', 'fftlog'):
+                raise ValueError("unknown Hankel transform method %r" % method)
+            plan = (hankelTransform.HankelPlan(r) if method == 'trapz' else 
+                    hankelTransform.FFTLogPlan(r))
+        elif not np.array_equal(plan.r, r):
+            raise ValueError("plan refers to a different radial grid")
+
+        batch = isinstance(fr, (list, tuple)) or np.ndim(fr) == 2
+        profiles = fr if batch else [fr]
+        P = np.broadcast_to(np.asarray(P, dtype=float), (len(profiles),))
+
+        # Hankel transforms of normalized beam profiles, exact for beam 
+        # profile objects
+        rho = plan.rho
+        f0, F0 = np.empty(len(profiles)), np.empty((len(profiles),rho.size))
+        for m, prof in enumerate(profiles):
+            if hasattr(prof, 'hankel'):
+                f0[m], F0[m] = prof.norm(P[m]), prof.hankel(rho)
+            else:
+                f0[m] = irradiationSourceProfile.beamProfNormalization(r,prof,P[m])
+                rho,F0[m] = plan.transform(prof)
+        # Hankel transforms of response to pencil beam and convolution 
+        # integrals for all profiles, see convolve, for blocks of depths 
+        # holding at most 2**22 floats on the grid rho.
+        # Gibbs-phenomenon workaround: trimm off all negative valued 
+        # contributions to volumetric energy density at given depth
+        hrz = np.empty((len(profiles),)+np.shape(grz))
+        nz = max(1, 2**22//rho.size)
+        for k in range(0, hrz.shape[-1], nz):
+            rho,G0 = plan.transform(grz[:,k:k+nz])
+            hrz[:,:,k:k+nz] = 2*np.pi*plan.inverse(G0*F0[:,:,np.newaxis])
+        # Normalize contribution to volumetric energy density
+        Wrz = np.abs(hrz)
+        Wrz *= f0[:,np.newaxis,np.newaxis]
+        return Wrz if batch else Wrz[0]
 
 # EOF: convolveRadiallySymmetricFunctions.py
@@ -16,6 +16,10 @@ Refs:
         Gopalan, K. and Chen, C. S. 
         Journal of the Franklin Institute, 316 (1983) 317-326
 
+    [4] Uncorrelated modes of the non-linear power spectrum
+        Hamilton, A. J. S.
+        Mon. Not. R. Astron. Soc. 312 (2000) 257-284 (Appendix B)
+
 """
 
 __authors__   = "O. Melchert"
@@ -25,6 +29,7 @@ __contact__   = "oliver.melchert@hot.uni-hannover.de"
 
 import scipy
 import scipy.special as scs
+import scipy.fftpack
 import numpy as np 
 
 def zeroOrderHankelTrafo(r,fr):
@@ -65,4 +70,324 @@ def zeroOrderHankelTrafo(r,fr):
         rfrJ0 = r*fr*scs.j0(r*rho[:,np.newaxis])
         return rho,np.trapz(rfrJ0,x=r,axis=1) 
 
+
+def _trapzWeights(x):
+        """Weights of the trapezoidal rule for equi-spaced samples x."""
+        w = np.empty(x.size)
+        w[:] = x[1]-x[0]
+        w[0] *= 0.5
+        w[-1] *= 0.5
+        return w
+
+
+class HankelPlan(object):
+        """Precomputed zero order Hankel transform for a fixed radial grid.
+
+        Holds the kernel J0(r*rho) for the radial grid `r` and the
+        complementary grid `rho` used by zeroOrderHankelTrafo, so that 
+        transforms of many functions on the same grid, e.g. the pencil beam
+        response at all depths, reduce to a single matrix product each.
+
+        Attributes:
+            r (numpy array, ndim=1): equi-spaced radial grid.
+            rho (numpy array, ndim=1): equi-spaced complementary grid.
+
+        Example:
+            plan = HankelPlan(r)
+            rho, G0 = plan.transform(grz)
+            plan.save('plan.npz')
+            plan = HankelPlan.load('plan.npz', r)
+        """
+
+        def __init__(self, r, J0=None):
+            """Set up plan for radial grid r, computing J0(r*rho) if not given."""
+            self.r = np.asarray(r, dtype=float)
+            self.rho = np.linspace(0,1./(2.*(r[1]-r[0])),r.size,endpoint=False)
+            if J0 is None:
+                J0 = scs.j0(self.r[:,np.newaxis]*self.rho)
+            if np.shape(J0) != (self.r.size, self.rho.size):
+                raise ValueError("kernel does not match radial grid")
+            self._J0 = J0
+            self._wr = _trapzWeights(self.r)*self.r
+            self._wrho = _trapzWeights(self.rho)*self.rho
+
+        @classmethod
+        def load(cls, fName, r=None):
+            """Load plan saved by method save.
+
+            Args:
+                fName (str): name of .npz file.
+                r (numpy array, ndim=1): radial grid the plan is expected to
+                    refer to (default: r=None, i.e. not checked).
+
+            Returns:
+                plan (HankelPlan): plan stored in file `fName`.
+
+            Notes:
+                Raises ValueError if the stored radial grid differs from `r`.
+            """
+            with np.load(fName) as f:
+                rPlan, J0 = f['r'], f['J0']
+            if r is not None and not np.array_equal(rPlan, r):
+                raise ValueError("plan %s refers to a different radial grid" % fName)
+            return cls(rPlan, J0)
+
+        def save(self, fName):
+            """Save plan to .npz file `fName`."""
+            np.savez(fName, r=self.r, J0=self._J0)
+
+        def cacheKey(self):
+            """Radial grid, which determines the plan, see PyPCPI.cache."""
+            return self.r
+
+        def transform(self, fr):
+            """Compute zero order Hankel transform.
+
+            Args:
+                fr (numpy array, ndim=1 or 2): objective function sampled on 
+                    r, or array with shape (Nr,N) of N such functions.
+
+            Returns:
+                rho (numpy array, ndim=1): equi-spaced complementary grid.
+                F0 (numpy array): zeroth order Hankel transform of objective
+                    function(s), with the shape of `fr`.
+
+            Notes:
+                Agrees with zeroOrderHankelTrafo up to round-off, at the cost 
+                of one matrix product instead of one evaluation of J0(r*rho)
+                per function.
+            """
+            fr = np.asarray(fr, dtype=float)
+            wr = self._wr if fr.ndim == 1 else self._wr[:,np.newaxis]
+            return self.rho, np.dot(self._J0.T, wr*fr)
+
+        def inverse(self, F0):
+            """Compute zero order Hankel transform from rho back to r.
+
+            Args:
+                F0 (numpy array, ndim=1, 2 or 3): function sampled on rho, 
+                    array with shape (Nrho,N) of N such functions, or stack
+                    of M such arrays with shape (M,Nrho,N).
+
+            Returns:
+                fr (numpy array): zeroth order Hankel transform of F0 
+                    evaluated on r, with the shape of `F0`.
+            """
+            F0 = np.asarray(F0, dtype=float)
+            wrho = self._wrho if F0.ndim == 1 else self._wrho[:,np.newaxis]
+            return np.matmul(self._J0, wrho*F0)
+
+
+class FFTLogPlan(object):
+        """Fast zero order Hankel transform on a logarithmic grid (FFTLog).
+
+        Alternative to HankelPlan for fine radial grids. Functions sampled
+        on the equi-spaced radial grid `r` are interpolated linearly onto a
+        logarithmic grid, whose spacing at r[-1] matches that of `r`, and 
+        transformed by the FFTLog algorithm of Ref. [4] onto the reciprocal
+        logarithmic grid `rho`. Inverse transforms are interpolated back 
+        onto `r`. The logarithmic grid spans ln(Nr) e-folds plus a padding
+        of one decade at either end with mesh-spacing 1/Nr, i.e. it has 
+        M ~ Nr*(ln(Nr)+4.6) mesh-points. A transform costs O(M log M) 
+        operations per function, compared to O(Nr^2) for HankelPlan, which
+        in addition holds a kernel of Nr^2 floats. For the convolutions of
+        convolveROI on a single core, FFTLogPlan is faster beyond about 
+        Nr = 1500, e.g. by factors 1.3 and 3 at Nr = 2000 and 8000.
+
+        Attributes:
+            r (numpy array, ndim=1): equi-spaced radial grid.
+            rho (numpy array, ndim=1): logarithmic complementary grid.
+
+        Example:
+            plan = FFTLogPlan(r)
+            rho, G0 = plan.transform(grz)
+            grz = plan.inverse(G0)
+
+        Notes:
+            The function is taken to be constant below r[0] and to vanish 
+            beyond r[-1]. Since the FFT implies a function periodic on the
+            logarithmic grid, two Gaussians matching the function and its 
+            transform at the origin are subtracted, and their exact 
+            transforms are added, see _correct. The remainder decays as a 
+            power of r and rho towards both ends of the grid, so that a 
+            padding of one decade suffices. For smooth functions, the 
+            transform and its inverse agree with the exact ones at least 
+            as well as those of HankelPlan.
+
+            Transforms of several functions are computed in blocks of 
+            _chunk floats on the logarithmic grid, which bounds the memory
+            required besides input and output. Note that the output of 
+            transform holds M instead of Nr floats per function.
+
+        Refs:
+            [4] Uncorrelated modes of the non-linear power spectrum
+                Hamilton, A. J. S.
+                Mon. Not. R. Astron. Soc. 312 (2000) 257-284 (Appendix B)
+        """
+        # BIAS OF THE POWER-LAW EXPANSION, PADDING [DECADES] OF THE 
+        # LOGARITHMIC GRID BELOW r[1]-r[0] AND BEYOND r[-1], AND NUMBER OF
+        # FLOATS OF THE BLOCKS OF FUNCTIONS TRANSFORMED AT ONCE
+        _q = 0.5
+        _pad = (1, 1)
+        _chunk = 2**19
+
+        def __init__(self, r):
+            """Set up plan for radial grid r."""
+            self.r = np.asarray(r, dtype=float)
+            dr = self.r[1]-self.r[0]
+            rMin, rMax = dr*10.**-self._pad[0], self.r[-1]*10.**self._pad[1]
+            d = dr/self.r[-1]
+            M = scipy.fftpack.next_fast_len(int(np.ceil(np.log(rMax/rMin)/d)))
+            # RECIPROCAL LOGARITHMIC GRIDS, x[j]*rho[M-1-j] = 1
+            self._x = rMin*np.exp(d*np.arange(M))
+            self.rho = np.exp(-d*np.arange(M)[::-1])/rMin
+            # FOURIER COEFFICIENTS OF THE KERNEL, see Eq. (B4) of Ref. [4] 
+            w = 2*np.pi*np.arange(M//2+1)/(M*d)
+            s = self._q + 1j*w
+            self._u = np.exp((s-1.)*np.log(2.) + scs.loggamma(0.5*s) - 
+                             scs.loggamma(1.-0.5*s) + 1j*w*d*(M-1))
+            if M % 2 == 0:
+                self._u[-1] = self._u[-1].real
+            # LINEAR INTERPOLATION FROM r ONTO x ...
+            n = np.searchsorted(self._x, self.r[-1], side='right')
+            u = np.maximum(self._x[:n]-self.r[0], 0.)/dr
+            self._i = np.minimum(np.floor(u).astype(int), self.r.size-2)
+            self._wi = u - self._i
+            # ... AND BACK, CONSTANT BELOW A TENTH OF THE RADIAL SPACING
+            u = np.log(np.maximum(self.r, 0.1*dr)/rMin)/d
+            self._j = np.minimum(np.floor(u).astype(int), M-2)
+            self._wj = u - self._j
+            # BIASES OF THE TRANSFORMS FROM x TO rho AND BACK, see _fftlog,
+            # AND THEIR CORRECTIONS, see _correct
+            self._fwd = (self._x**(2.-self._q), self.rho**-self._q)
+            self._bwd = (self.rho**(2.-self._q), self._x**-self._q)
+            self._cFwd = self._correction(self._x, self._fwd, self.rho, 
+                                          lambda F: F)
+            self._cBwd = self._correction(self.rho, self._bwd, self.r, 
+                                          self._interpolate)
+
+        def cacheKey(self):
+            """Radial grid, which determines the plan, see PyPCPI.cache."""
+            return self.r
+
+        def _fftlog(self, f, (px, py)):
+            """Transform of the rows of f sampled on x, evaluated on y, for
+            the biases px=x**(2-q) and py=y**-q, overwriting f."""
+            u, M = self._u, px.size
+            f *= px
+            # FOURIER COEFFICIENTS a[k], PACKED AS a[0], Re a[1], Im a[1], 
+            # ..., see scipy.fftpack.rfft, TIMES u[k] AND CONJUGATED, SINCE 
+            # THE GRID y IS REVERSED
+            a = scipy.fftpack.rfft(f, axis=1, overwrite_x=True)
+            re, im = a[:,1:M-1+M%2:2], a[:,2:M:2]
+            ur, ui = u[1:im.shape[1]+1].real, u[1:im.shape[1]+1].imag
+            reU = re*ur - im*ui
+            im *= -ur
+            im -= re*ui
+            re[:] = reU
+            a[:,0] *= u[0].real
+            if M % 2 == 0:
+                a[:,-1] *= u[-1].real
+            F = scipy.fftpack.irfft(a, axis=1, overwrite_x=True)
+            F *= py
+            return F
+
+        def _correction(self, x, bias, t, toT):
+            """Corrections of the transforms by _fftlog from x onto t.
+
+            Returns widths s[k] = 2**k s[0] of Gaussians on x, well within
+            the logarithmic grid, the weights wx of the trapezoidal rule in 
+            ln(x) for the integral of x f(x), and the differences D of the 
+            exact transforms of the Gaussians and those by _fftlog, mapped
+            onto t by toT, see _correct.
+            """
+            s = 10.*x[0]*2.**np.arange(int(np.log2(0.01*x[-1]/x[0]))+1)
+            wx = x*x*np.log(x[1]/x[0])
+            wx[[0,-1]] *= 0.5
+            gx = np.exp(-0.5*np.multiply.outer(1./s, x)**2)
+            gt = (s*s)[:,np.newaxis]*np.exp(-0.5*np.multiply.outer(s, t)**2)
+            return s, wx, gt - toT(self._fftlog(gx, bias))
+
+        def _correct(self, f, (s, wx, D)):
+            """Correction of the transforms of the rows of f by _fftlog.
+
+            Two Gaussians of adjacent widths s[k], s[k+1] are matched to 
+            f(0) and the integral of x f(x), i.e. the transform of f at the
+            origin, where s[k]**2 bracket their ratio if possible. Since f
+            less these Gaussians decays as a power of x and of the 
+            reciprocal variable towards both ends of the logarithmic grids,
+            adding the differences D of their exact transforms and those by
+            _fftlog corrects the transform of f for the periodicity implied
+            by the FFT.
+            """
+            f0, m = f[:,0], np.dot(f, wx)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                k = 0.5*np.log2(np.abs(m/f0))-np.log2(s[0])
+            k = np.clip(np.where(np.isfinite(k), k, s.size), 0, s.size-2)
+            k = k.astype(int)
+            n = np.arange(f.shape[0])
+            c = np.zeros((f.shape[0], s.size))
+            c[n,k+1] = (m - f0*s[k]**2)/(s[k+1]**2 - s[k]**2)
+            c[n,k] = f0 - c[n,k+1]
+            return np.dot(c, D)
+
+        def _interpolate(self, fx):
+            """Rows of fx sampled on x interpolated onto r."""
+            return (1.-self._wj)*fx[:,self._j] + self._wj*fx[:,self._j+1]
+
+        def _blocks(self, n):
+            """Slices of at most _chunk/M of n functions."""
+            step = max(1, self._chunk//self._x.size)
+            return [slice(k, k+step) for k in range(0, n, step)]
+
+        def transform(self, fr):
+            """Compute zero order Hankel transform.
+
+            Args:
+                fr (numpy array, ndim=1 or 2): objective function sampled on 
+                    r, or array with shape (Nr,N) of N such functions.
+
+            Returns:
+                rho (numpy array, ndim=1): logarithmic complementary grid.
+                F0 (numpy array): zeroth order Hankel transform of objective
+                    function(s), with shape (Nrho,) or (Nrho,N).
+            """
+            fr = np.asarray(fr, dtype=float)
+            frT = fr.reshape((fr.shape[0], -1)).T
+            # TRANSFORMS ARE STORED AS ROWS, I.E. F0 IS IN FORTRAN ORDER
+            F0 = np.empty((frT.shape[0], self.rho.size))
+            for b in self._blocks(frT.shape[0]):
+                fb = np.ascontiguousarray(frT[b])
+                fx = np.zeros((fb.shape[0], self._x.size))
+                fx[:,:self._wi.size] = ((1.-self._wi)*fb[:,self._i] + 
+                                        self._wi*fb[:,self._i+1])
+                G = self._correct(fx, self._cFwd)
+                F0[b] = self._fftlog(fx, self._fwd)
+                F0[b] += G
+            return self.rho, F0.T.reshape(self.rho.shape+fr.shape[1:])
+
+        def inverse(self, F0):
+            """Compute zero order Hankel transform from rho back to r.
+
+            Args:
+                F0 (numpy array, ndim=1, 2 or 3): function sampled on rho, 
+                    array with shape (Nrho,N) of N such functions, or stack
+                    of M such arrays with shape (M,Nrho,N).
+
+            Returns:
+                fr (numpy array): zeroth order Hankel transform of F0 
+                    evaluated on r, with shape (Nr,), (Nr,N) or (M,Nr,N).
+            """
+            F0 = np.asarray(F0, dtype=float)
+            if F0.ndim == 3:
+                return np.array([self.inverse(F) for F in F0])
+            F0T = F0.reshape((F0.shape[0], -1)).T
+            fr = np.empty((self.r.size, F0T.shape[0]))
+            for b in self._blocks(F0T.shape[0]):
+                fx = F0T[b].copy()
+                G = self._correct(fx, self._cBwd)
+                fx = self._fftlog(fx, self._bwd)
+                fr[:,b] = (self._interpolate(fx) + G).T
+            return fr.reshape(self.r.shape+F0.shape[1:])
+
 # EOF: hankelTransform.py
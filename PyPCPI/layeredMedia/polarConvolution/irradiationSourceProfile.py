@@ -31,6 +31,7 @@ __license__   = "3-clause BSD License"
 __contact__   = "oliver.melchert@hot.uni-hannover.de"
 
 import numpy as np 
+import scipy.special as scs
 
 
 def beamProfNormalization(r,f,P=1.0):
@@ -109,4 +110,193 @@ def flatTopDonut(r, (R0,R1,D0,D1)=(0.5,0.7,0.1,0.1)):
                     lambda r: np.exp(-2*(r-R1)**2/D1**2)]
         return np.piecewise(r,condList,funcList)
 
+
+def _gaussianShell(rho,(a,b),(R0,D0),nMax=2048):
+        """Hankel transform of r -> exp(-2(r-R0)^2/D0^2) restricted to [a,b].
+
+        Evaluated by Gauss-Legendre quadrature with enough nodes to resolve
+        the oscillations of J0(rho*r) on [a,b], for chunks of rho. Beyond 
+        the range of rho resolved by nMax nodes, the leading term 
+        [r f(r) J1(rho*r)/rho]_a^b of the expansion obtained by integration 
+        by parts is used. Since the derivative of the shells used by the 
+        profiles vanishes at the finite boundaries, up to exp(-50), the 
+        error of the latter decays as rho^-3.5.
+        """
+        rho = np.asarray(rho, dtype=float)
+        F = np.zeros(rho.shape)
+        if b <= a:
+            return F
+        f = lambda r: np.exp(-2*(r-R0)**2/D0**2)
+        quad = np.abs(rho) <= 0.5*(nMax-64)/(b-a)
+        rq = rho[quad]
+        if rq.size:
+            n = 64 + int(2.*np.max(np.abs(rq))*(b-a))
+            s, w = np.polynomial.legendre.leggauss(n)
+            r, w = 0.5*(b-a)*s + 0.5*(a+b), 0.5*(b-a)*w
+            wrf = w*r*f(r)
+            # CHUNKS OF rho BOUND THE MEMORY OF THE MATRIX J0(rho*r)
+            nChunk = max(1, 2**20//n)
+            F[quad] = np.concatenate([
+                        np.dot(scs.j0(np.multiply.outer(rq[i:i+nChunk],r)), wrf)
+                        for i in range(0, rq.size, nChunk)])
+        rr = rho[~quad]
+        F[~quad] = (b*f(b)*scs.j1(rr*b) - a*f(a)*scs.j1(rr*a))/rr
+        return F
+
+
+def _disc(rho,R):
+        """Hankel transform of the indicator function of [0,R), i.e. the 
+        integral of r J0(rho*r) over [0,R)."""
+        rho = np.asarray(rho, dtype=float)
+        F = np.empty(rho.shape)
+        F[rho == 0] = 0.5*R*R
+        rr = rho[rho != 0]
+        F[rho != 0] = R*scs.j1(rr*R)/rr
+        return F
+
+
+def _gaussianRing((R0,D0)):
+        """Integral of r exp(-2(r-R0)^2/D0^2) over [0,inf)."""
+        return (0.25*D0*D0*np.exp(-2.*R0*R0/D0/D0) 
+                + R0*D0*np.sqrt(np.pi/8.)*(1.+scs.erf(np.sqrt(2.)*R0/D0)))
+
+
+class _ProfileMixin(object):
+        """Normalization, cache key and representation of beam profiles.
+
+        Shared by the beam profile classes, which hold their parameters in
+        the tuple _params and implement
+            __call__(r): beam profile f sampled on radial grid r,
+            hankel(rho): zeroth order Hankel transform 
+                F0(rho) = int r f(r) J0(rho r) dr on complementary grid rho,
+            _area(): integral of r f(r) over [0,inf).
+        Instances can be passed as radial beam profile to convolveROI, which
+        then uses the exact transform and normalization instead of those of
+        the sampled profile.
+        """
+
+        def norm(self, P=1.0):
+            """Beam profile normalization factor P/N for N = 2 pi int r f dr,
+            see beamProfNormalization."""
+            return P/(2*np.pi*self._area())
+
+        def cacheKey(self):
+            """Profile parameters, see PyPCPI.cache."""
+            return self._params
+
+        def __repr__(self):
+            return '%s%r' % (type(self).__name__, self._params)
+
+
+class TopHatProfile(_ProfileMixin):
+        """Top-hat beam profile, see topHat.
+
+        Args:
+            A0 (float): Top hat width (default: 0.2).
+
+        Notes:
+            F0(rho) = A0 J1(rho A0)/rho.
+        """
+
+        def __init__(self, A0=0.2):
+            self._params = (A0,)
+
+        def __call__(self, r):
+            return topHat(r,*self._params)
+
+        def _area(self):
+            return 0.5*self._params[0]**2
+
+        def hankel(self, rho):
+            return _disc(rho,self._params[0])
+
+
+class GaussianProfile(_ProfileMixin):
+        """Gaussian beam profile, see Gaussian.
+
+        Args:
+            R0 (float): radial offset of maximum (default: 0.).
+            A0 (float): 1/e2-width of Gaussian (default: 0.2).
+
+        Notes:
+            For R0=0, F0(rho) = A0^2/4 exp(-rho^2 A0^2/8). Otherwise the
+            transform is obtained by quadrature.
+        """
+
+        def __init__(self, R0=0., A0=0.2):
+            self._params = (R0, A0)
+
+        def __call__(self, r):
+            return Gaussian(r,self._params)
+
+        def _area(self):
+            return _gaussianRing(self._params)
+
+        def hankel(self, rho):
+            R0, A0 = self._params
+            if R0 == 0.:
+                return 0.25*A0*A0*np.exp(-np.asarray(rho)**2*A0*A0/8.)
+            return _gaussianShell(rho,(max(0.,R0-5*A0),R0+5*A0),(R0,A0))
+
+
+class FlatTopProfile(_ProfileMixin):
+        """Flat-top beam profile, see flatTop.
+
+        Args:
+            R0 (float): Top-hat width (default: 0.5).
+            D0 (float): 1/e2-width of Gaussian (default: 0.05).
+
+        Notes:
+            F0(rho) = R0 J1(rho R0)/rho plus the transform of the Gaussian 
+            edge, which is obtained by quadrature.
+        """
+
+        def __init__(self, R0=0.5, D0=0.05):
+            self._params = (R0, D0)
+
+        def __call__(self, r):
+            return flatTop(r,self._params)
+
+        def _area(self):
+            R0, D0 = self._params
+            return 0.5*R0*R0 + 0.25*D0*D0 + R0*D0*np.sqrt(np.pi/8.)
+
+        def hankel(self, rho):
+            R0, D0 = self._params
+            return _disc(rho,R0) + _gaussianShell(rho,(R0,R0+5*D0),(R0,D0))
+
+
+class FlatTopDonutProfile(_ProfileMixin):
+        """Flat-top donut beam profile, see flatTopDonut.
+
+        Args:
+            R0 (float): Inner radius of radial profile (default: 0.5).
+            R1 (float): Outer radius of radial profile (default: 0.7).
+            D0 (float): 1/e2-width of inner Gaussian (default: 0.1).
+            D1 (float): 1/e2-width of outer Gaussian (default: 0.1).
+
+        Notes:
+            F0(rho) = [R1 J1(rho R1) - R0 J1(rho R0)]/rho plus the transforms
+            of the Gaussian edges, which are obtained by quadrature.
+        """
+
+        def __init__(self, R0=0.5, R1=0.7, D0=0.1, D1=0.1):
+            self._params = (R0, R1, D0, D1)
+
+        def __call__(self, r):
+            return flatTopDonut(r,self._params)
+
+        def _area(self):
+            R0, R1, D0, D1 = self._params
+            inner = (R0*D0*np.sqrt(np.pi/8.)*scs.erf(np.sqrt(2.)*R0/D0)
+                     - 0.25*D0*D0*(1.-np.exp(-2.*R0*R0/D0/D0)))
+            outer = 0.25*D1*D1 + R1*D1*np.sqrt(np.pi/8.)
+            return 0.5*(R1*R1-R0*R0) + inner + outer
+
+        def hankel(self, rho):
+            R0, R1, D0, D1 = self._params
+            return (_disc(rho,R1) - _disc(rho,R0)
+                    + _gaussianShell(rho,(max(0.,R0-5*D0),R0),(R0,D0))
+                    + _gaussianShell(rho,(R1,R1+5*D1),(R1,D1)))
+
 # EOF: irradiationSouceProfile.py
@@ -0,0 +1,116 @@
+""" FILE: test_cartesianConvolution.py
+
+Unittest module for cartesianConvolution.py
+"""
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import sys; sys.path.append("../"); sys.path.append("../../../../")
+import unittest
+import numpy as np
+from cartesianConvolution import convolveXY
+from convolveRadiallySymmetricFunctions import convolveROI
+from PyPCPI.voxelizedMedia.pureAbsorber.irradiationSourceProfile import ellipticGaussian
+
+
+class CartesianConvolutionTestCase(unittest.TestCase):
+        """Unit test for cartesianConvolution.py.
+
+        Implements unit tests comparing the cartesian convolution to the 
+        polar convolution for radially symmetric beams, and checking its
+        behavior for offset and elliptic beams.
+        Inherits from unittest.TestCase.
+        """
+
+        def setUp(self):
+            """Sets up unit test prerequisits.
+
+            Attributes:
+                r: numpy array containing equidistant radial gridpoints.
+                z: numpy array containing equidistant depth gridpoints.
+                grz: response to infinitely narrow beam.
+                x: numpy array containing equidistant x-axis gridpoints.
+                y: numpy array containing equidistant y-axis gridpoints.
+                f: elliptic Gaussian beam profile on the (x,y) grid as 
+                    function of its center, widths and orientation.
+            """
+            self.r = np.linspace(0.,2.,400,endpoint=False)
+            self.z = np.linspace(0.,1.,5)
+            self.grz = (np.exp(-self.r[:,np.newaxis]**2/(0.02+0.1*self.z)) 
+                        + 0.1*np.exp(-self.r[:,np.newaxis]/(0.2+self.z)))
+            self.x = np.linspace(-1.,1.,101)
+            self.y = np.linspace(-0.8,0.8,81)
+            self.f = lambda x0,y0,sx,sy,phi=0.: ellipticGaussian(
+                                (self.x,self.y),(x0,y0),(sx,sy),phi)
+
+
+        def tearDown(self):
+            """Deletes all attributes set by method setUp()."""
+            del self.r
+            del self.z
+            del self.grz
+            del self.x
+            del self.y
+            del self.f
+
+
+        def test_radiallySymmetricBeam(self):
+            """Perform unit test comparing cartesian and polar convolution.
+
+            For a centered Gaussian beam, the response along the x-axis has
+            to agree with that of convolveROI within 0.2 percent.
+            """
+            x, y, r, z = self.x, self.y, self.r, self.z
+            (xx,yy,zz), W = convolveXY(r,z,self.grz,(x,y),self.f(0.,0.,.1,.1),2.)
+            self.assertEqual(W.shape, (z.size,y.size,x.size))
+            self.assertTrue(xx is x and yy is y and zz is z)
+            Wrz = convolveROI(r,z,self.grz,np.exp(-2*r*r/0.2**2),2.)
+            for iz in range(z.size):
+                Wx = np.interp(np.abs(x),r,Wrz[:,iz])
+                self.assertLess(np.abs(W[iz,40]-Wx).max(), 2e-3*Wx.max())
+
+
+        def test_offsetAndEllipticBeam(self):
+            """Perform unit test on offset and elliptic beams.
+
+            Shifting the beam by whole voxels has to shift the response 
+            accordingly. On a square grid, an elliptic beam has to yield the
+            transposed response of the beam with exchanged principal axes,
+            also if the latter is obtained by rotation, and a beam rotated 
+            by +45 or -45 degrees has to yield a response that is symmetric 
+            under the corresponding reflection.
+            """
+            x, y, r, z = self.x, self.y, self.r, self.z
+            dx, dy = x[1]-x[0], y[1]-y[0]
+            (x,y,z), W0 = convolveXY(r,z,self.grz,(x,y),self.f(0.,0.,.1,.05,30.))
+            (x,y,z), W1 = convolveXY(r,z,self.grz,(x,y),
+                                     self.f(5*dx,-3*dy,.1,.05,30.))
+            self.assertTrue(np.allclose(W1[:,15:-15,15:-15],W0[:,18:-12,10:-20],
+                                        rtol=0.,atol=1e-10*W0.max()))
+
+            self.assertRaises(ValueError, convolveXY, r, z, self.grz, (x,y), 
+                              self.f(0.,0.,.1,.05).T)
+
+            ff = lambda sx,sy,phi: ellipticGaussian((x,x),(0.,0.),(sx,sy),phi)
+            atol = 1e-10*W0.max()
+            (x,y,z), Wa = convolveXY(r,z,self.grz,(x,x),ff(.1,.05,0.))
+            (x,y,z), Wb = convolveXY(r,z,self.grz,(x,x),ff(.05,.1,0.))
+            (x,y,z), Wc = convolveXY(r,z,self.grz,(x,x),ff(.1,.05,90.))
+            self.assertTrue(np.allclose(Wa,Wb.transpose(0,2,1),rtol=0.,atol=atol))
+            self.assertTrue(np.allclose(Wc,Wb,rtol=0.,atol=atol))
+            self.assertFalse(np.allclose(Wa,Wb,rtol=0.,atol=1e-3*Wa.max()))
+
+            (x,y,z), Wp = convolveXY(r,z,self.grz,(x,x),ff(.1,.05,45.))
+            (x,y,z), Wm = convolveXY(r,z,self.grz,(x,x),ff(.1,.05,-45.))
+            self.assertTrue(np.allclose(Wp,Wp.transpose(0,2,1),rtol=0.,atol=atol))
+            self.assertTrue(np.allclose(Wm,Wp[:,:,::-1],rtol=0.,atol=atol))
+            self.assertFalse(np.allclose(Wp,Wm,rtol=0.,atol=1e-3*Wp.max()))
+
+
+if __name__ == "__main__":
+        unittest.main()
+
+# EOF: test_cartesianConvolution.py
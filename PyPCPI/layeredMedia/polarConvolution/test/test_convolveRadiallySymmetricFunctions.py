@@ -14,6 +14,7 @@ import scipy
 import scipy.special as scs
 import numpy as np
 import hankelTransform as ht 
+import irradiationSourceProfile as isp
 import convolveRadiallySymmetricFunctions as crs
 
 
@@ -79,6 +80,102 @@ class BeamProfilePolarConvolutionTestCase(unittest.TestCase):
             self.assertAlmostEqual(eRMS(hr,self.h(self.r)), 0.,3)
 
 
+        def test_convolveROI(self):
+            """Perform unit test on convolution for all depths of the ROI.
+
+            The result has to agree with the depth-wise convolution of the
+            pencil beam response with the beam profile, with and without a
+            precomputed Hankel transform plan, and, up to the truncation of 
+            the sampled profile, for the corresponding beam profile object.
+            """
+            r, z = self.r[:400], np.linspace(0.,1.,7)
+            grz = np.exp(-r[:,np.newaxis]/(0.2+z))
+            fr = np.exp(-2*r*r)
+            rho, F0 = ht.zeroOrderHankelTrafo(r,fr)
+            Wrz = np.empty(grz.shape)
+            for iz in range(z.size):
+                rho, G0 = ht.zeroOrderHankelTrafo(r,grz[:,iz])
+                Wrz[:,iz] = np.abs(crs.convolve(r,rho,G0,F0))
+            Wrz *= 2.5/(2*np.pi*np.trapz(r*fr,r))
+            for plan in [None, ht.HankelPlan(r)]:
+                W = crs.convolveROI(r,z,grz,fr,2.5,plan)
+                self.assertTrue(np.allclose(W,Wrz,rtol=1e-10,atol=0.))
+            self.assertRaises(ValueError, crs.convolveROI, r, z, grz, fr, 1.,
+                              ht.HankelPlan(self.r))
+
+            W = crs.convolveROI(r,z,grz,isp.GaussianProfile(0.,1.),2.5)
+            self.assertTrue(np.all(np.abs(W-Wrz).max(axis=0) < 
+                                   2e-3*Wrz.max(axis=0)))
+
+
+        def test_convolveROI_batch(self):
+            """Perform unit test on convolution for several beam profiles.
+
+            For a list of sampled profiles and profile objects, and for an
+            array of sampled profiles, the stacked result has to agree with
+            that of separate calls.
+            """
+            r, z = self.r[:400], np.linspace(0.,1.,7)
+            grz = np.exp(-r[:,np.newaxis]/(0.2+z))
+            frs = [np.exp(-2*r*r/A0/A0) for A0 in [0.2, 0.5, 1.]]
+            profs = frs + [isp.FlatTopProfile(0.5,0.05)]
+            W = crs.convolveROI(r,z,grz,profs,[1.,2.,3.,4.])
+            self.assertEqual(W.shape, (len(profs),r.size,z.size))
+            for m, prof in enumerate(profs):
+                self.assertTrue(np.array_equal(W[m],
+                                crs.convolveROI(r,z,grz,prof,m+1.)))
+            W = crs.convolveROI(r,z,grz,np.array(frs))
+            self.assertTrue(np.array_equal(W[1],crs.convolveROI(r,z,grz,frs[1])))
+
+
+        def test_convolveROI_fftlog(self):
+            """Perform unit test on convolution by the fast Hankel transform.
+
+            For Gaussian pencil beam responses of various widths and a 
+            Gaussian beam profile, sampled or as profile object, the result
+            has to agree with the exact convolution, at least as well as 
+            that obtained by the trapezoidal rule, on a coarse grid and on a
+            fine grid as obtained from MCML. For profile objects whose
+            transforms are obtained by quadrature, the same holds on a 
+            coarse grid with respect to the result on an eightfold finer 
+            grid, up to the accuracy 1e-3 of the latter.
+            """
+            z, a = np.arange(3), np.array([0.05, 0.2, 0.5])
+            prof = isp.GaussianProfile(0.,0.6)
+            b2 = 0.25*0.6**2
+            for r, tol in [(np.linspace(0.,4.,400,endpoint=False), 4e-3), 
+                           ((np.arange(2000)+0.5)*4./2000, 2e-4)]:
+                grz = np.exp(-r[:,np.newaxis]**2/(2*a*a))
+                Wx = (prof.norm(2.5)*2*np.pi*a*a*b2/(a*a+b2)* 
+                      np.exp(-r[:,np.newaxis]**2/(2*(a*a+b2))))
+                plan = ht.FFTLogPlan(r)
+                for fr in [prof, prof(r)]:
+                    W = crs.convolveROI(r,z,grz,fr,2.5,method='fftlog')
+                    self.assertTrue(np.array_equal(W, 
+                                    crs.convolveROI(r,z,grz,fr,2.5,plan)))
+                    WT = crs.convolveROI(r,z,grz,fr,2.5)
+                    err = np.abs(W-Wx).max(axis=0)/Wx.max(axis=0)
+                    errT = np.abs(WT-Wx).max(axis=0)/Wx.max(axis=0)
+                    self.assertTrue(np.all(err < tol) and np.all(err < errT))
+
+            # PROFILES WITH TRANSFORMS BY QUADRATURE ON A COARSE GRID
+            r = np.linspace(0.,4.,200,endpoint=False)
+            rF = np.linspace(0.,4.,1600,endpoint=False)
+            grz = np.exp(-r[:,np.newaxis]**2/(2*a*a))
+            grzF = np.exp(-rF[:,np.newaxis]**2/(2*a*a))
+            for prof in [isp.FlatTopProfile(0.5,0.05), isp.FlatTopDonutProfile(),
+                         isp.GaussianProfile(0.3,0.1)]:
+                Wx = crs.convolveROI(rF,z,grzF,prof,2.5)[::8]
+                W = crs.convolveROI(r,z,grz,prof,2.5,method='fftlog')
+                WT = crs.convolveROI(r,z,grz,prof,2.5)
+                err = np.abs(W-Wx).max(axis=0)/Wx.max(axis=0)
+                errT = np.abs(WT-Wx).max(axis=0)/Wx.max(axis=0)
+                self.assertTrue(np.all(err < 2e-2) and 
+                                np.all(err < np.maximum(errT, 1e-3)))
+            self.assertRaises(ValueError, crs.convolveROI, r, z, grz, prof, 
+                              1., None, 'qdht')
+
+
 if __name__=="__main__":
         unittest.main()
 
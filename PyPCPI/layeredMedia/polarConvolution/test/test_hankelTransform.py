@@ -9,11 +9,13 @@ __license__   = "3-clause BSD License"
 __contact__   = "oliver.melchert@hot.uni-hannover.de"
 
 import sys; sys.path.append("../")
+import os
+import tempfile
 import unittest
 import scipy
 import scipy.special as scs
 import numpy as np
-from hankelTransform import zeroOrderHankelTrafo 
+from hankelTransform import zeroOrderHankelTrafo, HankelPlan, FFTLogPlan
 
 
 def sombrero():
@@ -117,6 +119,63 @@ class HankelTransformTestCase(unittest.TestCase):
             #     \equiv 2 \pi IrhoDomain          
             IrhoDomain = np.trapz(rho*F0*F0,rho)
             self.assertAlmostEqual(IrDomain, IrhoDomain,1)
+
+        def test_hankelPlan(self):
+            """Perform unit test on precomputed Hankel transforms.
+
+            Transforms of single and batched functions have to agree with 
+            zeroOrderHankelTrafo, also for a plan saved to and loaded from
+            disk, and the inverse transform has to recover the function.
+            """
+            plan = HankelPlan(self.r)
+            fr = np.column_stack((self.f(self.r), np.exp(-self.r)))
+            for m in range(fr.shape[1]):
+                rho, Fn = zeroOrderHankelTrafo(self.r,fr[:,m])
+                rhoP, FP = plan.transform(fr[:,m])
+                self.assertTrue(np.array_equal(rho,rhoP))
+                self.assertTrue(np.allclose(FP,Fn,rtol=0,atol=1e-12*np.abs(Fn).max()))
+            rho, F = plan.transform(fr)
+            self.assertLessEqual(eRMS(F[:,0],self.Fx(rho)), 1.0)
+            self.assertTrue(np.allclose(plan.inverse(F[:,0]),
+                            HankelPlan(rho).transform(F[:,0])[1]))
+
+            fd, fName = tempfile.mkstemp(suffix='.npz'); os.close(fd)
+            try:
+                plan.save(fName)
+                rhoL, FL = HankelPlan.load(fName, self.r).transform(fr)
+                self.assertTrue(np.array_equal(F,FL))
+                self.assertRaises(ValueError, HankelPlan.load, fName, 2*self.r)
+            finally:
+                os.remove(fName)
+
+        def test_fftlogPlan(self):
+            """Perform unit test on the fast transform on a logarithmic grid.
+
+            The transform has to agree with zeroOrderHankelTrafo on the
+            common range of their complementary grids, and the inverse of 
+            the exact transform has to recover the function. Batched
+            transforms have to agree with those of single functions.
+            """
+            plan = FFTLogPlan(self.r)
+            rhoT, FT = zeroOrderHankelTrafo(self.r,self.f(self.r))
+            rho, F = plan.transform(self.f(self.r))
+            self.assertTrue(np.all(np.diff(np.log(rho)) > 0))
+            self.assertTrue(rho[0] < rhoT[1] and rho[-1] > rhoT[-1])
+            m = rhoT >= rho[0]
+            self.assertLessEqual(np.abs(np.interp(rhoT[m],rho,F)-FT[m]).max(), 
+                                 1e-5*FT.max())
+            self.assertLessEqual(np.abs(plan.inverse(self.Fx(rho)) - 
+                                        self.f(self.r)).max(), 1e-4)
+
+            fr = np.column_stack((self.f(self.r), np.exp(-self.r)))
+            rho, F = plan.transform(fr)
+            self.assertEqual(F.shape, (rho.size, 2))
+            self.assertTrue(np.allclose(F[:,1], plan.transform(fr[:,1])[1], 
+                                        rtol=0, atol=1e-14))
+            fr = plan.inverse(np.array([F, 2*F]))
+            self.assertEqual(fr.shape, (2, self.r.size, 2))
+            self.assertTrue(np.allclose(fr[1], 2*plan.inverse(F), rtol=0, 
+                                        atol=1e-14))
             
 
 if __name__ == "__main__":
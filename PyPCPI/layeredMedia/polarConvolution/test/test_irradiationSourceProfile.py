@@ -11,6 +11,7 @@ __contact__   = "oliver.melchert@hot.uni-hannover.de"
 import sys; sys.path.append("../")
 import unittest
 import numpy as np
+import scipy.special as scs
 import irradiationSourceProfile as isp
 
 
@@ -52,6 +53,24 @@ class BeamProfileNormalizationTestCase(unittest.TestCase):
             Iex = 2.*self.P/(np.pi*self.R0**2)
             self.assertAlmostEqual(Inum,Iex,places=6)
 
+        def test_profileTransforms(self):
+            """Perform unit test on closed-form profile transforms.
+
+            Normalization and Hankel transform of the beam profile objects 
+            have to agree with the trapezoidal rule for the sampled profiles
+            up to the discretization error of the latter.
+            """
+            r, rho = 2*self.r, np.linspace(0.,100.,21)
+            for prof in [isp.TopHatProfile(self.R0), isp.GaussianProfile(), 
+                         isp.GaussianProfile(0.3,0.1), isp.FlatTopProfile(),
+                         isp.FlatTopDonutProfile()]:
+                f = prof(r).astype(float)
+                Inum = isp.beamProfNormalization(r,f,self.P)
+                self.assertAlmostEqual(prof.norm(self.P)/Inum,1.,places=3)
+                F0 = np.trapz(r*f*scs.j0(rho[:,np.newaxis]*r),r,axis=1)
+                self.assertLess(np.abs(prof.hankel(rho)-F0).max(),
+                                1e-3*np.abs(F0).max())
+
 
 if __name__=="__main__":
         unittest.main()
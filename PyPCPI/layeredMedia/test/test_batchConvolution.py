@@ -0,0 +1,144 @@
+""" FILE: test_batchConvolution.py
+
+Unittest module for batchConvolution.py
+"""
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import sys; sys.path.append("../")
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import batchConvolution as bc
+from dataIO import npz
+from polarConvolution import convolveROI, isp
+
+
+def writeMco(fName, (dz,dr), Arz):
+        """Write minimal MCML output file with absorption Arz."""
+        Nr, Nz = Arz.shape
+        with open(fName, 'w') as f:
+            f.write("A1 \t# Version number of the file format.\n\n")
+            f.write("InParm \t\t\t# Input parameters. cm is used.\n")
+            f.write("%s \tA\t\t# output file name, ASCII.\n" % fName)
+            f.write("10000 \t\t\t# No. of photons\n")
+            f.write("%g\t%g\t\t# dz, dr [cm]\n" % (dz, dr))
+            f.write("%d\t%d\t%d\t# No. of dz, dr, da.\n\n" % (Nz, Nr, 1))
+            f.write("1\t\t\t\t\t# Number of layers\n")
+            f.write("#n\tmua\tmus\tg\td\t# One line for each layer\n")
+            f.write("1\t\t\t\t\t# n for medium above\n")
+            f.write("1.37\t1\t100\t0.9\t0.1\t# layer 1\n")
+            f.write("1\t\t\t\t\t# n for medium below\n\n")
+            f.write("# A[r][z]. [1/cm3]\nA_rz\n")
+            for i, v in enumerate(Arz.ravel()):
+                f.write("%12.4E " % v + ("\n" if i % 5 == 4 else ""))
+            f.write("\n\n")
+
+
+class BatchConvolutionTestCase(unittest.TestCase):
+        """Unit test for batchConvolution.py.
+
+        Implements unit tests on the batch convolution of synthesized MCML
+        output files.
+        Inherits from unittest.TestCase.
+        """
+
+        def setUp(self):
+            """Sets up unit test prerequisits.
+
+            Attributes:
+                tmpDir: temporary directory holding input and output files.
+                inFileNames: names of synthesized .mco files, the last one
+                    being corrupt.
+                Arz: list of absorption arrays written to the .mco files.
+            """
+            self.tmpDir = tempfile.mkdtemp()
+            self.inFileNames, self.Arz = [], []
+            r = np.arange(40)*0.01
+            for m, (dz, Nz) in enumerate([(0.01,10), (0.02,5), (0.01,15)]):
+                z = np.arange(Nz)*dz
+                Arz = np.exp(-r[:,np.newaxis]/(0.05+0.01*m) - z/0.1)
+                fName = os.path.join(self.tmpDir, 'sample%d.mco' % m)
+                writeMco(fName, (dz,0.01), Arz)
+                self.inFileNames.append(fName)
+                # ABSORPTION AS ROUNDED IN THE .mco FILE
+                self.Arz.append(np.array(['%12.4E' % v for v in Arz.ravel()],
+                                         dtype=float).reshape(Arz.shape))
+            fName = os.path.join(self.tmpDir, 'corrupt.mco')
+            with open(fName, 'w') as f:
+                f.write("A1 \t# Version number of the file format.\n")
+            self.inFileNames.append(fName)
+
+
+        def tearDown(self):
+            """Removes the temporary directory."""
+            shutil.rmtree(self.tmpDir)
+            del self.inFileNames
+            del self.Arz
+
+
+        def test_convolveMcoFiles(self):
+            """Perform unit test on the batch convolution.
+
+            The ROIs written have to agree with those of convolveROI, files
+            with outputs that are up to date, i.e. not older than the .mco
+            file and obtained for the same profile and beam intensity, have
+            to be skipped, failures have to be recorded, and the timing
+            summary has to list all files.
+            """
+            outDir = os.path.join(self.tmpDir, 'ROI')
+            prof = isp.GaussianProfile(0.,0.1)
+            recs = bc.convolveMcoFiles(self.inFileNames, outDir, prof, 2., 
+                                       nProc=2, maxPending=1)
+            self.assertEqual([rec[1] for rec in recs[:3]], ['ok']*3)
+            self.assertTrue(recs[3][1].startswith('failed'))
+            for m in range(3):
+                r, z, Wrz = npz.readROI(bc.outFileName(self.inFileNames[m],outDir))
+                self.assertTrue(np.allclose(Wrz, convolveROI(r,z,self.Arz[m],prof,2.),
+                                            rtol=1e-12, atol=0.))
+            with open(os.path.join(outDir, 'timing.dat')) as f:
+                lines = f.readlines()
+            self.assertEqual(len(lines), 1+len(self.inFileNames)+2)
+
+            # OUTPUT OLDER THAN .mco FILE
+            t = os.path.getmtime(self.inFileNames[1]) - 10.
+            os.utime(bc.outFileName(self.inFileNames[1],outDir), (t, t))
+            recs = bc.convolveMcoFiles(self.inFileNames, outDir,
+                                       isp.GaussianProfile(0.,0.1), 2., nProc=1)
+            self.assertEqual([rec[1] for rec in recs[:3]], 
+                             ['skipped', 'ok', 'skipped'])
+            self.assertTrue(recs[3][1].startswith('failed'))
+
+            # CHANGED PROFILE OR BEAM INTENSITY
+            recs = bc.convolveMcoFiles(self.inFileNames, outDir, isp.topHat, 
+                                       2., nProc=1)
+            self.assertEqual([rec[1] for rec in recs[:3]], ['ok']*3)
+            r, z, Wrz = npz.readROI(bc.outFileName(self.inFileNames[1],outDir))
+            self.assertTrue(np.allclose(Wrz, convolveROI(r,z,self.Arz[1],isp.topHat(r),2.),
+                                        rtol=1e-12, atol=0.))
+            recs = bc.convolveMcoFiles(self.inFileNames[:3], outDir,
+                                       isp.topHat, 2., nProc=1)
+            self.assertEqual([rec[1] for rec in recs], ['skipped']*3)
+            recs = bc.convolveMcoFiles(self.inFileNames[:3], outDir,
+                                       [isp.topHat], 2., nProc=1)
+            self.assertEqual([rec[1] for rec in recs], ['ok']*3)
+            recs = bc.convolveMcoFiles(self.inFileNames[:3], outDir,
+                                       [isp.topHat], 1., nProc=1)
+            self.assertEqual([rec[1] for rec in recs], ['ok']*3)
+
+            # OUTPUT WITHOUT DIGEST
+            oName = bc.outFileName(self.inFileNames[0],outDir)
+            npz.writeROI(r, z, Wrz, oName)
+            self.assertTrue(bc.isUpToDate(self.inFileNames[0], oName))
+            self.assertFalse(bc.isUpToDate(self.inFileNames[0], oName,
+                                           bc.parameterDigest([isp.topHat], 1.)))
+
+if __name__ == "__main__":
+        unittest.main()
+
+# EOF: test_batchConvolution.py
@@ -0,0 +1,47 @@
+""" FILE: pruning.py
+
+Module implementing the selection of the smallest contributions to a
+Poisson integral that can be discarded at a controlled error, shared by the
+Poisson integral solvers for layered and voxelized media, see
+layeredMedia.poissonIntegralSolver.pruneSource and
+voxelizedMedia.poissonIntegralSolver.pruneSource.
+
+"""
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import numpy as np
+
+
+def pruneMask(w,epsL1,wTot):
+        """Mask of contributions kept after discarding the smallest ones.
+
+        Contributions are grouped by their binary exponent and whole groups
+        are discarded, starting with the smallest, as long as their summed
+        weight does not exceed epsL1*wTot. Infinite weights are always kept.
+
+        Args:
+            w (numpy array): nonnegative weights of the contributions.
+            epsL1 (float): relative L1 error bound.
+            wTot (float): weight relative to which the bound is measured.
+
+        Returns:
+            keep (numpy array, dtype=bool): mask of kept contributions.
+            eps (float): summed weight of discarded contributions in units
+                of wTot.
+        """
+        keep = w > 0.
+        cand = keep & np.isfinite(w)
+        if not cand.any():
+            return keep, 0.
+        e = np.frexp(w[cand])[1]
+        e -= e.min()
+        cumW = np.cumsum(np.bincount(e, w[cand]))
+        m = np.searchsorted(cumW, epsL1*wTot, side='right')
+        keep[cand] = e >= m
+        return keep, (cumW[m-1]/wTot if m > 0 else 0.)
+
+# EOF: pruning.py
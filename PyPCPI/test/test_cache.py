@@ -0,0 +1,169 @@
+""" FILE: test_cache.py
+
+Unittest module for cache.py
+"""
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import sys; sys.path.append("../")
+import os
+import shutil
+import tempfile
+import types
+import unittest
+import numpy as np
+import cache
+
+class CacheTestCase(unittest.TestCase):
+        """Unit test for cache.py.
+
+        Implements unit tests on the content-addressed on-disk cache using
+        a decorated function that records its calls.
+        Inherits from unittest.TestCase.
+        """
+
+        def setUp(self):
+            """Sets up unit test prerequisits.
+
+            Attributes:
+                cacheDir: temporary cache directory.
+                calls: list of arguments the decorated functions were called 
+                    with.
+                scale: decorated function returning a scaled array.
+                readRows: decorated reader returning the rows of a text file.
+            """
+            self.cacheDir = tempfile.mkdtemp()
+            cache.enable(self.cacheDir)
+            self.calls = []
+            @cache.memoize()
+            def scale(x, a=1.):
+                self.calls.append((x, a))
+                return a*x
+            @cache.memoize(fileArgs=(0,))
+            def readRows(fName):
+                self.calls.append(fName)
+                return np.loadtxt(fName, ndmin=2), (np.arange(3), np.ones(2))
+            self.scale, self.readRows = scale, readRows
+
+
+        def tearDown(self):
+            """Disables the cache and removes the cache directory."""
+            cache.disable()
+            shutil.rmtree(self.cacheDir)
+            del self.calls
+            del self.scale
+            del self.readRows
+
+
+        def test_memoize(self):
+            """Perform unit test on cache hits and misses.
+
+            Repeated calls with identical arguments have to be served from 
+            the cache, calls with different array content, parameters or 
+            file content have to be recomputed. With the cache disabled or
+            for uncacheable arguments, the function has to be called as is.
+            """
+            x = np.linspace(0.,1.,11)
+            y1 = self.scale(x, a=2.)
+            y2 = self.scale(x.copy(), a=2.)
+            self.assertTrue(np.array_equal(y1,y2) and len(self.calls) == 1)
+            self.scale(x, a=3.)
+            self.scale(x.astype(np.float32), a=2.)
+            x[3] = 7.
+            self.scale(x, a=2.)
+            self.assertEqual(len(self.calls), 4)
+
+            fName = os.path.join(self.cacheDir, 'rows.txt')
+            np.savetxt(fName, np.eye(3))
+            A, i = self.readRows(fName)
+            B, (i, j) = self.readRows(fName)
+            self.assertTrue(np.array_equal(A,np.eye(3)) and np.array_equal(A,B))
+            self.assertTrue(np.array_equal(i,np.arange(3)) and j.shape == (2,))
+            self.assertEqual(len(self.calls), 5)
+            np.savetxt(fName, 2*np.eye(3))
+            A, i = self.readRows(fName)
+            self.assertTrue(np.array_equal(A,2*np.eye(3)) and len(self.calls) == 6)
+
+            self.scale(np.array([1.,2.],dtype=object), a=2.)
+            self.scale(np.array([1.,2.],dtype=object), a=2.)
+            cache.disable()
+            self.scale(x, a=2.)
+            self.assertEqual(len(self.calls), 9)
+
+
+        def test_keys(self):
+            """Perform unit test on the derivation of keys.
+
+            Equivalent calls have to share a key, irrespective of whether
+            arguments are passed by position or keyword, or omitted in favor
+            of their default value, also for tuple parameters. The version
+            of the function and the content of the modules it depends on
+            have to enter the key. Results holding other objects than numpy
+            arrays have to be recomputed.
+            """
+            x = np.linspace(0.,1.,11)
+            self.scale(x, a=2.)
+            self.scale(x, 2.)
+            self.scale(x)
+            self.scale(x, 1.)
+            self.scale(x=x, a=1.)
+            self.assertEqual(len(self.calls), 2)
+
+            def norm((u,v), p=2.):
+                self.calls.append(p)
+                return (np.abs(u)**p + np.abs(v)**p)**(1./p)
+            dep = types.ModuleType('dep')
+            dep.__file__ = os.path.join(self.cacheDir, 'dep.txt')
+            with open(dep.__file__, 'w') as f:
+                f.write('1')
+            del self.calls[:]
+            cache.memoize(depends=(dep,))(norm)((x,x))
+            cache.memoize(depends=(dep,))(norm)((x,x), p=2.)
+            self.assertEqual(len(self.calls), 1)
+            cache.memoize(version=2, depends=(dep,))(norm)((x,x))
+            with open(dep.__file__, 'w') as f:
+                f.write('2')
+            cache.memoize(depends=(dep,))(norm)((x,x))
+            self.assertEqual(len(self.calls), 3)
+            # INVALID CALLS FAIL IN THE FUNCTION ITSELF
+            self.assertRaises(ValueError, cache.memoize()(norm), (x,x,x))
+
+            @cache.memoize()
+            def withCount(x):
+                self.calls.append(x)
+                return x, len(x)
+            del self.calls[:]
+            withCount(x); withCount(x)
+            self.assertEqual(len(self.calls), 2)
+
+
+        def test_eviction(self):
+            """Perform unit test on the size bound of the cache directory.
+
+            With room for two results, storing a third result has to evict
+            the least recently used one.
+            """
+            x = [np.full(1000, float(i)) for i in range(3)]
+            self.scale(x[0])
+            cache.enable(self.cacheDir, 2.5*os.path.getsize(
+                                    os.path.join(self.cacheDir, os.listdir(self.cacheDir)[0])))
+            self.scale(x[1])
+            for fName, size, mtime in cache._entries():
+                os.utime(fName, (mtime-10, mtime-10))
+            self.scale(x[0])
+            self.scale(x[2])
+            self.assertEqual(len(os.listdir(self.cacheDir)), 2)
+            del self.calls[:]
+            self.scale(x[0]); self.scale(x[2])
+            self.assertEqual(len(self.calls), 0)
+            self.scale(x[1])
+            self.assertEqual(len(self.calls), 1)
+
+
+if __name__ == "__main__":
+        unittest.main()
+
+# EOF: test_cache.py
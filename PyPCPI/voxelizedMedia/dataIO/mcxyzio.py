@@ -24,6 +24,163 @@ import os
 import sys
 
 
+def _fetchParameters(fName):
+        """read simulation parameters from .mci file.
+
+        Returns:
+            roiShape (3-tuple, ints): number of voxels (Nx,Ny,Nz).
+            d3x (3-tuple, floats): voxel size (dx,dy,dz) [cm].
+            muaTable (numpy array, ndim=1): lookup table of absorption 
+                coefficients indexed by the tissue type as unsigned byte, 
+                NaN for undefined tissue types.
+        """
+        with open(fName) as f:
+            data = f.readlines()
+        cast = lambda x,myType: myType(x.strip())
+        roiShape = (cast(data[1],int), cast(data[2],int), cast(data[3],int))
+        d3x = (cast(data[4],float), cast(data[5],float), cast(data[6],float))
+        Nt = cast(data[21],int)
+        muaTable = np.empty(256)
+        muaTable[:] = np.nan
+        muaTable[:Nt] = [cast(data[22+i*3],float) for i in range(Nt)]
+        return roiShape, d3x, muaTable
+
+
+class McxyzDataset(object):
+        """memory-mapped mcxyz dataset.
+
+        Lazily evaluated view of the volumetric energy density `Hxyz` [J/m^3
+        per J delivered] defined by the input (`fNameBase_H.mci`, 
+        `fNameBase_T.bin`) and output (`fNameBase_F.bin`) of the mcxyz.c 
+        C-code, see getEnergyDensity. The .bin files are memory-mapped and 
+        `Hxyz` is computed only for the voxels requested, via a lookup table
+        of absorption coefficients indexed by tissue type. 
+
+        Cropped and strided sub-ROIs are obtained by slicing in memory order
+        (z,y,x), e.g. ds[10:50, ::2, ::2], which yields a new dataset that 
+        shares the memory maps.
+
+        Attributes:
+            shape (3-tuple, ints): shape (Nz,Ny,Nx) of the (sub-)ROI.
+            axes (3-tuple, numpy arrays): x, y, z grids [cm] of the (sub-)ROI.
+
+        Example:
+            ds = McxyzDataset('skinvessel')[:, 20:180, 20:180]
+            (x,y,z) = ds.axes
+            t, p = pressure_streaming(((x,y,z),ds.slabs(16)),(xD,yD,zD),c0)
+        """
+
+        def __init__(self, fNameBase):
+            """Map the files of mcxyz dataset `fNameBase`."""
+            ((Nx,Ny,Nz), d3x, self._mua) = _fetchParameters(fNameBase+'_H.mci')
+            self._F = np.memmap(fNameBase+'_F.bin', dtype=ct.c_float, mode='r', 
+                                shape=(Nz,Ny,Nx))
+            self._T = np.memmap(fNameBase+'_T.bin', dtype=ct.c_int8, mode='r', 
+                                shape=(Nz,Ny,Nx))
+            self._d3x = d3x[::-1]
+            # (start, step, number) OF VIEW ALONG z, y, x
+            self._view = tuple((0, 1, n) for n in (Nz,Ny,Nx))
+
+        def __getitem__(self, key):
+            """Cropped and/or strided view, see class docstring."""
+            key = key if isinstance(key, tuple) else (key,)
+            if len(key) > 3:
+                raise IndexError("McxyzDataset is 3-dimensional")
+            key = key + (slice(None),)*(3-len(key))
+            view = []
+            for (start, step, n), sl in zip(self._view, key):
+                if not isinstance(sl, slice):
+                    if not -n <= sl < n:
+                        raise IndexError("index %d out of bounds for axis with "
+                                         "size %d" % (sl, n))
+                    sl = sl+n if sl < 0 else sl
+                    sl = slice(sl, sl+1)
+                a, b, c = sl.indices(n)
+                if c < 1:
+                    raise ValueError("McxyzDataset supports positive strides only")
+                view.append((start + a*step, step*c, len(range(a, b, c))))
+            ds = object.__new__(McxyzDataset)
+            ds.__dict__.update(self.__dict__)
+            ds._view = tuple(view)
+            return ds
+
+        @property
+        def shape(self):
+            return tuple(n for (start, step, n) in self._view)
+
+        @property
+        def axes(self):
+            z, y, x = [np.linspace(0.5*d, (N+0.5)*d, N, endpoint=False)[
+                            start:start+n*step:step]
+                       for (start, step, n), d, N in zip(self._view, self._d3x, 
+                                                         self._F.shape)]
+            return x, y, z
+
+        def energyDensity(self, k0=0, k1=None, dtype=np.float32):
+            """Volumetric energy density for z-slices k0 to k1-1 of the view.
+
+            Args:
+                k0 (int): first z-slice of the view (default: k0=0).
+                k1 (int): z-slice of the view past the last one (default: 
+                    k1=None, i.e. up to the last z-slice).
+                dtype (numpy dtype): precision of the result (default: 
+                    dtype=np.float32).
+
+            Returns:
+                Hxyz (numpy array, ndim=3): Volumetric energy density [J/m^3
+                    per J delivered] with shape (k1-k0,Ny,Nx).
+
+            Notes:
+                For dtype=np.float64, the result agrees with that of 
+                getEnergyDensity. Voxels of a tissue type not defined in the
+                .mci file yield NaN.
+            """
+            idx = self._index(k0, k1)
+            mua = self._mua.astype(dtype)[self._T[idx].view(np.uint8)]
+            return np.multiply(self._F[idx], mua, dtype=dtype)
+
+        def labelSource(self, Gamma=1.):
+            """Label source representation of the view.
+
+            Args:
+                Gamma (float): Grueneisen parameter (default: Gamma=1.).
+
+            Returns:
+                src (tuple): memory-mapped tissue types (int8) and fluence 
+                    rate (float32) of the view, and table of absorption 
+                    coefficients times Gamma, indexed by tissue type. The 
+                    tuple can be passed in place of the initial acoustic 
+                    stress to the voxelizedMedia Poisson integral solver, see 
+                    acousticObservables.labelSource.
+            """
+            idx = self._index(0, None)
+            return self._T[idx], self._F[idx], Gamma*self._mua
+
+        def _index(self, k0, k1):
+            """Slices of the memory maps for z-slices k0 to k1-1 of the view."""
+            (zs, zt, Nz), (ys, yt, Ny), (xs, xt, Nx) = self._view
+            k1 = Nz if k1 is None else min(k1, Nz)
+            return (slice(zs + k0*zt, zs + k1*zt, zt), 
+                    slice(ys, ys + Ny*yt, yt), 
+                    slice(xs, xs + Nx*xt, xt))
+
+        def slabs(self, nSlab=16, dtype=np.float32):
+            """Generator of the volumetric energy density in z-slabs.
+
+            Args:
+                nSlab (int): number of z-slices per slab (default: nSlab=16).
+                dtype (numpy dtype): precision of the result (default: 
+                    dtype=np.float32).
+
+            Returns:
+                slabs (generator): Volumetric energy density [J/m^3 per J 
+                    delivered] for slabs of shape (nSlab,Ny,Nx), the last slab
+                    possibly being thinner, see energyDensity.
+            """
+            for k0 in range(0, self.shape[0], nSlab):
+                yield self.energyDensity(k0, k0+nSlab, dtype)
+
+
 def getEnergyDensity(fNameBase):
         """compute energy deposition for voxels.
 
@@ -71,48 +228,38 @@ def getEnergyDensity(fNameBase):
 
         """
 
-        def fetchData(file):
-            with open(file) as f:
-                return f.readlines()
-
-        def fetchFluenceRate(file,roiSize):
-            """read fluence rate  [J/m^2 per J delivered] from .bin file."""
-            return np.fromfile(file,dtype = ct.c_float).reshape(roiSize)
-
-        def fetchTissueType(file,roiSize):
-            """read tissue type from .bin file."""
-            return np.fromfile(file,dtype = ct.c_int8).reshape(roiSize)
-
-        def fetchParameters(fName):
-            """read simulation parameters from .mci file."""
-            #data = open(fName,'r').readlines()
-            data = fetchData(fName) 
-            cast = lambda x,myType: myType(x.strip())
-            roiShape = (cast(data[1],int), cast(data[2],int), cast(data[3],int))
-            d3x = (cast(data[4],float), cast(data[5],float), cast(data[6],float))
-            Nt = cast(data[21],int)
-            muaDict = {i:cast(data[22+i*3],float) for i in range(Nt)}
-            muaFunc = np.vectorize(lambda i: muaDict[i], otypes=[np.float]) 
-            return roiShape, d3x, muaFunc
-
-        # READ SIMULATION PARAMETERS FROM .mci FILE ---------------------------
-        ((Nx,Ny,Nz), (dx,dy,dz), mua) = fetchParameters(fNameBase+'_H.mci')
-
-        # READ FLUENCE RATE [J/m^2 per J delivered] FROM _F.bin FILE ----------
-        Fxyz = fetchFluenceRate(fNameBase+'_F.bin',(Nz,Ny,Nx))
-        
-        # READ TISSUE TYPE FROM _T.bin FILE =----------------------------------
-        Txyz = fetchTissueType(fNameBase+'_T.bin',(Nz,Ny,Nx))
+        ds = McxyzDataset(fNameBase)
+        return ds.axes, ds.energyDensity(dtype=np.float64)
 
-        # COMPUTE ABSORBED ENERGY DENSITY [J/m^3 per J delivered ] ------------
-        Hxyz = np.multiply(Fxyz,mua(Txyz))
 
-        # SET COORDINATE AXES -------------------------------------------------
-        x = np.linspace(0.5*dx, (Nx+0.5)*dx, Nx, endpoint=False)
-        y = np.linspace(0.5*dy, (Ny+0.5)*dy, Ny, endpoint=False)
-        z = np.linspace(0.5*dz, (Nz+0.5)*dz, Nz, endpoint=False)
-        
-        return (x, y, z), Hxyz
+def energyDensitySlabs(fNameBase, nSlab=16):
+        """compute energy deposition for voxels slab by slab.
+
+        Out-of-core variant of getEnergyDensity. The XXX_F.bin and XXX_T.bin
+        files are memory-mapped and the volumetric energy density `Hxyz` 
+        [J/m^3 per J delivered] is computed for slabs of nSlab consecutive 
+        z-slices on demand, so that the ROI is never held in memory as a 
+        whole.
+
+        Args:
+            fNameBase (str): Basename of file 3-tuple consisting of 
+                `fNameBase_H.mci`, `fNameBase_F.bin`, and, `fNameBase_T.bin`.
+            nSlab (int): Number of z-slices per slab (default: nSlab=16).
+
+        Returns:
+            (x,y,z) (3-tuple, numpy arrays): Equi-spaced x, y, z grids [cm]. 
+            slabs (generator): Volumetric energy density [J/m^3 per J 
+                delivered] for slabs of shape (nSlab,Ny,Nx), the last slab 
+                possibly being thinner. 
+
+        Notes:
+            The generator can be passed to pressure_streaming of the 
+            voxelizedMedia Poisson integral solver. Each slab agrees with 
+            the corresponding z-slices of the array returned by 
+            getEnergyDensity.
+        """
+        ds = McxyzDataset(fNameBase)
+        return ds.axes, ds.slabs(nSlab, np.float64)
 
 
 # EOF: mciBin.py
@@ -0,0 +1,192 @@
+""" FILE: test_mcxyzio.py
+
+Unittest module for mcxyzio.py
+"""
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import sys; sys.path.append("../")
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import mcxyzio
+
+
+def writeMcxyz(fNameBase, (dx,dy,dz), muaList, Fxyz, Txyz):
+        """Write minimal mcxyz dataset with fluence rate Fxyz and tissue types
+        Txyz, both of shape (Nz,Ny,Nx)."""
+        Nz, Ny, Nx = Fxyz.shape
+        with open(fNameBase + '_H.mci', 'w') as f:
+            f.write("1.00\n%d\n%d\n%d\n%.4f\n%.4f\n%.4f\n" % (Nx,Ny,Nz,dx,dy,dz))
+            f.write("0\n0\n2\n" + "0.0000\n"*11)
+            f.write("%d\n" % len(muaList))
+            for mua in muaList:
+                f.write("%.4f\n100.0000\n0.9000\n" % mua)
+        Fxyz.astype(np.float32).tofile(fNameBase + '_F.bin')
+        Txyz.astype(np.int8).tofile(fNameBase + '_T.bin')
+
+
+class McxyzDatasetTestCase(unittest.TestCase):
+        """Unit test for mcxyzio.py.
+
+        Implements unit tests on cropped and strided views of a synthesized
+        mcxyz dataset.
+        Inherits from unittest.TestCase.
+        """
+
+        def setUp(self):
+            """Sets up unit test prerequisits.
+
+            Attributes:
+                tmpDir (str): temporary directory holding the dataset.
+                fNameBase (str): basename of the dataset.
+                d3x (3-tuple, floats): voxel size (dx,dy,dz).
+                mua (numpy array, ndim=1): absorption coefficients of the
+                    tissue types 0, 1, 2.
+                H (numpy array, ndim=3): expected volumetric energy density
+                    with shape (Nz,Ny,Nx) = (7,5,6).
+            """
+            np.random.seed(17)
+            Nx, Ny, Nz = 6, 5, 7
+            self.d3x = (0.1, 0.2, 0.3)
+            self.mua = np.array([0.5, 2.25, 10.])
+            F = np.random.rand(Nz,Ny,Nx).astype(np.float32)
+            T = np.random.randint(0, 3, size=(Nz,Ny,Nx))
+            self.tmpDir = tempfile.mkdtemp()
+            self.fNameBase = os.path.join(self.tmpDir, 'synth')
+            writeMcxyz(self.fNameBase, self.d3x, self.mua, F, T)
+            self.H = F.astype(np.float64)*self.mua[T]
+
+
+        def tearDown(self):
+            """Deletes all attributes set by method setUp()."""
+            shutil.rmtree(self.tmpDir)
+            del self.tmpDir
+            del self.fNameBase
+            del self.d3x
+            del self.mua
+            del self.H
+
+
+        def test_getEnergyDensity(self):
+            """Perform unit test for energy density of the full ROI.
+
+            Check that grids are centered in the voxels and that the energy
+            density is obtained by the lookup table of absorption
+            coefficients, for the full ROI and slab by slab.
+            """
+            (x,y,z), H = mcxyzio.getEnergyDensity(self.fNameBase)
+            (dx,dy,dz) = self.d3x
+            self.assertTrue(np.allclose(x, (np.arange(6)+0.5)*dx))
+            self.assertTrue(np.allclose(y, (np.arange(5)+0.5)*dy))
+            self.assertTrue(np.allclose(z, (np.arange(7)+0.5)*dz))
+            self.assertEqual(H.dtype, np.float64)
+            self.assertTrue(np.array_equal(H, self.H))
+
+            (xS,yS,zS), slabs = mcxyzio.energyDensitySlabs(self.fNameBase, 3)
+            slabs = list(slabs)
+            self.assertEqual([s.shape[0] for s in slabs], [3, 3, 1])
+            self.assertTrue(np.array_equal(np.concatenate(slabs), self.H))
+            self.assertTrue(np.array_equal(zS, z))
+
+
+        def test_views(self):
+            """Perform unit test for cropped and strided views.
+
+            Check shape, grids and energy density of views, nested views and
+            views obtained by integer keys against the corresponding slices
+            of the full ROI.
+            """
+            ds = mcxyzio.McxyzDataset(self.fNameBase)
+            (x,y,z) = ds.axes
+            keys = [(slice(1,6), slice(None,None,2), slice(1,None,3)),
+                    (slice(None,None,3),),
+                    (2, slice(-3,None), -1),
+                    (slice(2,100), slice(-100,2))]
+            for key in keys:
+                view = ds[key]
+                full = key + (slice(None),)*(3-len(key))
+                sl = tuple(slice(k, k+1 if k != -1 else None)
+                           if isinstance(k, int) else k for k in full)
+                self.assertEqual(view.shape, self.H[sl].shape)
+                self.assertTrue(np.allclose(view.energyDensity(), self.H[sl]))
+                (xV,yV,zV) = view.axes
+                self.assertTrue(np.array_equal(xV, x[sl[2]]))
+                self.assertTrue(np.array_equal(yV, y[sl[1]]))
+                self.assertTrue(np.array_equal(zV, z[sl[0]]))
+
+            # NESTED VIEWS COMPOSE OFFSETS AND STRIDES
+            view = ds[1:, ::2, 1:][::2, 1:, ::2][1:]
+            H = self.H[1:, ::2, 1:][::2, 1:, ::2][1:]
+            self.assertEqual(view.shape, H.shape)
+            self.assertTrue(np.allclose(view.energyDensity(), H))
+            self.assertTrue(np.array_equal(view.axes[0], x[1:][::2]))
+            self.assertTrue(np.array_equal(view.axes[2], z[1:][::2][1:]))
+            self.assertEqual(ds.shape, (7,5,6))
+
+            # SLABS OF A VIEW
+            view = ds[1::2, 1:4]
+            slabs = list(view.slabs(3, np.float64))
+            self.assertEqual([s.shape for s in slabs], [(3,3,6)])
+            self.assertTrue(np.array_equal(slabs[0], self.H[1::2, 1:4]))
+            slabs = list(view.slabs(2, np.float64))
+            self.assertEqual([s.shape[0] for s in slabs], [2, 1])
+            self.assertTrue(np.array_equal(np.concatenate(slabs),
+                                           self.H[1::2, 1:4]))
+
+
+        def test_invalidKeys(self):
+            """Perform unit test for invalid keys.
+
+            Check that integer keys out of bounds of the view, too many keys
+            and negative strides are rejected.
+            """
+            ds = mcxyzio.McxyzDataset(self.fNameBase)
+            self.assertRaises(IndexError, lambda: ds[7])
+            self.assertRaises(IndexError, lambda: ds[-8])
+            self.assertRaises(IndexError, lambda: ds[:, 5])
+            self.assertRaises(IndexError, lambda: ds[:, :, -7])
+            self.assertRaises(IndexError, lambda: ds[::2][4])
+            self.assertRaises(IndexError, lambda: ds[0, 0, 0, 0])
+            self.assertRaises(ValueError, lambda: ds[::-1])
+            self.assertEqual(ds[::2][3].shape, (1,5,6))
+            self.assertEqual(ds[-7].shape, (1,5,6))
+
+
+        def test_lookupTable(self):
+            """Perform unit test for the lookup table of absorption
+            coefficients.
+
+            Check that the label source holds the memory-mapped tissue types
+            and fluence rates of the view together with the scaled table, and
+            that tissue types not defined in the .mci file yield NaN.
+            """
+            ds = mcxyzio.McxyzDataset(self.fNameBase)[2:5, ::2]
+            T, F, muaTable = ds.labelSource(Gamma=0.5)
+            self.assertEqual(T.shape, ds.shape)
+            self.assertEqual((T.dtype, F.dtype), (np.int8, np.float32))
+            self.assertTrue(np.array_equal(muaTable[:3], 0.5*self.mua))
+            self.assertTrue(np.isnan(muaTable[3:]).all())
+            self.assertTrue(np.allclose(F*muaTable[T.view(np.uint8)],
+                                        0.5*self.H[2:5, ::2]))
+            self.assertEqual(ds.energyDensity().dtype, np.float32)
+
+            # UNDEFINED TISSUE TYPES, INCLUDING NEGATIVE int8 VALUES
+            F = np.ones((2,2,2), dtype=np.float32)
+            T = np.array([0, 1, 2, 3, -1, 0, 1, 2]).reshape(2,2,2)
+            writeMcxyz(self.fNameBase, self.d3x, self.mua, F, T)
+            H = mcxyzio.McxyzDataset(self.fNameBase).energyDensity()
+            self.assertTrue(np.array_equal(np.isnan(H).ravel(),
+                                           [0, 0, 0, 1, 1, 0, 0, 0]))
+            self.assertTrue(np.allclose(H.ravel()[[0,1,2]], self.mua))
+
+
+if __name__ == "__main__":
+        unittest.main()
+
+# EOF: test_mcxyzio.py
@@ -1 +1,10 @@
-from acousticObservables import pressure, pressure_LambertianDetector
+from acousticObservables import pressure, pressure_LambertianDetector, sparseSource, pruneSource
+from acousticObservables import pressure_multiResponse, pressure_finiteAperture
+from acousticObservables import pressure_octree, sourcePyramid
+from acousticObservables import pressure_streaming, labelSource
+import forwardModel
+import detectorResponse
+import detectorAperture
+import latticeSolver
+import spectralSolver
+import farFieldSolver
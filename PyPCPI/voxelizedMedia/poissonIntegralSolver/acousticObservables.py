@@ -19,9 +19,177 @@ import scipy
 import scipy.special as scs
 import numpy as np 
 from poissonIntegral_cython import cartPoissonIntegralSolver, cartPoissonIntegralSolver_Lambertian
+from poissonIntegral_cython import cartPoissonIntegralSolver_linear
+from poissonIntegral_cython import cartPoissonIntegralSolver_sparse
+from poissonIntegral_cython import cartPoissonIntegralSolver_parallel
+from poissonIntegral_cython import cartPoissonIntegralSolver_multiResponse
+from poissonIntegral_cython import cartPoissonIntegralSolver_aperture
+from poissonIntegral_cython import cartPoissonIntegralSolver_octree
+from poissonIntegral_cython import cartPoissonIntegralSolver_accumulate
+from poissonIntegral_cython import cartPoissonIntegralSolver_labels
+from poissonIntegral_cython import customCartesianSolverMcxyz
+from detectorResponse import responseArrays
+from detectorAperture import quadratureLevels, halfWidths, isRotational
+try:
+    from PyPCPI import pruning
+except ImportError:
+    # OUTSIDE OF THE PyPCPI PACKAGE THE SHARED MODULE IS LOADED FROM ITS FILE
+    import os, imp
+    pruning = imp.load_source('pruning', os.path.join(os.path.dirname(
+                    os.path.abspath(__file__)), os.pardir, os.pardir, 'pruning.py'))
+pruneMask = pruning.pruneMask
+try:
+    from PyPCPI.cache import memoize
+except ImportError:
+    # CACHE LAYER UNAVAILABLE OUTSIDE OF THE PyPCPI PACKAGE
+    memoize = lambda *args, **kwargs: (lambda func: func)
+
+# FRACTION OF ZERO VOXELS ABOVE WHICH THE SPARSE SOLVER IS USED BY DEFAULT
+SPARSE_ZERO_FRACTION = 0.9
+
+
+def sparseSource(p0xyz):
+        """Coordinate list representation of the support of a source volume.
 
+        Args:
+            p0xyz (numpy array, ndim=3): initial acoustic stress profile with
+                shape (Nz,Ny,Nx).
+
+        Returns:
+            (kIdx,jIdx,iIdx) (tuple of numpy arrays, ndim=1): z-, y- and
+                x-indices of the nonzero voxels in memory order of p0xyz.
+            p0 (numpy array, ndim=1): initial acoustic stress of the nonzero
+                voxels.
+
+        Notes:
+            The returned tuple can be passed in place of p0xyz to the 
+            functions pressure, pressure_LambertianDetector and 
+            velocityPotential. When signals for several detector positions 
+            are computed for the same source, extracting the support once 
+            avoids a scan of the full volume per detector.
+        """
+        kji = np.nonzero(p0xyz)
+        return tuple(idx.astype(np.int32) for idx in kji), p0xyz[kji]
+
+
+def pruneSource(((x,y,z),p0xyz),(xD,yD,zD),epsL1,lambertian=False):
+        """Discard smallest contributions to the Poisson integral.
+
+        Removes the voxels with the smallest contributions to the Poisson 
+        integral at the detector position from the coordinate list of the
+        source, such that the relative L1 error of the Poisson integral 
+        does not exceed epsL1.
+
+        Args:
+            x (numpy array, ndim=1): Equispaced 1D grid for x-coordinate.
+            y (numpy array, ndim=1): Equispaced 1D grid for y-coordinate.
+            z (numpy array, ndim=1): Equispaced 1D grid for z-coordinate.
+            p0xyz (numpy array, ndim=3): initial acoustic stress profile or 
+                coordinate list returned by sparseSource.
+            xD (float): x-position of detector. 
+            yD (float): y-position of detector. 
+            zD (float): z-position of detector relative to first layer.
+            epsL1 (float): relative L1 error bound.
+            lambertian (bool): Weight contributions by the cosine of the
+                angle to the detector normal (default: lambertian=False).
+
+        Returns:
+            src (tuple): coordinate list of the kept voxels, see sparseSource.
+            epsAchieved (float): achieved bound on the relative L1 error.
+            nKept (int): number of voxels kept.
+
+        Notes:
+            Voxel (x,y,z) contributes the weight |p0|*dV/d (pointlike 
+            detector) or |p0|*dV*|z|/d^2 (Lambertian detector) to the 
+            Poisson integral. Since the L1 norm of the discarded part of the
+            Poisson integral is at most the summed weight of the discarded 
+            voxels, epsAchieved bounds sum(|I-Ipruned|)/sum(|I|) from above 
+            for a nonnegative profile.
+        """
+        if not isinstance(p0xyz, tuple):
+            p0xyz = sparseSource(p0xyz)
+        (kIdx,jIdx,iIdx), p0 = p0xyz
+        xx, yy, zz = x[iIdx]-xD, y[jIdx]-yD, z[kIdx]-zD
+        dd = xx*xx + yy*yy + zz*zz
+        with np.errstate(divide='ignore'):
+            w = np.abs(p0)*np.abs(zz)/dd if lambertian else np.abs(p0)/np.sqrt(dd)
+        keep, epsAchieved = pruneMask(w,epsL1,np.sum(w[np.isfinite(w)]))
+        src = ((kIdx[keep],jIdx[keep],iIdx[keep]), p0[keep])
+        return src, epsAchieved, int(np.count_nonzero(keep))
+
+
+def labelSource(labels, F, table):
+        """Label volume representation of a source volume.
+
+        Args:
+            labels (numpy array, ndim=3): label volume with shape (Nz,Ny,Nx),
+                e.g. the tissue types of an mcxyz simulation, interpreted as
+                unsigned bytes.
+            F (numpy array, ndim=3): float32 or float64 fluence volume with 
+                shape (Nz,Ny,Nx).
+            table (numpy array, ndim=1): factor for each label, e.g. the 
+                absorption coefficient times the Grueneisen parameter, where
+                table[n] refers to label n.
+
+        Returns:
+            src (tuple): label source (labels, F, table), with labels as int8
+                and table extended to 256 entries, NaN for undefined labels.
 
-def pressure(((x,y,z),p0xyz),(xD,yD,zD),c0=1.):
+        Notes:
+            The returned tuple can be passed in place of p0xyz to the 
+            functions pressure, pressure_LambertianDetector and 
+            velocityPotential, which compute the initial acoustic stress 
+            p0 = F*table[labels] voxel by voxel within the integration loop. 
+            For int8 labels and float32 fluence, this requires 5 bytes per 
+            voxel instead of 8 for p0 in double precision, and a sweep over
+            tissue properties only requires to update the table. Neither 
+            the labels nor the fluence are copied if they are of the 
+            respective type already, e.g. memory maps of mcxyz output, see 
+            McxyzDataset.labelSource.
+        """
+        tab = np.empty(256)
+        tab[:] = np.nan
+        table = np.asarray(table, dtype=float)
+        tab[:table.size] = table
+        return np.asarray(labels, dtype=np.int8), F, tab
+
+
+def _poissonIntegral(((x,y,z),p0xyz),(xD,yD,zD),lambertian=False,c0t=None,sparse=None,nthreads=1):
+        """Dispatch Poisson integral to solver for given detector and binning."""
+        if nthreads < 1:
+            raise ValueError('nthreads must be >= 1')
+        if nthreads != 1 and (isinstance(p0xyz, tuple) or sparse or 
+                              c0t is not None):
+            raise ValueError(
+                "multi-threaded integration requires a dense source volume "
+                "and the time grid set up by the solver")
+        if isinstance(p0xyz, tuple) and len(p0xyz) == 3:
+            labels, F, table = labelSource(*p0xyz)
+            return cartPoissonIntegralSolver_labels(x, y, z, labels, F, table,
+                        xD, yD, zD, c0t, int(lambertian))
+        if not isinstance(p0xyz, tuple):
+            if sparse is None:
+                sparse = (nthreads == 1 and np.count_nonzero(p0xyz) <= 
+                          (1.-SPARSE_ZERO_FRACTION)*p0xyz.size)
+            if sparse:
+                p0xyz = sparseSource(p0xyz)
+        if isinstance(p0xyz, tuple):
+            (kIdx,jIdx,iIdx), p0 = p0xyz
+            return cartPoissonIntegralSolver_sparse(x, y, z, kIdx, jIdx, iIdx, 
+                        p0, xD, yD, zD, c0t, int(lambertian))
+        if c0t is not None:
+            return cartPoissonIntegralSolver_linear(
+                        x, y, z, p0xyz, xD, yD, zD, c0t, int(lambertian))
+        if nthreads != 1:
+            return cartPoissonIntegralSolver_parallel(
+                        x, y, z, p0xyz, xD, yD, zD, int(lambertian), nthreads)
+        if lambertian:
+            return cartPoissonIntegralSolver_Lambertian(x, y, z, p0xyz, xD, yD, zD)
+        return cartPoissonIntegralSolver(x, y, z, p0xyz, xD, yD, zD)
+
+
+@memoize(depends=(customCartesianSolverMcxyz, pruning))
+def pressure(((x,y,z),p0xyz),(xD,yD,zD),c0=1.,t=None,sparse=None,epsL1=None,nthreads=1):
         """Compute acoustic observables.
 
         Compute on-axis and off-axis excess pressure signals for given 
@@ -35,10 +203,24 @@ def pressure(((x,y,z),p0xyz),(xD,yD,zD),c0=1.):
             p0xyz (numpy array, ndim=3): Region of interest (ROI) containing 
                 initial acoustic stress response to extended irradiation 
                 source profile.
+                Alternatively, the coordinate list returned by sparseSource
+                or the label source (labels, F, table), see labelSource.
             xD (float): x-position of detector. 
             yD (float): y-position of detector. 
             zD (float): z-position of detector relative to first layer.
             c0 (float): Homogeneous sonic velocity (default: c0=1.)
+            t (numpy array, ndim=1): Equispaced time grid on which the signal
+                is computed (default: t=None, i.e. time grid set up by the 
+                solver with increment given by the z-spacing). If provided, 
+                contributions are binned linearly onto c0*t, see Notes.
+            sparse (bool): Iterate over the nonzero voxels only (default: 
+                sparse=None, i.e. decided from the fraction of zero voxels).
+            epsL1 (float): Relative L1 error bound up to which the smallest
+                contributions are discarded (default: epsL1=None, i.e. all
+                voxels are integrated), see pruneSource.
+            nthreads (int): Number of OpenMP threads used for the integration 
+                over the ROI (default: nthreads=1, i.e. serial solver), see 
+                Notes.
 
         Returns:
             t (numpy array, ndim=1): Equi-spaced complementary grid.
@@ -55,20 +237,61 @@ def pressure(((x,y,z),p0xyz),(xD,yD,zD),c0=1.):
             volumetric energy density, then on output p = optoacoustic 
             excess pressure/Grueneisenparameter
 
+            If a time grid `t` is supplied, each contribution is split 
+            linearly between the two neighboring grid points (cloud-in-cell 
+            deposition), so that the resolution of the signal is decoupled 
+            from the z-spacing of the ROI. Contributions outside the range of
+            `t` are discarded. Note that the distances between detector and 
+            voxel centers are sampled sparsely at short range, hence c0*dt 
+            should not be chosen much smaller than the voxel spacing.
+
+            For sources confined to a small part of the ROI, e.g. isolated 
+            absorbers in a weakly absorbing background, the Poisson integral 
+            is evaluated over the coordinate list of nonzero voxels. By 
+            default this is done if at least a fraction SPARSE_ZERO_FRACTION
+            of the voxels is zero. The result agrees with the dense solver up 
+            to round-off.
+
+            If epsL1 is given, the voxels with the smallest contributions are
+            discarded and the remaining ones are integrated by the sparse 
+            solver. Selecting the voxels requires their distances to the 
+            detector, hence the saving is largest if the pruned coordinate 
+            list is obtained once via pruneSource and reused, e.g. for 
+            several time grids or observables. pruneSource also returns the
+            achieved error bound and the number of kept voxels.
+
+            For a label source, the initial acoustic stress is computed 
+            within the integration loop of the serial solver, see 
+            labelSource, hence sparse and epsL1 do not apply.
+
+            The multi-threaded solver (nthreads!=1) integrates a dense ROI 
+            on the time grid set up by the solver. Since it does not cover
+            linear binning onto a given t, coordinate lists (including the
+            pruned ones for epsL1) and label sources, these combinations 
+            raise ValueError, and for nthreads!=1 the sparse solver is not 
+            selected automatically.
+
         Refs:
             [1] Landau, L. D. and Lifshitz, E. M.,
                 Hydrodynamik (4th Ed.),
                 Akademie-Verlag (1981, Berlin)
 
         """
-        c0t, I = cartPoissonIntegralSolver(x, y, z, p0xyz, xD, yD, zD)
+        if epsL1 is not None:
+            if isinstance(p0xyz, tuple) and len(p0xyz) == 3:
+                raise ValueError("pruning is not supported for label sources")
+            p0xyz = pruneSource(((x,y,z),p0xyz),(xD,yD,zD),epsL1,False)[0]
+        c0t = None if t is None else c0*np.asarray(t,dtype=float)
+        c0t, I = _poissonIntegral(((x,y,z),p0xyz),(xD,yD,zD),False,c0t,sparse,
+                        nthreads)
 
         I = I/(4.*np.pi*c0)/(c0t[1]-c0t[0])
         p = np.gradient(I)*c0/(c0t[1]-c0t[0])
 
         return c0t/c0, p 
 
-def pressure_LambertianDetector(((x,y,z),p0xyz),(xD,yD,zD),c0=1.):
+@memoize(depends=(customCartesianSolverMcxyz, pruning))
+def pressure_LambertianDetector(((x,y,z),p0xyz),(xD,yD,zD),c0=1.,t=None,sparse=None,epsL1=None,nthreads=1):
         """Compute acoustic observables.
 
         Compute on-axis and off-axis excess pressure signals for given 
@@ -82,10 +305,24 @@ def pressure_LambertianDetector(((x,y,z),p0xyz),(xD,yD,zD),c0=1.):
             p0xyz (numpy array, ndim=3): Region of interest (ROI) containing 
                 initial acoustic stress response to extended irradiation 
                 source profile.
+                Alternatively, the coordinate list returned by sparseSource
+                or the label source (labels, F, table), see labelSource.
             xD (float): x-position of detector. 
             yD (float): y-position of detector. 
             zD (float): z-position of detector relative to first layer.
             c0 (float): Homogeneous sonic velocity (default: c0=1.)
+            t (numpy array, ndim=1): Equispaced time grid on which the signal
+                is computed (default: t=None, i.e. time grid set up by the 
+                solver with increment given by the z-spacing). If provided, 
+                contributions are binned linearly onto c0*t, see Notes.
+            sparse (bool): Iterate over the nonzero voxels only (default: 
+                sparse=None, i.e. decided from the fraction of zero voxels).
+            epsL1 (float): Relative L1 error bound up to which the smallest
+                contributions are discarded (default: epsL1=None, i.e. all
+                voxels are integrated), see pruneSource.
+            nthreads (int): Number of OpenMP threads used for the integration 
+                over the ROI (default: nthreads=1, i.e. serial solver), see 
+                Notes.
 
         Returns:
             t (numpy array, ndim=1): Equi-spaced complementary grid.
@@ -102,13 +339,321 @@ def pressure_LambertianDetector(((x,y,z),p0xyz),(xD,yD,zD),c0=1.):
             volumetric energy density, then on output p = optoacoustic 
             excess pressure/Grueneisenparameter
 
+            If a time grid `t` is supplied, each contribution is split 
+            linearly between the two neighboring grid points (cloud-in-cell 
+            deposition), so that the resolution of the signal is decoupled 
+            from the z-spacing of the ROI. Contributions outside the range of
+            `t` are discarded. Note that the distances between detector and 
+            voxel centers are sampled sparsely at short range, hence c0*dt 
+            should not be chosen much smaller than the voxel spacing.
+
+            For sources confined to a small part of the ROI, e.g. isolated 
+            absorbers in a weakly absorbing background, the Poisson integral 
+            is evaluated over the coordinate list of nonzero voxels. By 
+            default this is done if at least a fraction SPARSE_ZERO_FRACTION
+            of the voxels is zero. The result agrees with the dense solver up 
+            to round-off.
+
+            If epsL1 is given, the voxels with the smallest contributions are
+            discarded and the remaining ones are integrated by the sparse 
+            solver. Selecting the voxels requires their distances to the 
+            detector, hence the saving is largest if the pruned coordinate 
+            list is obtained once via pruneSource and reused, e.g. for 
+            several time grids or observables. pruneSource also returns the
+            achieved error bound and the number of kept voxels.
+
+            For a label source, the initial acoustic stress is computed 
+            within the integration loop of the serial solver, see 
+            labelSource, hence sparse and epsL1 do not apply.
+
+            The multi-threaded solver (nthreads!=1) integrates a dense ROI 
+            on the time grid set up by the solver. Since it does not cover
+            linear binning onto a given t, coordinate lists (including the
+            pruned ones for epsL1) and label sources, these combinations 
+            raise ValueError, and for nthreads!=1 the sparse solver is not 
+            selected automatically.
+
         Refs:
             [1] Landau, L. D. and Lifshitz, E. M.,
                 Hydrodynamik (4th Ed.),
                 Akademie-Verlag (1981, Berlin)
 
         """
-        c0t, I = cartPoissonIntegralSolver_Lambertian(x, y, z, p0xyz, xD, yD, zD)
+        if epsL1 is not None:
+            if isinstance(p0xyz, tuple) and len(p0xyz) == 3:
+                raise ValueError("pruning is not supported for label sources")
+            p0xyz = pruneSource(((x,y,z),p0xyz),(xD,yD,zD),epsL1,True)[0]
+        c0t = None if t is None else c0*np.asarray(t,dtype=float)
+        c0t, I = _poissonIntegral(((x,y,z),p0xyz),(xD,yD,zD),True,c0t,sparse,
+                        nthreads)
+
+        I = I/(4.*np.pi*c0)/(c0t[1]-c0t[0])
+        p = np.gradient(I)*c0/(c0t[1]-c0t[0])
+
+        return c0t/c0, p 
+
+
+def pressure_multiResponse(((x,y,z),p0xyz),(xD,yD,zD),models,c0=1.):
+        """Compute acoustic observables for several detector response models.
+
+        Compute on-axis and off-axis excess pressure signals for given 
+        material response to extended radially symmetric transverse 
+        irradiation source profile as observed by detectors with different
+        angular response at the same position. The region of interest is 
+        traversed only once.
+
+        Args:
+            x (numpy array, ndim=1): Equispaced 1D grid for x-coordinate.
+            y (numpy array, ndim=1): Equispaced 1D grid for y-coordinate.
+            z (numpy array, ndim=1): Equispaced 1D grid for z-coordinate.
+            p0xyz (numpy array, ndim=3): Region of interest (ROI) containing 
+                initial acoustic stress response to extended irradiation 
+                source profile.
+            xD (float): x-position of detector. 
+            yD (float): y-position of detector. 
+            zD (float): z-position of detector relative to first layer.
+            models (list): Detector response models, see detectorResponse.
+            c0 (float): Homogeneous sonic velocity (default: c0=1.)
+
+        Returns:
+            t (numpy array, ndim=1): Equi-spaced complementary grid.
+            p (numpy array, ndim=2): Excess pressure at detector position as
+                function of time, one row per response model.
+
+        Notes:
+            For models point() and lambertian() the signals agree with those
+            of pressure and pressure_LambertianDetector up to round-off.
+        """
+        kind, n, table = responseArrays(models)
+        c0t, I = cartPoissonIntegralSolver_multiResponse(
+                        x, y, z, p0xyz, xD, yD, zD, kind, n, table)
+
+        I = I/(4.*np.pi*c0)/(c0t[1]-c0t[0])
+        p = np.array([np.gradient(Im) for Im in I])*c0/(c0t[1]-c0t[0])
+
+        return c0t/c0, p 
+
+
+def pressure_finiteAperture(((x,y,z),p0xyz),(xD,yD,zD),aperture,c0=1.,
+                            lambertian=False,eps=2.,mMax=32):
+        """Compute acoustic observables for a detector of finite size.
+
+        Compute excess pressure signals for given material response to 
+        extended irradiation source profile, averaged over the sensing area 
+        of a detector with finite aperture. The integration over the 
+        aperture is carried out within a single traversal of the region of
+        interest.
+
+        Args:
+            x (numpy array, ndim=1): Equispaced 1D grid for x-coordinate.
+            y (numpy array, ndim=1): Equispaced 1D grid for y-coordinate.
+            z (numpy array, ndim=1): Equispaced 1D grid for z-coordinate.
+            p0xyz (numpy array, ndim=3): Region of interest (ROI) containing 
+                initial acoustic stress response to extended irradiation 
+                source profile.
+            xD (float): x-position of aperture center. 
+            yD (float): y-position of aperture center. 
+            zD (float): z-position of aperture plane relative to first layer.
+            aperture (tuple): Sensing area in the aperture plane, see 
+                detectorAperture.disc, ring and rectangle.
+            c0 (float): Homogeneous sonic velocity (default: c0=1.)
+            lambertian (bool): Weight contributions by the cosine of the
+                angle to the detector normal (default: lambertian=False).
+            eps (float): Tolerated spread of the travel distance across a 
+                sub-element of the aperture in units of the z-spacing 
+                (default: eps=2.), see Notes.
+            mMax (int): Resolution of the finest quadrature rule for the 
+                aperture (default: mMax=32).
+
+        Returns:
+            t (numpy array, ndim=1): Equi-spaced complementary grid.
+            p (numpy array, ndim=1): Excess pressure averaged over the 
+                aperture as function of time.
+
+        Notes:
+            The aperture is sampled by midpoint rules with up to mMax 
+            sub-elements along each of its axes (u,v). For each voxel, the 
+            coarsest rule is used for which the travel distance varies by 
+            less than eps*dz across a sub-element, where for a disc or ring 
+            the u-axis points along the lateral direction of the voxel. 
+            Voxels for which the travel distance hardly varies across the 
+            sensing area are thus integrated with a few sub-points only, and
+            the resolution perpendicular to the lateral direction stays low.
+            For eps -> 0 the finest rule is used for all voxels. Multiply by
+            detectorAperture.area(aperture) to obtain the signal integrated
+            over the aperture.
+        """
+        us, vs, ws, start, m = quadratureLevels(aperture, mMax)
+        (au, av), rotate = halfWidths(aperture), int(isRotational(aperture))
+        c0t, I = cartPoissonIntegralSolver_aperture(x, y, z, p0xyz, xD, yD, zD,
+                        us, vs, ws, start, m, au, av, rotate, eps, int(lambertian))
+
+        I = I/(4.*np.pi*c0)/(c0t[1]-c0t[0])
+        p = np.gradient(I)*c0/(c0t[1]-c0t[0])
+
+        return c0t/c0, p 
+
+
+def sourcePyramid(p0xyz):
+        """Pyramid of lateral block sums of a source volume.
+
+        Args:
+            p0xyz (numpy array, ndim=3): initial acoustic stress profile with
+                shape (Nz,Ny,Nx).
+
+        Returns:
+            S (numpy array, ndim=1): block sums of all levels, concatenated.
+                Level l comprises the sums over blocks of 2^l x 2^l voxels 
+                of each z-slice (truncated at the upper boundaries of the 
+                ROI), level 0 is p0xyz itself, the top level has a single 
+                cell per z-slice.
+            off (numpy array, ndim=1, dtype=int32): offset of level l in S.
+            shape (numpy array, ndim=2, dtype=int32): number of cells 
+                (Nz,Ny,Nx) of level l.
+
+        Notes:
+            The returned tuple can be passed in place of p0xyz to the 
+            function pressure_octree. When signals for several detector 
+            positions are computed for the same source, building the 
+            pyramid once avoids its reconstruction per detector. The memory
+            requirement is about 4/3 that of p0xyz in double precision.
+        """
+        levels = [np.asarray(p0xyz, dtype=float)]
+        while max(levels[-1].shape[1:]) > 1:
+            A = levels[-1]
+            Nz, Ny, Nx = A.shape
+            A = np.pad(A, [(0,0), (0,Ny%2), (0,Nx%2)], 'constant')
+            levels.append(A.reshape(Nz,A.shape[1]//2,2,A.shape[2]//2,2).sum(axis=(2,4)))
+        off = np.cumsum([0]+[A.size for A in levels[:-1]]).astype(np.int32)
+        shape = np.array([A.shape for A in levels], dtype=np.int32)
+        return np.concatenate([A.ravel() for A in levels]), off, shape
+
+
+def pressure_octree(((x,y,z),p0xyz),(xD,yD,zD),eps=0.5,c0=1.,lambertian=False):
+        """Compute excess pressure by hierarchical aggregation of voxels.
+
+        Compute the excess pressure signal observed by a pointlike (or 
+        Lambertian) detector, where blocks of voxels whose distances to the 
+        detector spread by less than eps*dz are integrated as a single cell.
+
+        Args:
+            x (numpy array, ndim=1): Equispaced 1D grid for x-coordinate.
+            y (numpy array, ndim=1): Equispaced 1D grid for y-coordinate.
+            z (numpy array, ndim=1): Equispaced 1D grid for z-coordinate.
+            p0xyz (numpy array, ndim=3): Region of interest (ROI) containing 
+                initial acoustic stress response to extended irradiation 
+                source profile.
+                Alternatively, the pyramid returned by sourcePyramid.
+            xD (float): x-position of detector. 
+            yD (float): y-position of detector. 
+            zD (float): z-position of detector relative to first layer.
+            eps (float): Opening parameter in units of the z-spacing 
+                (default: eps=0.5), see Notes.
+            c0 (float): Homogeneous sonic velocity (default: c0=1.)
+            lambertian (bool): Weight contributions by the cosine of the
+                angle to the detector normal (default: lambertian=False).
+
+        Returns:
+            t (numpy array, ndim=1): Equi-spaced complementary grid.
+            p (numpy array, ndim=1): Excess pressure at detector position as
+                function of time.
+
+        Notes:
+            A cell of the pyramid of block sums is integrated as a whole, 
+            i.e. placed at the distance of its center, if the distances of 
+            the voxels it covers spread by at most eps*dz, otherwise it is 
+            split into its children, see cartPoissonIntegralSolver_octree. 
+            Thus, the travel distance of each contribution is displaced by 
+            at most eps*dz, and the solution of pressure is recovered for 
+            eps=0. 
+            
+            Blocks are aggregated within z-slices only: for a detector above
+            or below the ROI, the distances of voxels stacked along z spread
+            by about dz, irrespective of the detector distance, whereas for 
+            a detector at distance D from a ROI of lateral extent L, lateral
+            blocks of linear size up to about eps*dz*D/L qualify. Hence, the
+            number of integrated cells decreases with increasing detector 
+            distance, while close to the ROI the cost is that of the voxel 
+            solver plus the overhead of the descent. A profile with negative
+            entries is not supported, since cells with vanishing block sum 
+            are skipped.
+        """
+        if not isinstance(p0xyz, tuple):
+            p0xyz = sourcePyramid(p0xyz)
+        S, off, shape = p0xyz
+        c0t, I = cartPoissonIntegralSolver_octree(x, y, z, S, off, shape, 
+                        xD, yD, zD, eps, int(lambertian))
+
+        I = I/(4.*np.pi*c0)/(c0t[1]-c0t[0])
+        p = np.gradient(I)*c0/(c0t[1]-c0t[0])
+
+        return c0t/c0, p 
+
+
+def pressure_streaming(((x,y,z),slabs),(xD,yD,zD),c0=1.,lambertian=False,nSlab=16):
+        """Compute excess pressure for a ROI supplied as a sequence of z-slabs.
+
+        Compute the excess pressure signal observed by a pointlike (or 
+        Lambertian) detector, where the initial acoustic stress profile is 
+        consumed slab by slab, so that the ROI does not have to be held in 
+        memory as a whole.
+
+        Args:
+            x (numpy array, ndim=1): Equispaced 1D grid for x-coordinate.
+            y (numpy array, ndim=1): Equispaced 1D grid for y-coordinate.
+            z (numpy array, ndim=1): Equispaced 1D grid for z-coordinate of 
+                the full ROI.
+            slabs (array-like or iterable): Either an array with shape 
+                (Nz,Ny,Nx) that is read in slabs of nSlab z-slices, e.g. a 
+                np.memmap, or an iterable of arrays with shape (nz,Ny,Nx) 
+                holding consecutive z-slices of the ROI, starting at z[0], 
+                e.g. a generator.
+            xD (float): x-position of detector. 
+            yD (float): y-position of detector. 
+            zD (float): z-position of detector relative to first layer.
+            c0 (float): Homogeneous sonic velocity (default: c0=1.)
+            lambertian (bool): Weight contributions by the cosine of the
+                angle to the detector normal (default: lambertian=False).
+            nSlab (int): Number of z-slices read at once from an array 
+                (default: nSlab=16).
+
+        Returns:
+            t (numpy array, ndim=1): Equi-spaced complementary grid.
+            p (numpy array, ndim=1): Excess pressure at detector position as
+                function of time.
+
+        Notes:
+            The histogram is set up for the full ROI, as in 
+            cartPoissonIntegralSolver, and is accumulated by 
+            cartPoissonIntegralSolver_accumulate. The traversal order of the
+            voxels is that of the serial solver, hence the signal agrees 
+            with that of pressure (or pressure_LambertianDetector) for any 
+            partition into slabs. Slabs may be float32 or float64 arrays of 
+            arbitrary memory layout, the memory requirement is that of a 
+            single slab.
+        """
+        # TIME GRID OF cartPoissonIntegralSolver FOR THE FULL ROI
+        zz = z - zD
+        dz = zz[1]-zz[0]
+        iTauMax = int((np.max(np.abs(zz))+np.max(np.abs(x-xD))+np.max(np.abs(y-yD)))/dz)
+        c0t = np.linspace(0.,iTauMax*dz,iTauMax,endpoint=False)
+        I = np.zeros(c0t.size)
+
+        if hasattr(slabs, 'shape'):
+            roi = slabs
+            slabs = (roi[k0:k0+nSlab] for k0 in range(0, roi.shape[0], nSlab))
+        k0 = 0
+        for slab in slabs:
+            k1 = k0 + slab.shape[0]
+            if k1 > z.size:
+                raise ValueError(
+                    "slabs extend beyond the %d z-slices of the ROI"%z.size)
+            cartPoissonIntegralSolver_accumulate(x, y, z[k0:k1], slab, 
+                        xD, yD, zD, dz, I, int(lambertian))
+            k0 = k1
+        if k0 != z.size:
+            raise ValueError(
+                "slabs cover %d of the %d z-slices of the ROI"%(k0,z.size))
 
         I = I/(4.*np.pi*c0)/(c0t[1]-c0t[0])
         p = np.gradient(I)*c0/(c0t[1]-c0t[0])
@@ -116,7 +661,7 @@ def pressure_LambertianDetector(((x,y,z),p0xyz),(xD,yD,zD),c0=1.):
         return c0t/c0, p 
 
 
-def velocityPotential(((x,y,z),p0xyz),(xD,yD,zD),(Gamma,rho,c0)):
+def velocityPotential(((x,y,z),p0xyz),(xD,yD,zD),(Gamma,rho,c0),t=None,sparse=None,epsL1=None,nthreads=1):
         """Compute velocity potential at detector field point.
 
         Compute on-axis and off-axis velocity potentials for given 
@@ -130,12 +675,28 @@ def velocityPotential(((x,y,z),p0xyz),(xD,yD,zD),(Gamma,rho,c0)):
             p0xyz (numpy array, ndim=3): region of interest (ROI) containing 
                 initial acoustic stress response to extended irradiation 
                 source profile.
+                Alternatively, the coordinate list returned by sparseSource
+                or the label source (labels, F, table), see labelSource.
             xD (float): x-position of detector. 
             yD (float): y-position of detector. 
             zD (float): z-position of detector relative to first layer.
             Gamma (float): Homogeneous Grueneisen parameter
             rho (float): Homogeneous density
             c0 (float): Homogeneous sonic velocity (default: c0=1.)
+            t (numpy array, ndim=1): Equispaced time grid on which the signal
+                is computed (default: t=None, i.e. time grid set up by the 
+                solver with increment given by the z-spacing). If provided, 
+                contributions are binned linearly onto c0*t.
+            sparse (bool): Iterate over the nonzero voxels only (default: 
+                sparse=None, i.e. decided from the fraction of zero voxels).
+            epsL1 (float): Relative L1 error bound up to which the smallest
+                contributions are discarded (default: epsL1=None, i.e. all
+                voxels are integrated), see pruneSource.
+            nthreads (int): Number of OpenMP threads used for the integration 
+                over the ROI (default: nthreads=1, i.e. serial solver). Only
+                supported for a dense ROI without t and epsL1, otherwise 
+                ValueError is raised. For nthreads!=1 the sparse solver is 
+                not selected automatically.
 
         Returns:
             t (numpy array, ndim=1): equi-spaced time grid of detector signal.
@@ -143,7 +704,13 @@ def velocityPotential(((x,y,z),p0xyz),(xD,yD,zD),(Gamma,rho,c0)):
                 function of time.
 
         """
-        c0t, I = cartPoissonIntegralSolver(x, y, z, p0xyz, xD, yD, zD)
+        if epsL1 is not None:
+            if isinstance(p0xyz, tuple) and len(p0xyz) == 3:
+                raise ValueError("pruning is not supported for label sources")
+            p0xyz = pruneSource(((x,y,z),p0xyz),(xD,yD,zD),epsL1,False)[0]
+        c0t = None if t is None else c0*np.asarray(t,dtype=float)
+        c0t, I = _poissonIntegral(((x,y,z),p0xyz),(xD,yD,zD),False,c0t,sparse,
+                        nthreads)
 
         I = I/(4.*np.pi*c0)/(c0t[1]-c0t[0])
         phi = -Gamma/rho * I
@@ -0,0 +1,131 @@
+""" FILE: detectorAperture.py
+
+Module implementing finite detector apertures for the cartesian Poisson
+integral solver.
+
+An aperture is a sensing area in the plane of the detector position with
+normal along the z-axis, represented by a tuple as set up by one of the
+functions disc, ring and rectangle. For the integration over the sensing
+area, the aperture is sampled by a hierarchy of midpoint quadrature rules
+with independent resolution along two axes (u,v), from which the solver 
+picks the coarsest rule that resolves the variation of the travel distance 
+across the aperture for the voxel at hand, see 
+cartPoissonIntegralSolver_aperture. For a ring or disc, the u-axis is 
+aligned with the lateral direction of the voxel, so that only the 
+resolution along u grows with the lateral distance.
+
+"""
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import numpy as np
+
+
+def disc(R):
+        """Disc shaped aperture of radius R centered at the detector position."""
+        return ('ring', 0., float(R))
+
+
+def ring(Ri, Ro):
+        """Annular aperture with inner radius Ri and outer radius Ro."""
+        return ('ring', float(Ri), float(Ro))
+
+
+def rectangle(wx, wy):
+        """Rectangular aperture with side lengths wx and wy along x and y."""
+        return ('rectangle', float(wx), float(wy))
+
+
+def halfWidths(aperture):
+        """Half-widths (au,av) of aperture along the axes of its quadrature rules."""
+        shape, a, b = aperture
+        if shape == 'ring':
+            return b, b
+        return 0.5*a, 0.5*b
+
+
+def isRotational(aperture):
+        """True if the aperture is invariant under rotations about its center."""
+        return aperture[0] == 'ring'
+
+
+def area(aperture):
+        """Area of aperture."""
+        shape, a, b = aperture
+        if shape == 'ring':
+            return np.pi*(b*b - a*a)
+        return a*b
+
+
+def subPoints(aperture, mu, mv):
+        """Midpoint quadrature rule for the aperture.
+
+        The aperture is divided into mu strips along the u-axis, each of 
+        which is divided into mv sub-elements along the v-axis. For a 
+        rectangle, (u,v) refers to (x,y), for a ring or disc the u-axis may 
+        be rotated arbitrarily about the center.
+
+        Args:
+            aperture (tuple): detector aperture.
+            mu (int): number of sub-elements along u-axis.
+            mv (int): number of sub-elements along v-axis (per segment of 
+                the strip for a ring).
+
+        Returns:
+            us (numpy array, ndim=1): u-offsets of sub-points from center.
+            vs (numpy array, ndim=1): v-offsets of sub-points from center.
+            ws (numpy array, ndim=1): weights of sub-points, normalized to 
+                unity.
+        """
+        shape, a, b = aperture
+        au, av = halfWidths(aperture)
+        du = 2.*au/mu
+        uc = -au + (np.arange(mu)+0.5)*du
+        if shape == 'ring':
+            us, vs, ws = [], [], []
+            for u in uc:
+                co = np.sqrt(b*b - u*u)
+                ci = np.sqrt(max(a*a - u*u, 0.))
+                # STRIP INTERSECTS RING IN [-co,co] OR IN [-co,-ci] AND [ci,co]
+                segs = [(-co,co)] if ci == 0. else [(-co,-ci),(ci,co)]
+                for v0, v1 in segs:
+                    dv = (v1-v0)/mv
+                    vs.append(v0 + (np.arange(mv)+0.5)*dv)
+                    us.append(np.ones(mv)*u)
+                    ws.append(np.ones(mv)*du*dv)
+            us, vs, ws = np.concatenate(us), np.concatenate(vs), np.concatenate(ws)
+        else:
+            dv = 2.*av/mv
+            uu, vv = np.meshgrid(uc, -av + (np.arange(mv)+0.5)*dv, indexing='ij')
+            us, vs, ws = uu.ravel(), vv.ravel(), np.ones(mu*mv)*du*dv
+        return us, vs, ws/np.sum(ws)
+
+
+def quadratureLevels(aperture, mMax=32):
+        """Hierarchy of midpoint quadrature rules for the aperture.
+
+        Args:
+            aperture (tuple): detector aperture.
+            mMax (int): maximal number of sub-elements along each axis
+                (default: mMax=32).
+
+        Returns:
+            us, vs, ws (numpy arrays, ndim=1): sub-points and weights of all
+                rules, see subPoints, concatenated.
+            start (numpy array, ndim=1, dtype=int32): rule (lu,lv) with 
+                resolution (m[lu],m[lv]) comprises the sub-points 
+                start[lu*m.size+lv] to start[lu*m.size+lv+1]-1.
+            m (numpy array, ndim=1): resolutions 1, 2, 4, ... up to mMax.
+        """
+        m = [1]
+        while m[-1] < mMax:
+            m.append(min(2*m[-1], mMax))
+        rules = [subPoints(aperture, mu, mv) for mu in m for mv in m]
+        start = np.cumsum([0]+[us.size for (us,vs,ws) in rules]).astype(np.int32)
+        us, vs, ws = [np.concatenate(c) for c in zip(*rules)]
+        return us, vs, ws, start, np.asarray(m, dtype=float)
+
+# EOF: detectorAperture.py
@@ -0,0 +1,93 @@
+""" FILE: detectorResponse.py
+
+Module implementing detector response models for the multi-response cartesian
+Poisson integral solver.
+
+A response model weights the contribution of a voxel to the Poisson integral
+by a function R(cos(theta)), where theta is the angle between the detector
+normal, i.e. the z-axis, and the line of sight from the detector to the voxel.
+Each model is represented by a tuple (kind, n, table), see
+cartPoissonIntegralSolver_multiResponse, and is set up by one of the
+functions point, lambertian, cosn and tabulated.
+
+"""
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import numpy as np
+
+# MODEL TYPES AS IDENTIFIED BY THE SOLVER
+POINT, COSN, TABULATED = 0, 1, 2
+
+# NUMBER OF SAMPLES OF cos(theta) IN [0,1] FOR TABULATED RESPONSES
+NTAB = 1024
+
+
+def point():
+        """Pointlike detector, R = 1."""
+        return (POINT, 0., None)
+
+
+def lambertian():
+        """Lambertian detector, R = cos(theta)."""
+        return (COSN, 1., None)
+
+
+def cosn(n):
+        """Detector with response R = cos(theta)^n.
+
+        Args:
+            n (float): exponent of cosine.
+        """
+        return (COSN, float(n), None)
+
+
+def tabulated(theta, D, nTab=NTAB):
+        """Detector with tabulated directivity.
+
+        Args:
+            theta (numpy array, ndim=1): increasing angles in [0,pi/2] at
+                which the directivity is given.
+            D (numpy array, ndim=1): directivity at angles theta.
+            nTab (int): number of equispaced samples of cos(theta) in [0,1]
+                used by the solver (default: nTab=NTAB).
+
+        Returns:
+            model (tuple): response model with the directivity resampled on
+                an equispaced grid of cos(theta), on which the solver
+                interpolates linearly.
+
+        Notes:
+            For angles outside the range of theta, the directivity is held
+            constant at its boundary value.
+        """
+        c = np.linspace(0.,1.,nTab)
+        return (TABULATED, 0., np.interp(np.arccos(c), theta, D))
+
+
+def responseArrays(models):
+        """Pack list of response models into arrays accepted by the solver.
+
+        Args:
+            models (list): response models.
+
+        Returns:
+            kind (numpy array, ndim=1, dtype=int32): model types.
+            n (numpy array, ndim=1): exponents of cos^n models.
+            table (numpy array, ndim=2): tabulated responses, one row per
+                model (zero for models that are not tabulated).
+        """
+        nTab = max([2]+[tab.size for (kind,n,tab) in models if tab is not None])
+        table = np.zeros((len(models),nTab))
+        for m, (kind,n,tab) in enumerate(models):
+            if tab is not None:
+                table[m] = np.interp(np.linspace(0.,1.,nTab),
+                                     np.linspace(0.,1.,tab.size), tab)
+        kind = np.array([mdl[0] for mdl in models], dtype=np.int32)
+        n = np.array([mdl[1] for mdl in models], dtype=float)
+        return kind, n, table
+
+# EOF: detectorResponse.py
@@ -0,0 +1,192 @@
+""" FILE: farFieldSolver.py
+
+Module implementing a far-field approximation of the cartesian Poisson
+integral for sinograms, i.e. for detectors on a circle about the source.
+
+For a detector at position r0 + R*n, where n is a unit vector, the distance
+to a voxel at position r reads d = R - s + rho^2/(2R) + O(R^-2), where
+s = n.(r-r0) and rho is the distance of the voxel from the line through r0
+along n. If the quadratic term is small compared to the z-spacing dz, the
+Poisson integral is a plane-integral (Radon) projection of the initial
+acoustic stress along n. For directions n perpendicular to the y-axis, these
+projections follow from the profile summed along y by a slant stack in the
+xz-plane, at a cost of O(Nx*Nz) per direction once the sum is available.
+
+The validity of the far-field approximation for a given direction is judged
+by the Fresnel number F = a^2/(R*dz), where a bounds rho over the support of
+the source.
+
+"""
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import numpy as np
+from acousticObservables import pressure, pressure_LambertianDetector
+
+# FRESNEL NUMBER UP TO WHICH THE FAR-FIELD APPROXIMATION IS USED BY DEFAULT,
+# BOUNDING THE DISPLACEMENT rho^2/(2R) OF CONTRIBUTIONS BY dz/4
+FRESNEL_MAX = 0.5
+
+
+def _supportBox(((x,y,z),p0xyz)):
+        """Corners of the bounding box of the nonzero voxels."""
+        kk, jj, ii = [np.nonzero(np.any(p0xyz != 0, axis=ax))[0]
+                      for ax in [(1,2),(0,2),(0,1)]]
+        if kk.size == 0:
+            return np.zeros((0,3))
+        X, Y, Z = np.meshgrid(x[[ii[0],ii[-1]]], y[[jj[0],jj[-1]]],
+                              z[[kk[0],kk[-1]]], indexing='ij')
+        return np.column_stack((X.ravel(), Y.ravel(), Z.ravel()))
+
+
+def fresnelNumber(((x,y,z),p0xyz),(x0,y0,z0),R,phi):
+        """Fresnel numbers of detectors on a circle in the xz-plane.
+
+        Args:
+            x (numpy array, ndim=1): Equispaced 1D grid for x-coordinate.
+            y (numpy array, ndim=1): Equispaced 1D grid for y-coordinate.
+            z (numpy array, ndim=1): Equispaced 1D grid for z-coordinate.
+            p0xyz (numpy array, ndim=3): initial acoustic stress profile with
+                shape (Nz,Ny,Nx).
+            x0 (float): x-position of center of detection circle.
+            y0 (float): y-position of center of detection circle.
+            z0 (float): z-position of center of detection circle.
+            R (float): radius of detection circle.
+            phi (numpy array, ndim=1): angular positions of detectors in
+                degrees, see sinogram.
+
+        Returns:
+            F (numpy array, ndim=1): Fresnel number a^2/(R*dz) for each
+                detector, where a is the maximal distance of the corners of
+                the bounding box of the source support from the line through
+                (x0,y0,z0) and the detector.
+        """
+        phi = np.radians(np.atleast_1d(np.asarray(phi, dtype=float)))
+        dr = _supportBox(((x,y,z),p0xyz)) - np.array([x0,y0,z0])
+        if dr.shape[0] == 0:
+            return np.zeros(phi.size)
+        n = np.column_stack((np.cos(phi), np.zeros(phi.size), -np.sin(phi)))
+        s = np.dot(n, dr.T)
+        rho2 = np.sum(dr*dr, axis=1)[np.newaxis,:] - s*s
+        return np.max(rho2, axis=1)/(R*(z[1]-z[0]))
+
+
+def _slantStack(((x,z),p0xz),(x0,y0,z0),R,phi,c0t,lambertian,linear=True):
+        """Far-field Poisson integrals by slant stack of the profile summed along y."""
+        dTau = c0t[1]-c0t[0]
+        XX, ZZ = np.meshgrid(x-x0, z-z0)
+        XX, ZZ, W = XX.ravel(), ZZ.ravel(), p0xz.ravel()
+        sel = W != 0.
+        XX, ZZ, W = XX[sel], ZZ[sel], W[sel]
+        I = np.zeros((phi.size, c0t.size))
+        for m in range(phi.size):
+            cp, sp = np.cos(np.radians(phi[m])), np.sin(np.radians(phi[m]))
+            d = R - (cp*XX - sp*ZZ)
+            dI = W*np.abs(ZZ + R*sp)/d/d if lambertian else W/d
+            u = (d - c0t[0])/dTau
+            binId = np.floor(u).astype(int)
+            if linear:
+                # LINEAR BINNING AS IN cartPoissonIntegralSolver_linear
+                u -= binId
+                parts = [(binId, (1.-u)*dI), (binId+1, u*dI)]
+            else:
+                # NEAREST-BIN DEPOSITION AS IN cartPoissonIntegralSolver
+                parts = [(binId, dI)]
+            for b, wb in parts:
+                ok = (b >= 0) & (b < c0t.size)
+                I[m] += np.bincount(b[ok], wb[ok], minlength=c0t.size)
+        return I
+
+
+def sinogram(((x,y,z),p0xyz),(x0,y0,z0),R,phi,c0=1.,t=None,lambertian=False,fresnelMax=FRESNEL_MAX):
+        """Compute excess pressure for detectors on a circle in the xz-plane.
+
+        The detector at angular position phi is located at (x0+R*cos(phi),
+        y0, z0-R*sin(phi)), i.e. phi=90 (phi=270) refers to the detector
+        above (below) the center in backward (forward) mode. For detectors
+        in the far field, as judged by their Fresnel number, the signal is
+        obtained from a plane-integral projection of the source, for all
+        other detectors via the cartesian Poisson integral solver.
+
+        Args:
+            x (numpy array, ndim=1): Equispaced 1D grid for x-coordinate.
+            y (numpy array, ndim=1): Equispaced 1D grid for y-coordinate.
+            z (numpy array, ndim=1): Equispaced 1D grid for z-coordinate.
+            p0xyz (numpy array, ndim=3): Region of interest (ROI) containing
+                initial acoustic stress response to extended irradiation
+                source profile.
+            x0 (float): x-position of center of detection circle.
+            y0 (float): y-position of center of detection circle.
+            z0 (float): z-position of center of detection circle.
+            R (float): radius of detection circle.
+            phi (numpy array, ndim=1): angular positions of detectors in
+                degrees.
+            c0 (float): Homogeneous sonic velocity (default: c0=1.)
+            t (numpy array, ndim=1): Equispaced time grid shared by all
+                detectors (default: t=None, i.e. increment dz/c0 up to the
+                travel time from the most distant detector to the ROI), see
+                Notes.
+            lambertian (bool): Weight contributions by the cosine of the
+                angle to the detector normal (default: lambertian=False).
+            fresnelMax (float): Fresnel number up to which the far-field
+                approximation is used (default: fresnelMax=FRESNEL_MAX).
+                Use fresnelMax=0 (np.inf) to enforce the near-field
+                (far-field) computation for all detectors.
+
+        Returns:
+            t (numpy array, ndim=1): Equi-spaced time grid.
+            p (numpy array, ndim=2): Excess pressure with shape (Nphi,Nt).
+            farField (numpy array, ndim=1, dtype=bool): detectors for which
+                the far-field approximation was used.
+
+        Notes:
+            If t is given, contributions are binned linearly onto c0*t in 
+            either case, see pressure. Otherwise, contributions are deposited
+            in the nearest bin of the time grid set up by the solver, i.e. 
+            the near-field signals are those of pressure without t, padded 
+            or truncated to the shared time grid. In the far field, a 
+            contribution at distance d is
+            displaced by at most F*dz/2 and weighted by 1/(R-s) instead of
+            1/d, so that the signals agree with those of pressure up to
+            corrections of the order of F*dz/2 in time.
+
+            The profile summed along y is computed once, hence the cost of
+            the far-field detectors is O(Nx*Ny*Nz + Nphi*Nx*Nz) instead of
+            O(Nphi*Nx*Ny*Nz).
+        """
+        phi = np.atleast_1d(np.asarray(phi, dtype=float))
+        dz = z[1]-z[0]
+        linear = t is not None
+        if t is None:
+            dr = _supportBox(((x,y,z),p0xyz)) - np.array([x0,y0,z0])
+            dMax = R + (np.sqrt(np.max(np.sum(dr*dr,axis=1))) if dr.size else 0.)
+            # TWO TRAILING EMPTY BINS, SO THAT THE SIGNALS VANISH AT THE END
+            t = np.arange(int(dMax/dz)+3)*dz/c0
+        t = np.asarray(t, dtype=float)
+        c0t = c0*t
+
+        farField = fresnelNumber(((x,y,z),p0xyz),(x0,y0,z0),R,phi) <= fresnelMax
+        p = np.zeros((phi.size, t.size))
+        if np.any(farField):
+            dV = (x[1]-x[0])*(y[1]-y[0])*dz
+            p0xz = np.sum(p0xyz, axis=1, dtype=float)*dV
+            I = _slantStack(((x,z),p0xz),(x0,y0,z0),R,phi[farField],c0t,
+                            lambertian,linear)
+            I = I/(4.*np.pi*c0)/(c0t[1]-c0t[0])
+            p[farField] = np.gradient(I,axis=1)*c0/(c0t[1]-c0t[0])
+        solver = pressure_LambertianDetector if lambertian else pressure
+        for m in np.nonzero(~farField)[0]:
+            cp, sp = np.cos(np.radians(phi[m])), np.sin(np.radians(phi[m]))
+            det = (x0+R*cp,y0,z0-R*sp)
+            if linear:
+                p[m] = solver(((x,y,z),p0xyz),det,c0,t)[1]
+            else:
+                pm = solver(((x,y,z),p0xyz),det,c0)[1][:t.size]
+                p[m,:pm.size] = pm
+
+        return t, p, farField
+
+# EOF: farFieldSolver.py
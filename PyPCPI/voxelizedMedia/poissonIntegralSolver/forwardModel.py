@@ -0,0 +1,104 @@
+""" FILE: forwardModel.py
+
+Module implementing a precomputed sparse representation of the cartesian
+coordinate based Poisson integral solver.
+
+For a fixed computational grid and detector position, the Poisson integral
+is linear in the initial acoustic stress profile. Its discretization in
+cartPoissonIntegralSolver can thus be expressed as a sparse matrix that
+maps the voxels of the region of interest (ROI) to the bins of the retarded
+signal depth. Once assembled, the matrix can be applied to an arbitrary
+number of initial stress profiles at the cost of a sparse matrix-vector
+product each.
+
+"""
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import numpy as np
+import scipy.sparse
+try:
+    from PyPCPI.forwardModelIO import writeForwardModel, readForwardModel
+except ImportError:
+    # OUTSIDE OF THE PyPCPI PACKAGE THE SHARED MODULE IS LOADED FROM ITS FILE
+    import os, imp
+    forwardModelIO = imp.load_source('forwardModelIO', os.path.join(
+                    os.path.dirname(os.path.abspath(__file__)), os.pardir,
+                    os.pardir, 'forwardModelIO.py'))
+    writeForwardModel = forwardModelIO.writeForwardModel
+    readForwardModel = forwardModelIO.readForwardModel
+
+
+def forwardModelMatrix((x,y,z),(xD,yD,zD),lambertian=False):
+        """Assemble sparse forward model matrix.
+
+        Sets up the sparse matrix that maps the initial acoustic stress
+        profile on the (x,y,z) mesh to the Poisson integral at the detector
+        position, following the discretization of cartPoissonIntegralSolver
+        and cartPoissonIntegralSolver_Lambertian, respectively.
+
+        Args:
+            x (numpy array, ndim=1): Equispaced 1D grid for x-coordinate.
+            y (numpy array, ndim=1): Equispaced 1D grid for y-coordinate.
+            z (numpy array, ndim=1): Equispaced 1D grid for z-coordinate.
+            xD (float): x-position of detector.
+            yD (float): y-position of detector.
+            zD (float): z-position of detector relative to first layer.
+            lambertian (bool): Weight contributions by the cosine of the
+                angle to the detector normal (default: lambertian=False).
+
+        Returns:
+            tau (numpy array, ndim=1): retarded signal depth.
+            A (scipy csr_matrix, shape=(tau.size, z.size*y.size*x.size)):
+                forward model matrix. Column index (k*y.size+j)*x.size+i
+                refers to voxel (x[i],y[j],z[k]), i.e. to the C-ordered
+                ravel of p0xyz.
+        """
+        x = x - xD
+        y = y - yD
+        z = z - zD
+        dz = z[1]-z[0]
+        dV = (x[1]-x[0])*(y[1]-y[0])*dz
+        iTauMax = int((np.max(np.abs(z))+np.max(np.abs(x))+np.max(np.abs(y)))/dz)
+        tau = np.linspace(0.,iTauMax*dz,iTauMax,endpoint=False)
+
+        rr = x[np.newaxis,:]**2 + y[:,np.newaxis]**2
+        nSlice = x.size*y.size
+
+        rows, vals = [], []
+        for k in range(z.size):
+            d = np.sqrt(rr + z[k]*z[k]).ravel()
+            rows.append((d/dz).astype(int))
+            vals.append(dV*abs(z[k])/d/d if lambertian else dV/d)
+
+        A = scipy.sparse.coo_matrix(
+                (np.concatenate(vals),
+                (np.concatenate(rows), np.arange(z.size*nSlice))),
+                shape=(tau.size, z.size*nSlice))
+        return tau, A.tocsr()
+
+
+def applyForwardModel((tau,A),p0xyz):
+        """Evaluate Poisson integral via sparse matrix-vector product.
+
+        Args:
+            tau (numpy array, ndim=1): retarded signal depth.
+            A (scipy sparse matrix): forward model matrix.
+            p0xyz (numpy array, ndim=3 or ndim=4): initial acoustic stress
+                profile with shape (Nz,Ny,Nx) or stack of M such profiles
+                with shape (M,Nz,Ny,Nx).
+
+        Returns:
+            tau (numpy array, ndim=1): retarded signal depth.
+            I (numpy array, ndim=1 or ndim=2): Poisson integral with shape
+                (Ntau,) or (M,Ntau) for a stack of profiles.
+        """
+        p0xyz = np.asarray(p0xyz)
+        if p0xyz.ndim == 3:
+            return tau, A.dot(p0xyz.ravel())
+        return tau, A.dot(p0xyz.reshape(p0xyz.shape[0],-1).T).T
+
+# EOF: forwardModel.py
@@ -0,0 +1,156 @@
+""" FILE: latticeSolver.py
+
+Module implementing an FFT based evaluation of the cartesian Poisson integral
+for detectors on a lattice commensurate with the voxel grid.
+
+For detectors at positions (x[a]+sx, y[b]+sy, zD), the distance between
+voxel (i,j,k) and detector (a,b) depends on the index differences (i-a, j-b)
+only. Restricted to a single bin of the retarded signal depth, the Poisson
+integral of cartPoissonIntegralSolver is thus a 2D convolution of each
+z-slice of the initial acoustic stress profile with a kernel that is
+nonzero on the intersection of the slice with a spherical shell only. The
+signals at all lattice points of a detector plane are obtained by FFT
+convolution at a cost of O(N log N) per bin, where N is the number of voxels,
+instead of O(N) per detector.
+
+"""
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import numpy as np
+import scipy.fftpack
+
+
+def _planePoissonIntegral(((x,y,z),Phat),(Lx,Ly),zD,(sx,sy),lambertian,Nt):
+        """Poisson integral for all lattice points of a single detector plane."""
+        Nx, Ny = x.size, y.size
+        dx, dy, dz = x[1]-x[0], y[1]-y[0], z[1]-z[0]
+        dV = dx*dy*dz
+
+        # KERNEL G(m) = K(-m) FOR INDEX DIFFERENCES m=a-i IN [-(N-1),N-1]
+        mx = np.fft.fftfreq(Lx, 1./Lx)
+        my = np.fft.fftfreq(Ly, 1./Ly)
+        XX = (-mx*dx - sx)[np.newaxis,np.newaxis,:]
+        YY = (-my*dy - sy)[np.newaxis,:,np.newaxis]
+        ZZ = (z - zD)[:,np.newaxis,np.newaxis]
+        d = np.sqrt(XX*XX + YY*YY + ZZ*ZZ)
+        w = dV*np.abs(ZZ)/d/d if lambertian else dV/d
+        # EXCLUDE WRAPPED INDEX DIFFERENCES THAT DO NOT CORRESPOND TO PAIRS
+        w[:,:,Nx:Lx-Nx+1] = 0.
+        w[:,Ny:Ly-Ny+1,:] = 0.
+        binId = (d/dz).astype(int).ravel()
+        w = w.ravel()
+
+        # GROUP KERNEL ENTRIES BY BIN OF RETARDED SIGNAL DEPTH
+        mask = (w != 0.) & (binId < Nt)
+        idx = np.nonzero(mask)[0]
+        idx = idx[np.argsort(binId[idx], kind='mergesort')]
+        bounds = np.searchsorted(binId[idx], np.arange(Nt+1))
+
+        I = np.zeros((Ny,Nx,Nt))
+        G = np.zeros(z.size*Ly*Lx)
+        for n in range(Nt):
+            sel = idx[bounds[n]:bounds[n+1]]
+            if sel.size == 0:
+                continue
+            G[sel] = w[sel]
+            Ghat = np.fft.rfft2(G.reshape(z.size,Ly,Lx))
+            I[:,:,n] = np.fft.irfft2(np.sum(Phat*Ghat,axis=0), (Ly,Lx))[:Ny,:Nx]
+            G[sel] = 0.
+        return I
+
+
+def latticePoissonIntegral(((x,y,z),p0xyz),zD,(sx,sy)=(0.,0.),lambertian=False):
+        """Poisson integral at all lattice points of detector planes.
+
+        Computes the Poisson integral of cartPoissonIntegralSolver (or
+        cartPoissonIntegralSolver_Lambertian) for detectors at all positions
+        (x[a]+sx, y[b]+sy, zD), a=0...Nx-1, b=0...Ny-1.
+
+        Args:
+            x (numpy array, ndim=1): Equispaced 1D grid for x-coordinate.
+            y (numpy array, ndim=1): Equispaced 1D grid for y-coordinate.
+            z (numpy array, ndim=1): Equispaced 1D grid for z-coordinate.
+            p0xyz (numpy array, ndim=3): initial acoustic stress profile with
+                shape (Nz,Ny,Nx).
+            zD (float or numpy array, ndim=1): z-position(s) of detector
+                plane(s).
+            sx (float): offset of detector lattice along x (default: 0.).
+            sy (float): offset of detector lattice along y (default: 0.).
+            lambertian (bool): Weight contributions by the cosine of the
+                angle to the detector normal (default: lambertian=False).
+
+        Returns:
+            tau (numpy array, ndim=1): retarded signal depth, shared by all
+                detectors.
+            I (numpy array, ndim=3 or ndim=4): Poisson integral with shape
+                (Ny,Nx,Ntau) for a single detector plane, or with shape
+                (NzD,Ny,Nx,Ntau) for an array of detector planes.
+
+        Notes:
+            The signal of detector (a,b) agrees with that obtained by the
+            solver for the individual detector up to round-off, apart from
+            the length of the time axis, which is set up for the most distant
+            detector here. Contributions of voxels whose distance to the
+            detector falls on a bin boundary might be assigned to the
+            neighboring bin due to round-off.
+
+            The cost is O(Nz*Ly*Lx*log(Ly*Lx)) per bin with FFT lengths
+            Lx >= 2*Nx-1 and Ly >= 2*Ny-1, independent of the number of
+            detectors, and the memory requirement is of the order of
+            Nz*Ly*Lx + Ny*Nx*Ntau.
+        """
+        zDs = np.atleast_1d(np.asarray(zD, dtype=float))
+        dz = z[1]-z[0]
+        Nx, Ny = x.size, y.size
+        Lx = scipy.fftpack.next_fast_len(2*Nx-1)
+        Ly = scipy.fftpack.next_fast_len(2*Ny-1)
+
+        # TIME AXIS OF cartPoissonIntegralSolver FOR THE MOST DISTANT DETECTOR
+        iTauMax = int((np.max(np.abs(z[:,np.newaxis]-zDs))
+                    + max(abs(x[-1]-x[0]-sx),abs(x[-1]-x[0]+sx))
+                    + max(abs(y[-1]-y[0]-sy),abs(y[-1]-y[0]+sy)))/dz)
+        tau = np.linspace(0.,iTauMax*dz,iTauMax,endpoint=False)
+
+        Phat = np.fft.rfft2(np.asarray(p0xyz, dtype=float), (Ly,Lx))
+        I = np.array([_planePoissonIntegral(((x,y,z),Phat),(Lx,Ly),zDi,(sx,sy),
+                            lambertian,tau.size) for zDi in zDs])
+        return tau, (I[0] if np.ndim(zD) == 0 else I)
+
+
+def pressure_lattice(((x,y,z),p0xyz),zD,(sx,sy)=(0.,0.),c0=1.,lambertian=False):
+        """Compute excess pressure at all lattice points of detector planes.
+
+        Args:
+            x (numpy array, ndim=1): Equispaced 1D grid for x-coordinate.
+            y (numpy array, ndim=1): Equispaced 1D grid for y-coordinate.
+            z (numpy array, ndim=1): Equispaced 1D grid for z-coordinate.
+            p0xyz (numpy array, ndim=3): Region of interest (ROI) containing
+                initial acoustic stress response to extended irradiation
+                source profile.
+            zD (float or numpy array, ndim=1): z-position(s) of detector
+                plane(s) relative to first layer.
+            sx (float): offset of detector lattice along x (default: 0.).
+            sy (float): offset of detector lattice along y (default: 0.).
+            c0 (float): Homogeneous sonic velocity (default: c0=1.)
+            lambertian (bool): Weight contributions by the cosine of the
+                angle to the detector normal (default: lambertian=False).
+
+        Returns:
+            t (numpy array, ndim=1): Equi-spaced time grid shared by all
+                detector signals.
+            p (numpy array, ndim=3 or ndim=4): Excess pressure with shape
+                (Ny,Nx,Nt) or (NzD,Ny,Nx,Nt), where p[...,b,a,:] is the
+                signal of the detector at (x[a]+sx, y[b]+sy).
+        """
+        c0t, I = latticePoissonIntegral(((x,y,z),p0xyz),zD,(sx,sy),lambertian)
+
+        I = I/(4.*np.pi*c0)/(c0t[1]-c0t[0])
+        p = np.gradient(I,axis=-1)*c0/(c0t[1]-c0t[0])
+
+        return c0t/c0, p
+
+# EOF: latticeSolver.py
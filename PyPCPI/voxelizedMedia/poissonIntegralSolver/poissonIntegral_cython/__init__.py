@@ -1,2 +1,10 @@
 from customCartesianSolverMcxyz import cartPoissonIntegralSolver
 from customCartesianSolverMcxyz import cartPoissonIntegralSolver_Lambertian
+from customCartesianSolverMcxyz import cartPoissonIntegralSolver_linear
+from customCartesianSolverMcxyz import cartPoissonIntegralSolver_sparse
+from customCartesianSolverMcxyz import cartPoissonIntegralSolver_parallel
+from customCartesianSolverMcxyz import cartPoissonIntegralSolver_multiResponse
+from customCartesianSolverMcxyz import cartPoissonIntegralSolver_aperture
+from customCartesianSolverMcxyz import cartPoissonIntegralSolver_octree
+from customCartesianSolverMcxyz import cartPoissonIntegralSolver_accumulate
+from customCartesianSolverMcxyz import cartPoissonIntegralSolver_labels
@@ -29,10 +29,24 @@ __contact__   = "oliver.melchert@hot.uni-hannover.de"
 import  numpy as np
 cimport numpy as np
 cimport cython
+from cython cimport floating
+from cython.parallel cimport prange, threadid
+
+# initial acoustic stress profiles are accepted as float32 or float64 arrays 
+# of arbitrary memory layout (fused-type memoryviews, no copy on input), while 
+# all histograms are accumulated in double precision
+
+# the ROI is traversed in memory order of p0xyz, i.e. with x running fastest;
+# the multi-threaded solver distributes tiles of TILE_NY consecutive rows of a
+# z-slice over the threads
+DEF TILE_NY = 16
 
 # prefer C function with small overhead 
 cdef extern from "math.h":
-        double sqrt(double value) 
+        double sqrt(double value) nogil
+        double floor(double value) nogil
+        double fabs(double value) nogil
+        double pow(double base, double exponent) nogil
 
 # WARNING: the following features were turned off to yield speed-up
 # (i) bound-checking for array indices
@@ -43,7 +57,7 @@ def cartPoissonIntegralSolver(
         np.ndarray[double, ndim=1] x,\
         np.ndarray[double, ndim=1] y,\
         np.ndarray[double, ndim=1] z,\
-        np.ndarray[double, ndim=3] p0xyz,\
+        const floating[:,:,:] p0xyz,\
         double xD,\
         double yD,\
         double zD
@@ -83,22 +97,24 @@ def cartPoissonIntegralSolver(
         I = np.zeros(tau.size)
         
         # INTEGRATION OVER COMPUTATIONAL DOMAIN -------------------------------
-        for i in range(x.size):
+        for k in range(z.size):
             for j in range(y.size):
-                rr = x[i]*x[i] + y[j]*y[j]
-                for k in range(z.size):
-                    d = sqrt(rr + z[k]*z[k])
+                rr = y[j]*y[j] + z[k]*z[k]
+                for i in range(x.size):
+                    d = sqrt(rr + x[i]*x[i])
                     binId = int(d/dz)
                     dI = p0xyz[k,j,i]*dV/d
                     I[binId] += dI 
                 
         return tau, I
 
+@cython.boundscheck(False)
+@cython.wraparound(False)
 def cartPoissonIntegralSolver_Lambertian(
         np.ndarray[double, ndim=1] x,\
         np.ndarray[double, ndim=1] y,\
         np.ndarray[double, ndim=1] z,\
-        np.ndarray[double, ndim=3] p0xyz,\
+        const floating[:,:,:] p0xyz,\
         double xD,\
         double yD,\
         double zD
@@ -138,15 +154,768 @@ def cartPoissonIntegralSolver_Lambertian(
         I = np.zeros(tau.size)
         
         # INTEGRATION OVER COMPUTATIONAL DOMAIN -------------------------------
-        for i in range(x.size):
+        for k in range(z.size):
             for j in range(y.size):
-                rr = x[i]*x[i] + y[j]*y[j]
-                for k in range(z.size):
-                    d = sqrt(rr + z[k]*z[k])
+                rr = y[j]*y[j] + z[k]*z[k]
+                for i in range(x.size):
+                    d = sqrt(rr + x[i]*x[i])
                     binId = int(d/dz)
                     dI = p0xyz[k,j,i]*dV*abs(z[k])/d/d
                     I[binId] += dI 
                 
         return tau, I
 
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def cartPoissonIntegralSolver_linear(
+        np.ndarray[double, ndim=1] x,\
+        np.ndarray[double, ndim=1] y,\
+        np.ndarray[double, ndim=1] z,\
+        const floating[:,:,:] p0xyz,\
+        double xD,\
+        double yD,\
+        double zD,\
+        np.ndarray[double, ndim=1] tau,\
+        int lambertian
+        ):
+        """cartesian coordinate based poisson integral solver, linear binning. 
+        
+        variant of cartPoissonIntegralSolver (lambertian=0) and 
+        cartPoissonIntegralSolver_Lambertian (lambertian=1) that bins the 
+        contributions onto a user supplied equispaced grid `tau` of the 
+        retarded signal depth. Instead of assigning each contribution to a 
+        single bin, it is split linearly between the two neighboring grid 
+        points (cloud-in-cell deposition). Hence, the resolution of the 
+        signal is decoupled from the spacing of the z-axis. Contributions 
+        outside the range of `tau` are discarded.
+
+        Args:
+            x (numpy array, ndim=1) x-coordinate of detector 
+            y (numpy array, ndim=1) y-coordinate of detector 
+            z (numpy array, ndim=1) z-coordinate of detector
+            p0xyz (numpy array, ndim=3) initial acoustic stress profile 
+            xD (double) x-coordinate of detector position 
+            yD (double) y-coordinate of detector position 
+            zD (double) z-coordinate of detector position (zD<0: backward mode) 
+            tau (numpy array, ndim=1) equispaced grid of measurement depth
+            lambertian (int) weight contributions by |z|/d if nonzero
+
+        Returns:
+            tau (numpy array, ndim=1) measurement depth
+            I (numpy array, ndim=1) Poisson Integral base of oa pressure
+        """
+        # DECLARATION ---------------------------------------------------------
+        cdef int i, j, k, binId, Nt
+        cdef double tau0, dTau, d, dV, rr, dI, u
+        cdef np.ndarray[double, ndim=1] I
+        
+        # INITIALIZATION ------------------------------------------------------
+        x = x - xD
+        y = y - yD
+        z = z - zD
+        dV = (x[1]-x[0])*(y[1]-y[0])*(z[1]-z[0]) 
+        tau0 = tau[0]
+        dTau = tau[1]-tau[0]
+        Nt = tau.size
+        I = np.zeros(Nt)
+        
+        # INTEGRATION OVER COMPUTATIONAL DOMAIN -------------------------------
+        for k in range(z.size):
+            for j in range(y.size):
+                rr = y[j]*y[j] + z[k]*z[k]
+                for i in range(x.size):
+                    d = sqrt(rr + x[i]*x[i])
+                    if lambertian:
+                        dI = p0xyz[k,j,i]*dV*abs(z[k])/d/d
+                    else:
+                        dI = p0xyz[k,j,i]*dV/d
+                    u = (d-tau0)/dTau
+                    binId = <int>floor(u)
+                    u = u - binId
+                    if binId >= 0 and binId < Nt:
+                        I[binId] += (1.0-u)*dI
+                    if binId+1 >= 0 and binId+1 < Nt:
+                        I[binId+1] += u*dI
+                
+        return tau, I
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def cartPoissonIntegralSolver_sparse(
+        np.ndarray[double, ndim=1] x,\
+        np.ndarray[double, ndim=1] y,\
+        np.ndarray[double, ndim=1] z,\
+        const int[:] kIdx,\
+        const int[:] jIdx,\
+        const int[:] iIdx,\
+        const floating[:] p0,\
+        double xD,\
+        double yD,\
+        double zD,\
+        tau=None,\
+        int lambertian=0
+        ):
+        """cartesian coordinate based poisson integral solver, sparse support. 
+        
+        variant of the cartesian solvers that iterates over a coordinate 
+        list of (nonzero) voxels only, i.e. voxel (x[iIdx[n]], y[jIdx[n]],
+        z[kIdx[n]]) carries the initial acoustic stress p0[n]. If `tau` is 
+        None, contributions are binned as in cartPoissonIntegralSolver, 
+        otherwise they are split linearly onto the grid `tau` as in 
+        cartPoissonIntegralSolver_linear.
+
+        Args:
+            x (numpy array, ndim=1) x-coordinate of detector 
+            y (numpy array, ndim=1) y-coordinate of detector 
+            z (numpy array, ndim=1) z-coordinate of detector
+            kIdx (numpy array, ndim=1) z-indices of support voxels
+            jIdx (numpy array, ndim=1) y-indices of support voxels
+            iIdx (numpy array, ndim=1) x-indices of support voxels
+            p0 (numpy array, ndim=1) initial acoustic stress of support voxels
+            xD (double) x-coordinate of detector position 
+            yD (double) y-coordinate of detector position 
+            zD (double) z-coordinate of detector position (zD<0: backward mode) 
+            tau (numpy array, ndim=1) equispaced grid of measurement depth 
+                for linear binning (default: None)
+            lambertian (int) weight contributions by |z|/d if nonzero
+
+        Returns:
+            tau (numpy array, ndim=1) measurement depth
+            I (numpy array, ndim=1) Poisson Integral base of oa pressure
+        """
+        # DECLARATION ---------------------------------------------------------
+        cdef int iTauMax, n, binId, Nt, linear
+        cdef double dz, tau0, dTau, d, dV, dI, u, zk
+        cdef np.ndarray[double, ndim=1] I
+        
+        # INITIALIZATION ------------------------------------------------------
+        x = x - xD
+        y = y - yD
+        z = z - zD
+        dz = z[1]-z[0]
+        dV = (x[1]-x[0])*(y[1]-y[0])*dz 
+        linear = tau is not None
+        if linear:
+            tau0 = tau[0]
+            dTau = tau[1]-tau[0]
+        else:
+            iTauMax = int((np.max(np.abs(z))+np.max(np.abs(x))+np.max(np.abs(y)))/dz)
+            tau = np.linspace(0.,iTauMax*dz,iTauMax,endpoint=False)
+        Nt = tau.size
+        I = np.zeros(Nt)
+        
+        # INTEGRATION OVER SUPPORT OF SOURCE ----------------------------------
+        for n in range(p0.shape[0]):
+            zk = z[kIdx[n]]
+            d = sqrt(x[iIdx[n]]*x[iIdx[n]] + y[jIdx[n]]*y[jIdx[n]] + zk*zk)
+            if lambertian:
+                dI = p0[n]*dV*abs(zk)/d/d
+            else:
+                dI = p0[n]*dV/d
+            if not linear:
+                binId = int(d/dz)
+                I[binId] += dI 
+                continue
+            u = (d-tau0)/dTau
+            binId = <int>floor(u)
+            u = u - binId
+            if binId >= 0 and binId < Nt:
+                I[binId] += (1.0-u)*dI
+            if binId+1 >= 0 and binId+1 < Nt:
+                I[binId+1] += u*dI
+                
+        return tau, I
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def cartPoissonIntegralSolver_parallel(
+        np.ndarray[double, ndim=1] x,\
+        np.ndarray[double, ndim=1] y,\
+        np.ndarray[double, ndim=1] z,\
+        const floating[:,:,:] p0xyz,\
+        double xD,\
+        double yD,\
+        double zD,\
+        int lambertian=0,\
+        int nthreads=1
+        ):
+        """cartesian coordinate based poisson integral solver, multi-threaded. 
+        
+        OpenMP parallel variant of cartPoissonIntegralSolver and 
+        cartPoissonIntegralSolver_Lambertian. The ROI is split into tiles of 
+        TILE_NY consecutive rows of a z-slice, which are traversed in memory 
+        order and distributed statically over the threads. Each thread bins 
+        its contributions into a private histogram, the histograms are 
+        summed in thread order once the integration is complete, so that for
+        nthreads=1 the result is identical to that of the serial solvers.
+
+        Args:
+            x (numpy array, ndim=1) x-coordinate of detector 
+            y (numpy array, ndim=1) y-coordinate of detector 
+            z (numpy array, ndim=1) z-coordinate of detector
+            p0xyz (numpy array, ndim=3) initial acoustic stress profile 
+            xD (double) x-coordinate of detector position 
+            yD (double) y-coordinate of detector position 
+            zD (double) z-coordinate of detector position (zD<0: backward mode) 
+            lambertian (int) weight contributions by |z|/d if nonzero
+            nthreads (int) number of OpenMP threads
+
+        Returns:
+            tau (numpy array, ndim=1) measurement depth
+            I (numpy array, ndim=1) Poisson Integral base of oa pressure
+        """
+        # DECLARATION ---------------------------------------------------------
+        cdef int iTauMax, i, j, k, n, tile, tid, j0, j1, nTilesY, binId
+        cdef int Nx, Ny, Nz
+        cdef double dz, d, dV, rr
+        cdef double[:] xv, yv, zv
+        cdef double[:,:] Ith
+        cdef np.ndarray[double, ndim=1] tau, I
+        
+        # INITIALIZATION ------------------------------------------------------
+        x = x - xD
+        y = y - yD
+        z = z - zD
+        dz = z[1]-z[0]
+        dV = (x[1]-x[0])*(y[1]-y[0])*dz 
+        iTauMax = int((np.max(np.abs(z))+np.max(np.abs(x))+np.max(np.abs(y)))/dz)
+        tau = np.linspace(0.,iTauMax*dz,iTauMax,endpoint=False)
+        Ith = np.zeros((nthreads,tau.size))
+        xv, yv, zv = x, y, z
+        Nx, Ny, Nz = x.size, y.size, z.size
+        nTilesY = (Ny + TILE_NY - 1)//TILE_NY
+        
+        # INTEGRATION OVER COMPUTATIONAL DOMAIN -------------------------------
+        for tile in prange(Nz*nTilesY, nogil=True, schedule='static', num_threads=nthreads):
+            tid = threadid()
+            k = tile//nTilesY
+            j0 = (tile%nTilesY)*TILE_NY
+            j1 = j0 + TILE_NY
+            if j1 > Ny:
+                j1 = Ny
+            for j in range(j0, j1):
+                rr = yv[j]*yv[j] + zv[k]*zv[k]
+                for i in range(Nx):
+                    d = sqrt(rr + xv[i]*xv[i])
+                    binId = <int>(d/dz)
+                    if lambertian:
+                        Ith[tid,binId] += p0xyz[k,j,i]*dV*fabs(zv[k])/d/d
+                    else:
+                        Ith[tid,binId] += p0xyz[k,j,i]*dV/d
+
+        # REDUCTION OF THREAD-PRIVATE HISTOGRAMS ------------------------------
+        I = np.asarray(Ith)[0].copy()
+        for n in range(1,nthreads):
+            I += np.asarray(Ith)[n]
+                
+        return tau, I
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def cartPoissonIntegralSolver_multiResponse(
+        np.ndarray[double, ndim=1] x,\
+        np.ndarray[double, ndim=1] y,\
+        np.ndarray[double, ndim=1] z,\
+        const floating[:,:,:] p0xyz,\
+        double xD,\
+        double yD,\
+        double zD,\
+        const int[:] kind,\
+        const double[:] n,\
+        const double[:,:] table
+        ):
+        """cartesian coordinate based poisson integral solver, multi-response. 
+        
+        variant of the cartesian solvers that bins the contribution of each 
+        voxel into one histogram per detector response model in a single 
+        traversal of the ROI. Model m weights the contribution p0*dV/d of a 
+        voxel by R_m(c), where c=|z|/d is the cosine of the angle between 
+        the detector normal (z-axis) and the line of sight to the voxel:
+            kind[m]=0: R_m(c) = 1 (pointlike detector)
+            kind[m]=1: R_m(c) = c^n[m] (n[m]=1: Lambertian detector)
+            kind[m]=2: R_m(c) linearly interpolated from table[m,:], sampled
+                       on an equispaced grid of c in [0,1]
+
+        Args:
+            x (numpy array, ndim=1) x-coordinate of detector 
+            y (numpy array, ndim=1) y-coordinate of detector 
+            z (numpy array, ndim=1) z-coordinate of detector
+            p0xyz (numpy array, ndim=3) initial acoustic stress profile 
+            xD (double) x-coordinate of detector position 
+            yD (double) y-coordinate of detector position 
+            zD (double) z-coordinate of detector position (zD<0: backward mode) 
+            kind (numpy array, ndim=1) type of response model
+            n (numpy array, ndim=1) exponents of cos^n response models
+            table (numpy array, ndim=2) tabulated responses, one row per model
+
+        Returns:
+            tau (numpy array, ndim=1) measurement depth
+            I (numpy array, ndim=2) Poisson Integral base of oa pressure, one 
+                row per response model 
+        """
+        # DECLARATION ---------------------------------------------------------
+        cdef int iTauMax, i, j, k, m, l, binId, nM, nTab
+        cdef double dz, d, dV, rr, dI, c, u, R
+        cdef np.ndarray[double, ndim=1] tau
+        cdef double[:,:] I
+        
+        # INITIALIZATION ------------------------------------------------------
+        x = x - xD
+        y = y - yD
+        z = z - zD
+        dz = z[1]-z[0]
+        dV = (x[1]-x[0])*(y[1]-y[0])*dz 
+        iTauMax = int((np.max(np.abs(z))+np.max(np.abs(x))+np.max(np.abs(y)))/dz)
+        tau = np.linspace(0.,iTauMax*dz,iTauMax,endpoint=False)
+        nM, nTab = kind.shape[0], table.shape[1]
+        I = np.zeros((nM,tau.size))
+        
+        # INTEGRATION OVER COMPUTATIONAL DOMAIN -------------------------------
+        for k in range(z.size):
+            for j in range(y.size):
+                rr = y[j]*y[j] + z[k]*z[k]
+                for i in range(x.size):
+                    d = sqrt(rr + x[i]*x[i])
+                    binId = int(d/dz)
+                    dI = p0xyz[k,j,i]*dV/d
+                    c = fabs(z[k])/d
+                    for m in range(nM):
+                        if kind[m] == 0:
+                            R = 1.0
+                        elif kind[m] == 1:
+                            R = c if n[m] == 1.0 else pow(c,n[m])
+                        else:
+                            u = c*(nTab-1)
+                            l = <int>u
+                            if l >= nTab-1:
+                                R = table[m,nTab-1]
+                            else:
+                                R = table[m,l] + (u-l)*(table[m,l+1]-table[m,l])
+                        I[m,binId] += dI*R 
+                
+        return tau, np.asarray(I)
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def cartPoissonIntegralSolver_aperture(
+        np.ndarray[double, ndim=1] x,\
+        np.ndarray[double, ndim=1] y,\
+        np.ndarray[double, ndim=1] z,\
+        const floating[:,:,:] p0xyz,\
+        double xD,\
+        double yD,\
+        double zD,\
+        const double[:] us,\
+        const double[:] vs,\
+        const double[:] ws,\
+        const int[:] start,\
+        const double[:] m,\
+        double au,\
+        double av,\
+        int rotate,\
+        double eps,\
+        int lambertian=0
+        ):
+        """cartesian coordinate based poisson integral solver, finite aperture. 
+        
+        variant of the cartesian solvers for a detector with finite sensing 
+        area in the plane z=zD. The aperture is represented by a set of 
+        quadrature rules (lu,lv) with resolution (m[lu],m[lv]) along the axes
+        (u,v) of the aperture, comprising the sub-points (us[s],vs[s]) with 
+        weights ws[s] for start[r] <= s < start[r+1], r = lu*m.size+lv. For 
+        rotate=0 the (u,v) axes coincide with the (x,y) axes, for rotate=1 
+        the u-axis is aligned with the lateral direction of the voxel. 
+        For each voxel, the spread of travel distances across the aperture 
+        along u is estimated as
+            Du = min(2*au, (2*au*pu + au^2/2)/d0),
+        where pu is the lateral distance of the voxel from the aperture 
+        center along u, and d0 is the distance of the voxel from the aperture
+        center (Dv analogously). The coarsest rule with Du/m[lu] <= eps*dz 
+        and Dv/m[lv] <= eps*dz is used (the finest rule if none qualifies).
+        Hence, voxels are integrated with few sub-points if the travel 
+        distance varies little across the aperture.
+
+        Args:
+            x (numpy array, ndim=1) x-coordinate of detector 
+            y (numpy array, ndim=1) y-coordinate of detector 
+            z (numpy array, ndim=1) z-coordinate of detector
+            p0xyz (numpy array, ndim=3) initial acoustic stress profile 
+            xD (double) x-coordinate of aperture center 
+            yD (double) y-coordinate of aperture center 
+            zD (double) z-coordinate of aperture plane (zD<0: backward mode) 
+            us (numpy array, ndim=1) u-offsets of sub-points
+            vs (numpy array, ndim=1) v-offsets of sub-points
+            ws (numpy array, ndim=1) weights of sub-points
+            start (numpy array, ndim=1) first sub-point of each rule
+            m (numpy array, ndim=1) resolutions of rules
+            au (double) half-width of aperture along u
+            av (double) half-width of aperture along v
+            rotate (int) align u-axis with lateral direction of voxel if 
+                nonzero (for rotationally invariant apertures only)
+            eps (double) tolerated spread of travel distance per sub-element 
+                in units of dz
+            lambertian (int) weight contributions by |z|/d if nonzero
+
+        Returns:
+            tau (numpy array, ndim=1) measurement depth
+            I (numpy array, ndim=1) aperture averaged Poisson Integral base 
+                of oa pressure
+        """
+        # DECLARATION ---------------------------------------------------------
+        cdef int iTauMax, i, j, k, lu, lv, n, nL, binId
+        cdef double dz, d, d0, dV, dI, rho, pu, pv, Du, Dv, cA, sA
+        cdef double px, py, dx, dy, zz, w
+        cdef np.ndarray[double, ndim=1] tau, I
+        
+        # INITIALIZATION ------------------------------------------------------
+        x = x - xD
+        y = y - yD
+        z = z - zD
+        dz = z[1]-z[0]
+        dV = (x[1]-x[0])*(y[1]-y[0])*dz 
+        iTauMax = int((np.max(np.abs(z))+np.max(np.abs(x))+np.max(np.abs(y))
+                        +2*sqrt(au*au+av*av))/dz)
+        tau = np.linspace(0.,iTauMax*dz,iTauMax,endpoint=False)
+        I = np.zeros(tau.size)
+        nL = m.shape[0]
+        cA, sA = 1.0, 0.0
+        
+        # INTEGRATION OVER COMPUTATIONAL DOMAIN -------------------------------
+        for k in range(z.size):
+            zz = z[k]*z[k]
+            for j in range(y.size):
+                for i in range(x.size):
+                    # CHOOSE QUADRATURE RULE FOR APERTURE ---------------------
+                    rho = sqrt(x[i]*x[i] + y[j]*y[j])
+                    d0 = sqrt(rho*rho + zz)
+                    if rotate:
+                        pu, pv = rho, 0.0
+                        if rho > 0.0:
+                            cA, sA = x[i]/rho, y[j]/rho
+                    else:
+                        pu, pv = fabs(x[i]), fabs(y[j])
+                    Du, Dv = 2.0*au, 2.0*av
+                    if d0 > 0.0:
+                        Du = min(Du, (2.0*au*pu + 0.5*au*au)/d0)
+                        Dv = min(Dv, (2.0*av*pv + 0.5*av*av)/d0)
+                    lu = 0
+                    while lu < nL-1 and Du > eps*dz*m[lu]:
+                        lu += 1
+                    lv = 0
+                    while lv < nL-1 and Dv > eps*dz*m[lv]:
+                        lv += 1
+                    # INTEGRATE OVER APERTURE ---------------------------------
+                    w = p0xyz[k,j,i]*dV
+                    for n in range(start[lu*nL+lv], start[lu*nL+lv+1]):
+                        if rotate:
+                            px = cA*us[n] - sA*vs[n]
+                            py = sA*us[n] + cA*vs[n]
+                        else:
+                            px, py = us[n], vs[n]
+                        dx = x[i] - px
+                        dy = y[j] - py
+                        d = sqrt(dx*dx + dy*dy + zz)
+                        binId = int(d/dz)
+                        dI = w*ws[n]/d
+                        if lambertian:
+                            dI = dI*fabs(z[k])/d
+                        I[binId] += dI 
+                
+        return tau, I
+
+cdef inline double _gap2(double lo, double hi) nogil:
+        """squared distance of the origin to the interval [lo,hi]"""
+        if lo > 0.0:
+            return lo*lo
+        if hi < 0.0:
+            return hi*hi
+        return 0.0
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def cartPoissonIntegralSolver_octree(
+        np.ndarray[double, ndim=1] x,\
+        np.ndarray[double, ndim=1] y,\
+        np.ndarray[double, ndim=1] z,\
+        const double[:] S,\
+        const int[:] off,\
+        const int[:,:] shape,\
+        double xD,\
+        double yD,\
+        double zD,\
+        double eps,\
+        int lambertian=0
+        ):
+        """cartesian coordinate based poisson integral solver, hierarchical. 
+        
+        multiresolution variant of cartPoissonIntegralSolver (lambertian=0) 
+        and cartPoissonIntegralSolver_Lambertian (lambertian=1). Each 
+        z-slice of the ROI is represented by a pyramid of block sums, where
+        cell (k,j,i) of level l sums the initial acoustic stress of the 
+        voxels with indices k x [j*2^l,(j+1)*2^l) x [i*2^l,(i+1)*2^l). For 
+        each slice, the pyramid is descended depth first from the single 
+        cell of the top level. A cell is opened, i.e. replaced by its (up 
+        to 4) children, if the spread dmax-dmin of the distances between the 
+        detector and the voxel centers it covers exceeds eps*dz, otherwise 
+        its sum is deposited at the distance of the center of the cell. 
+        The voxels of an opened cell of level 1 are integrated directly as 
+        in the voxel solvers, cells with vanishing sum are skipped.
+
+        Args:
+            x (numpy array, ndim=1) x-coordinate of detector 
+            y (numpy array, ndim=1) y-coordinate of detector 
+            z (numpy array, ndim=1) z-coordinate of detector
+            S (numpy array, ndim=1) block sums of all levels, concatenated
+            off (numpy array, ndim=1) offset of level l in S
+            shape (numpy array, ndim=2) number of cells (Nz,Ny,Nx) of level l
+            xD (double) x-coordinate of detector position 
+            yD (double) y-coordinate of detector position 
+            zD (double) z-coordinate of detector position (zD<0: backward mode) 
+            eps (double) opening parameter in units of the z-spacing
+            lambertian (int) weight contributions by |z|/d if nonzero
+
+        Returns:
+            tau (numpy array, ndim=1) measurement depth
+            I (numpy array, ndim=1) Poisson Integral base of oa pressure
+        """
+        # DECLARATION ---------------------------------------------------------
+        cdef int iTauMax, nLev, top, l, k, j, i, c, jc, ic, binId
+        cdef int j0, j1, i0, i1, Ny, Nx
+        cdef double dz, dV, d, w, zz, rr, xc, yc, dmin2, dmax2
+        cdef double[:] xv, yv, zv
+        cdef int[:,:] stack
+        cdef np.ndarray[double, ndim=1] tau, I
+        
+        # INITIALIZATION ------------------------------------------------------
+        x = x - xD
+        y = y - yD
+        z = z - zD
+        dz = z[1]-z[0]
+        dV = (x[1]-x[0])*(y[1]-y[0])*dz 
+        iTauMax = int((np.max(np.abs(z))+np.max(np.abs(x))+np.max(np.abs(y)))/dz)
+        tau = np.linspace(0.,iTauMax*dz,iTauMax,endpoint=False)
+        I = np.zeros(tau.size)
+        xv, yv, zv = x, y, z
+        nLev = shape.shape[0]
+        Ny, Nx = shape[0,1], shape[0,2]
+        # DEPTH FIRST TRAVERSAL KEEPS AT MOST 3 PENDING SIBLINGS PER LEVEL
+        stack = np.zeros((4*nLev+1,3), dtype=np.int32)
+        
+        # DESCENT OF PYRAMID FOR EACH z-SLICE ---------------------------------
+        for k in range(zv.shape[0]):
+            zz = zv[k]*zv[k]
+            stack[0,0], stack[0,1], stack[0,2] = nLev-1, 0, 0
+            top = 1
+            while top > 0:
+                top -= 1
+                l, j, i = stack[top,0], stack[top,1], stack[top,2]
+                w = S[off[l] + (k*shape[l,1] + j)*shape[l,2] + i]
+                if w == 0.0:
+                    continue
+                if l == 0:
+                    d = sqrt(yv[j]*yv[j] + zz + xv[i]*xv[i])
+                else:
+                    # INDEX RANGE OF VOXELS COVERED BY CELL
+                    j0, i0 = j << l, i << l
+                    j1 = min((j+1) << l, yv.shape[0]) - 1
+                    i1 = min((i+1) << l, xv.shape[0]) - 1
+                    dmin2 = _gap2(xv[i0],xv[i1]) + _gap2(yv[j0],yv[j1]) + zz
+                    dmax2 = max(xv[i0]*xv[i0], xv[i1]*xv[i1]) + \
+                            max(yv[j0]*yv[j0], yv[j1]*yv[j1]) + zz
+                    if sqrt(dmax2) - sqrt(dmin2) > eps*dz and l == 1:
+                        # OPEN CELL ABOVE VOXEL LEVEL, INTEGRATE VOXELS DIRECTLY
+                        for jc in range(j0, j1+1):
+                            rr = yv[jc]*yv[jc] + zz
+                            for ic in range(i0, i1+1):
+                                d = sqrt(rr + xv[ic]*xv[ic])
+                                w = S[(k*Ny + jc)*Nx + ic]
+                                binId = int(d/dz)
+                                if lambertian:
+                                    I[binId] += w*dV*fabs(zv[k])/d/d
+                                else:
+                                    I[binId] += w*dV/d
+                        continue
+                    if sqrt(dmax2) - sqrt(dmin2) > eps*dz:
+                        # OPEN CELL
+                        for c in range(4):
+                            jc = (j << 1) | (c >> 1)
+                            ic = (i << 1) | (c & 1)
+                            if jc < shape[l-1,1] and ic < shape[l-1,2]:
+                                stack[top,0], stack[top,1], stack[top,2] = l-1, jc, ic
+                                top += 1
+                        continue
+                    xc = 0.5*(xv[i0] + xv[i1])
+                    yc = 0.5*(yv[j0] + yv[j1])
+                    d = sqrt(yc*yc + zz + xc*xc)
+                binId = int(d/dz)
+                if lambertian:
+                    I[binId] += w*dV*fabs(zv[k])/d/d
+                else:
+                    I[binId] += w*dV/d
+                
+        return tau, I
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def cartPoissonIntegralSolver_accumulate(
+        np.ndarray[double, ndim=1] x,\
+        np.ndarray[double, ndim=1] y,\
+        np.ndarray[double, ndim=1] z,\
+        const floating[:,:,:] p0xyz,\
+        double xD,\
+        double yD,\
+        double zD,\
+        double dz,\
+        double[:] I,\
+        int lambertian=0
+        ):
+        """cartesian coordinate based poisson integral solver, accumulating. 
+        
+        variant of cartPoissonIntegralSolver (lambertian=0) and 
+        cartPoissonIntegralSolver_Lambertian (lambertian=1) for a slab of 
+        consecutive z-slices of the ROI. The contributions are added to the
+        histogram `I` supplied by the caller, with bins of width dz, i.e. the
+        z-spacing of the full ROI, so that the Poisson integral of the ROI is
+        accumulated slab by slab. Contributions beyond the range of `I` are
+        discarded.
+
+        Args:
+            x (numpy array, ndim=1) x-coordinate of detector 
+            y (numpy array, ndim=1) y-coordinate of detector 
+            z (numpy array, ndim=1) z-coordinate of detector for the slab
+            p0xyz (numpy array, ndim=3) initial acoustic stress profile of 
+                the slab 
+            xD (double) x-coordinate of detector position 
+            yD (double) y-coordinate of detector position 
+            zD (double) z-coordinate of detector position (zD<0: backward mode) 
+            dz (double) z-spacing of the ROI, i.e. bin width of `I`
+            I (numpy array, ndim=1) histogram updated in place
+            lambertian (int) weight contributions by |z|/d if nonzero
+        """
+        # DECLARATION ---------------------------------------------------------
+        cdef int i, j, k, binId, Nt
+        cdef double d, dV, rr, dI
+        
+        # INITIALIZATION ------------------------------------------------------
+        x = x - xD
+        y = y - yD
+        z = z - zD
+        dV = (x[1]-x[0])*(y[1]-y[0])*dz 
+        Nt = I.shape[0]
+        
+        # INTEGRATION OVER SLAB -----------------------------------------------
+        for k in range(z.size):
+            for j in range(y.size):
+                rr = y[j]*y[j] + z[k]*z[k]
+                for i in range(x.size):
+                    d = sqrt(rr + x[i]*x[i])
+                    binId = int(d/dz)
+                    if lambertian:
+                        dI = p0xyz[k,j,i]*dV*abs(z[k])/d/d
+                    else:
+                        dI = p0xyz[k,j,i]*dV/d
+                    if binId < Nt:
+                        I[binId] += dI 
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def cartPoissonIntegralSolver_labels(
+        np.ndarray[double, ndim=1] x,\
+        np.ndarray[double, ndim=1] y,\
+        np.ndarray[double, ndim=1] z,\
+        const signed char[:,:,:] labels,\
+        const floating[:,:,:] F,\
+        const double[:] table,\
+        double xD,\
+        double yD,\
+        double zD,\
+        tau=None,\
+        int lambertian=0
+        ):
+        """cartesian coordinate based poisson integral solver, label volume. 
+        
+        variant of the cartesian solvers for a source given by a label 
+        volume, e.g. the tissue types of an mcxyz simulation, a fluence 
+        volume and a table of per-label factors, e.g. the absorption 
+        coefficient times the Grueneisen parameter. The initial acoustic 
+        stress p0 = F[k,j,i]*table[labels[k,j,i]] is computed within the 
+        integration loop, where labels are interpreted as unsigned bytes. If 
+        `tau` is None, contributions are binned as in 
+        cartPoissonIntegralSolver, otherwise they are split linearly onto 
+        the grid `tau` as in cartPoissonIntegralSolver_linear.
+
+        Args:
+            x (numpy array, ndim=1) x-coordinate of detector 
+            y (numpy array, ndim=1) y-coordinate of detector 
+            z (numpy array, ndim=1) z-coordinate of detector
+            labels (numpy array, ndim=3, dtype=int8) label volume
+            F (numpy array, ndim=3) fluence volume
+            table (numpy array, ndim=1) factors for labels 0...255 
+            xD (double) x-coordinate of detector position 
+            yD (double) y-coordinate of detector position 
+            zD (double) z-coordinate of detector position (zD<0: backward mode) 
+            tau (numpy array, ndim=1) equispaced grid of measurement depth 
+                for linear binning (default: None)
+            lambertian (int) weight contributions by |z|/d if nonzero
+
+        Returns:
+            tau (numpy array, ndim=1) measurement depth
+            I (numpy array, ndim=1) Poisson Integral base of oa pressure
+        """
+        # DECLARATION ---------------------------------------------------------
+        cdef int iTauMax, i, j, k, binId, Nt, linear
+        cdef double dz, tau0, dTau, d, dV, rr, dI, u
+        cdef np.ndarray[double, ndim=1] I
+        
+        # INITIALIZATION ------------------------------------------------------
+        if table.shape[0] != 256:
+            raise ValueError("table has to provide factors for labels 0...255")
+        x = x - xD
+        y = y - yD
+        z = z - zD
+        dz = z[1]-z[0]
+        dV = (x[1]-x[0])*(y[1]-y[0])*dz 
+        linear = tau is not None
+        if linear:
+            tau0 = tau[0]
+            dTau = tau[1]-tau[0]
+        else:
+            iTauMax = int((np.max(np.abs(z))+np.max(np.abs(x))+np.max(np.abs(y)))/dz)
+            tau = np.linspace(0.,iTauMax*dz,iTauMax,endpoint=False)
+        Nt = tau.size
+        I = np.zeros(Nt)
+        
+        # INTEGRATION OVER COMPUTATIONAL DOMAIN -------------------------------
+        for k in range(z.size):
+            for j in range(y.size):
+                rr = y[j]*y[j] + z[k]*z[k]
+                for i in range(x.size):
+                    d = sqrt(rr + x[i]*x[i])
+                    dI = F[k,j,i]*table[<unsigned char>labels[k,j,i]]
+                    if lambertian:
+                        dI = dI*dV*abs(z[k])/d/d
+                    else:
+                        dI = dI*dV/d
+                    if not linear:
+                        binId = int(d/dz)
+                        I[binId] += dI 
+                        continue
+                    u = (d-tau0)/dTau
+                    binId = <int>floor(u)
+                    u = u - binId
+                    if binId >= 0 and binId < Nt:
+                        I[binId] += (1.0-u)*dI
+                    if binId+1 >= 0 and binId+1 < Nt:
+                        I[binId+1] += u*dI
+                
+        return tau, I
+
 # EOF: customCartesianSolverMcxyz.pyx 
@@ -1,8 +1,15 @@
 from distutils.core import setup
+from distutils.extension import Extension
 from Cython.Build import cythonize
 import numpy
 
+extensions = [
+  Extension("customCartesianSolverMcxyz", ["customCartesianSolverMcxyz.pyx"],
+            extra_compile_args = ["-fopenmp"],
+            extra_link_args = ["-fopenmp"])
+]
+
 setup(
-  ext_modules = cythonize("customCartesianSolverMcxyz.pyx"),
+  ext_modules = cythonize(extensions),
   include_dirs = [numpy.get_include()]
 )
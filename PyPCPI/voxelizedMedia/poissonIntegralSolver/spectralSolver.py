@@ -0,0 +1,117 @@
+""" FILE: spectralSolver.py
+
+Module implementing a spectral (k-space) solution of the optoacoustic initial
+value problem for planar detector arrays.
+
+In free space, the excess pressure due to the initial acoustic stress p0
+satisfies the wave equation with initial conditions p(r,0) = p0(r) and
+dp/dt(r,0) = 0. In Fourier space its solution reads
+
+    p(k,t) = p0(k) cos(c0 |k| t),
+
+which is equivalent to the Poisson integral evaluated by the cartesian
+solvers, see chapter 68 of Ref. [1]. Evaluating the inverse transform along
+z at the plane of the detector array and the inverse transform along x and y
+by FFT yields the signals of all array elements at once.
+
+Refs:
+    [1] Landau, L. D. and Lifshitz, E. M.,
+        Hydrodynamik (4th Ed.),
+        Akademie-Verlag (1981, Berlin)
+
+"""
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import numpy as np
+import scipy.fftpack
+
+
+def pressure_planarArray(((x,y,z),p0xyz),zD,c0=1.,t=None):
+        """Compute excess pressure on a planar detector array.
+
+        Computes the excess pressure at the elements (x[a], y[b], zD) of a
+        planar detector array by an FFT based k-space method.
+
+        Args:
+            x (numpy array, ndim=1): Equispaced 1D grid for x-coordinate.
+            y (numpy array, ndim=1): Equispaced 1D grid for y-coordinate.
+            z (numpy array, ndim=1): Equispaced 1D grid for z-coordinate.
+            p0xyz (numpy array, ndim=3): Region of interest (ROI) containing
+                initial acoustic stress response to extended irradiation
+                source profile.
+            zD (float): z-position of detector plane relative to first layer.
+            c0 (float): Homogeneous sonic velocity (default: c0=1.)
+            t (numpy array, ndim=1): Time grid on which the signals are
+                computed (default: t=None, i.e. increment dz/c0 up to the
+                travel time from the detector plane to the most distant
+                voxel).
+
+        Returns:
+            t (numpy array, ndim=1): Time grid shared by all elements.
+            p (numpy array, ndim=3): Excess pressure with shape (Ny,Nx,Nt),
+                where p[b,a,:] is the signal of the element at (x[a],y[b]).
+
+        Notes:
+            To avoid wrap-around, the ROI is zero padded so that periodic
+            images of the source are farther than c0*max(t) from any
+            element. The memory requirement is thus of the order of
+            (Nx+c0*tMax/dx)*(Ny+c0*tMax/dy)*(NzD+c0*tMax/dz) complex
+            numbers, where NzD is the number of z-gridpoints covering the ROI
+            and the detector plane, and the cost per time step is of the
+            order of this number.
+
+            The signals are those of a band limited source, i.e. they are
+            free of the sampling noise of the Poisson integral solvers.
+            Compared to the latter with nearest bin deposition, note that a
+            bin at retarded signal depth tau collects contributions from
+            [tau,tau+dz), hence the corresponding time is (tau+dz/2)/c0.
+            For an equispaced time grid, cos(c0|k|t) is advanced by the
+            Chebyshev recurrence instead of being evaluated at each step.
+        """
+        dx, dy, dz = x[1]-x[0], y[1]-y[0], z[1]-z[0]
+        Nz, Ny, Nx = np.shape(p0xyz)
+        z0, z1 = min(z[0],zD), max(z[-1],zD)
+        if t is None:
+            dMax = np.sqrt((x[-1]-x[0])**2 + (y[-1]-y[0])**2 + (z1-z0)**2)
+            t = np.arange(int(dMax/dz)+2)*dz/c0
+        t = np.asarray(t, dtype=float)
+
+        # PAD ROI TO KEEP PERIODIC IMAGES OUT OF REACH ------------------------
+        L = c0*np.max(np.abs(t))
+        Lx = scipy.fftpack.next_fast_len(Nx + int(np.ceil(L/dx)) + 1)
+        Ly = scipy.fftpack.next_fast_len(Ny + int(np.ceil(L/dy)) + 1)
+        Lz = scipy.fftpack.next_fast_len(int(np.ceil((z1-z0)/dz)) + 1
+                                        + int(np.ceil(L/dz)) + 1)
+
+        # SPECTRUM OF INITIAL STRESS, INVERSE TRANSFORM ALONG z AT zD ---------
+        P = np.fft.rfftn(np.asarray(p0xyz, dtype=float), (Lz,Ly,Lx))
+        kz = 2*np.pi*np.fft.fftfreq(Lz,dz)[:,np.newaxis,np.newaxis]
+        ky = 2*np.pi*np.fft.fftfreq(Ly,dy)[np.newaxis,:,np.newaxis]
+        kx = 2*np.pi*np.fft.rfftfreq(Lx,dx)[np.newaxis,np.newaxis,:]
+        w = c0*np.sqrt(kx*kx + ky*ky + kz*kz)
+        P *= np.exp(1j*kz*(zD-z[0]))/Lz
+        del kx, ky, kz
+
+        # TIME STEPPING -------------------------------------------------------
+        p = np.empty((Ny,Nx,t.size))
+        dt = np.diff(t)
+        if t.size > 2 and np.allclose(dt, dt[0], rtol=1e-10, atol=0.):
+            twoCosW = 2.*np.cos(w*dt[0])
+            Cm, C = None, P*np.cos(w*t[0])
+            for n in range(t.size):
+                p[:,:,n] = np.fft.irfft2(np.sum(C,axis=0), (Ly,Lx))[:Ny,:Nx]
+                if n+1 < t.size:
+                    Cn = P*np.cos(w*t[1]) if Cm is None else twoCosW*C - Cm
+                    Cm, C = C, Cn
+        else:
+            for n in range(t.size):
+                F = np.sum(P*np.cos(w*t[n]), axis=0)
+                p[:,:,n] = np.fft.irfft2(F, (Ly,Lx))[:Ny,:Nx]
+
+        return t, p
+
+# EOF: spectralSolver.py
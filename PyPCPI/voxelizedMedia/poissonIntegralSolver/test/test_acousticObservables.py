@@ -9,11 +9,26 @@ __license__   = "3-clause BSD License"
 __contact__   = "oliver.melchert@hot.uni-hannover.de"
 
 import sys; sys.path.append("../")
+import os
+import tempfile
 import unittest
 import scipy
 import scipy.special as scs
 import numpy as np
+import acousticObservables
 from acousticObservables import pressure, velocityPotential
+from acousticObservables import pressure_LambertianDetector, sparseSource
+from acousticObservables import pruneSource, pressure_multiResponse
+import detectorResponse as dr
+import detectorAperture as da
+from acousticObservables import pressure_finiteAperture
+from acousticObservables import pressure_octree, sourcePyramid
+from acousticObservables import pressure_streaming, labelSource
+from poissonIntegral_cython import cartPoissonIntegralSolver_aperture
+from poissonIntegral_cython import cartPoissonIntegralSolver_sparse
+from poissonIntegral_cython import cartPoissonIntegralSolver
+from poissonIntegral_cython import cartPoissonIntegralSolver_Lambertian
+from poissonIntegral_cython import cartPoissonIntegralSolver_parallel
 
 class AcousticObservablesTestCase(unittest.TestCase):
         """Unit test for acousticObservables.py.
@@ -95,6 +110,391 @@ class AcousticObservablesTestCase(unittest.TestCase):
 
             self.assertAlmostEqual(ratio, 1.,1)
 
+        def test_linearTimeBinning(self):
+            """Perform unit test for linear binning on a custom time grid.
+
+            The pressure signal for the medium with constant absorbed 
+            volumetric energy density is computed on a coarse voxel grid. 
+            As in test_pressureSignalGeneration, the signal in the range 
+            unaffected by the ROI boundaries has to match the initial stress,
+            but with linear binning the fluctuations about the mean are 
+            considerably smaller than for nearest-bin deposition. Further, 
+            linear binning has to conserve the Poisson integral summed over 
+            all bins.
+            """
+            c0  = 1500.
+            rho = 1000.
+            G   = 0.138
+            x, y, z = self.x[::4], self.y[::4], self.z[::4]
+            Wxyz = self.Wxyz[::4,::4,::4]
+            xD  = 0.5*(x[x.size/2]+x[1+x.size/2])
+            yD  = 0.5*(y[y.size/2]+y[1+y.size/2])
+            zD  = 0.5*(z[z.size/2]+z[1+z.size/2])
+            dz = z[1]-z[0]
+            t = np.arange(0.,2*z[-1],dz)/c0
+
+            tL,pL = pressure(((x,y,z),G*Wxyz),(xD,yD,zD),c0,t)
+            tN,pN = pressure(((x,y,z),G*Wxyz),(xD,yD,zD),c0)
+
+            self.assertTrue(np.allclose(tL,t))
+            iMin, iMax = 2, 20
+            ratio = np.mean(pL[iMin:iMax])/G/10**6
+            self.assertAlmostEqual(ratio, 1.,2)
+            self.assertLess(np.std(pL[iMin:iMax]), 0.5*np.std(pN[iMin:iMax]))
+
+            tN,IN = velocityPotential(((x,y,z),Wxyz),(xD,yD,zD),(G,rho,c0))
+            tL,IL = velocityPotential(((x,y,z),Wxyz),(xD,yD,zD),(G,rho,c0),t)
+            self.assertAlmostEqual(IL.sum()*(tL[1]-tL[0])/(IN.sum()*(tN[1]-tN[0])),
+                                   1.,10)
+
+        def test_inputPrecisionAndLayout(self):
+            """Perform unit test for single precision and Fortran ordered input.
+
+            The solvers accept the initial acoustic stress profile in single
+            or double precision and in C or Fortran memory order without 
+            copying. The results have to agree with those for C ordered 
+            double precision input up to single precision round-off. 
+            The array passed to pressure has to reach the solver as is, and
+            since the solver takes it as typed memoryview, which rejects 
+            other dtypes instead of converting them, a read-only strided 
+            single precision view is used in place.
+            """
+            x, y, z = self.x[::4], self.y[::4], self.z[::4]
+            zz,yy,xx = np.meshgrid(z,y,x,indexing='ij')
+            Wxyz = np.exp(-(xx+yy+zz)/z[-1])*10**6
+            det  = (0.4*x[-1],0.5*y[-1],-0.6*z[-1])
+
+            t,p = pressure(((x,y,z),Wxyz),det,1500.)
+            for W in [Wxyz.astype(np.float32), np.asfortranarray(Wxyz),
+                      np.asfortranarray(Wxyz,dtype=np.float32)]:
+                tW,pW = pressure(((x,y,z),W),det,1500.)
+                self.assertTrue(np.array_equal(t,tW))
+                self.assertTrue(np.allclose(p,pW,atol=1e-5*np.abs(p).max()))
+
+            W = np.zeros((2*z.size,y.size,3*x.size),dtype=np.float32)[::2,:,::3]
+            W[:] = Wxyz
+            W.flags.writeable = False
+            received = []
+            def spy(x, y, z, p0xyz, *args):
+                received.append(p0xyz)
+                return cartPoissonIntegralSolver(x, y, z, p0xyz, *args)
+            acousticObservables.cartPoissonIntegralSolver = spy
+            try:
+                tW,pW = pressure(((x,y,z),W),det,1500.)
+            finally:
+                acousticObservables.cartPoissonIntegralSolver = \
+                        cartPoissonIntegralSolver
+            self.assertTrue(received[0] is W)
+            self.assertTrue(np.allclose(p,pW,atol=1e-5*np.abs(p).max()))
+            self.assertRaises(TypeError, cartPoissonIntegralSolver,
+                              x, y, z, W.astype(np.float16), *det)
+
+
+        def test_parallelSolver(self):
+            """Perform unit test for multi-threaded Poisson integral solver.
+
+            For a single thread the tiled multi-threaded solver has to 
+            reproduce the serial solvers bit-for-bit, for a pointlike and a
+            Lambertian detector. For several threads the order in which 
+            contributions are summed changes, hence the results are compared
+            up to round-off. The y-extent is chosen so that the last tile of
+            rows is incomplete. Combinations not covered by the 
+            multi-threaded solver and a number of threads below one have to
+            raise ValueError, and a source 
+            with small support has to be integrated by the multi-threaded 
+            solver instead of the sparse one.
+            """
+            x, y, z = self.x[::4], self.y[::3], self.z[::4]
+            zz,yy,xx = np.meshgrid(z,y,x,indexing='ij')
+            Wxyz = np.exp(-(xx+yy+zz)/z[-1])*10**6
+            det  = (0.4*x[-1],0.5*y[-1],-0.6*z[-1])
+
+            for lam, solver in [(0, cartPoissonIntegralSolver),
+                                (1, cartPoissonIntegralSolver_Lambertian)]:
+                tS,IS = solver(x, y, z, Wxyz, *det)
+                t1,I1 = cartPoissonIntegralSolver_parallel(x, y, z, Wxyz, 
+                                *det, lambertian=lam, nthreads=1)
+                t4,I4 = cartPoissonIntegralSolver_parallel(x, y, z, Wxyz, 
+                                *det, lambertian=lam, nthreads=4)
+
+                self.assertTrue(np.array_equal(tS,t1))
+                self.assertTrue(np.array_equal(IS,I1))
+                self.assertTrue(np.allclose(IS,I4,rtol=1e-12,atol=0.))
+
+            t,p   = pressure(((x,y,z),Wxyz),det,1500.)
+            t,pP  = pressure(((x,y,z),Wxyz),det,1500.,nthreads=4)
+            self.assertTrue(np.allclose(p,pP,atol=1e-10*np.abs(p).max()))
+
+            for kwargs in [dict(t=t), dict(sparse=True), dict(epsL1=1e-3)]:
+                self.assertRaises(ValueError, pressure, ((x,y,z),Wxyz), det,
+                                  1500., nthreads=4, **kwargs)
+            self.assertRaises(ValueError, pressure, ((x,y,z),
+                              sparseSource(Wxyz)), det, 1500., nthreads=4)
+            for nthreads in [0, -2]:
+                self.assertRaises(ValueError, pressure, ((x,y,z),Wxyz), det,
+                                  1500., nthreads=nthreads)
+                self.assertRaises(ValueError, velocityPotential, ((x,y,z),
+                                  Wxyz), det, (1.,1.,1500.), nthreads=nthreads)
+
+            Wxyz[:,:,1:] = 0.
+            nthreadsUsed = []
+            def spy(*args, **kwargs):
+                nthreadsUsed.append(args[-1])
+                return cartPoissonIntegralSolver_parallel(*args, **kwargs)
+            acousticObservables.cartPoissonIntegralSolver_parallel = spy
+            try:
+                t,pP  = pressure(((x,y,z),Wxyz),det,1500.,nthreads=4)
+            finally:
+                acousticObservables.cartPoissonIntegralSolver_parallel = \
+                        cartPoissonIntegralSolver_parallel
+            t,p   = pressure(((x,y,z),Wxyz),det,1500.)
+            self.assertEqual(nthreadsUsed, [4])
+            self.assertTrue(np.allclose(p,pP,atol=1e-10*np.abs(p).max()))
+
+
+        def test_sparseSupport(self):
+            """Perform unit test for source with small support.
+
+            For a spherical absorber in an otherwise empty ROI, the sparse
+            solver, selected explicitly, automatically, or by passing the
+            coordinate list returned by sparseSource, has to reproduce the 
+            dense solver up to round-off for both detector types and both 
+            binning schemes.
+            """
+            x, y, z = self.x[::2], self.y[::2], self.z[::2]
+            zz,yy,xx = np.meshgrid(z,y,x,indexing='ij')
+            rr = (xx-0.5*x[-1])**2+(yy-0.4*y[-1])**2+(zz-0.3*z[-1])**2
+            Wxyz = np.where(rr<(0.1*z[-1])**2, 10**6, 0.)
+            det  = (0.45*(x[0]+x[1]),0.55*(y[0]+y[1]),-0.5*z[-1])
+            src  = sparseSource(Wxyz)
+
+            self.assertEqual(src[1].size, np.count_nonzero(Wxyz))
+            for obs in [pressure, pressure_LambertianDetector]:
+                for tt in [None, np.linspace(0.,4e-6,300)]:
+                    t,p = obs(((x,y,z),Wxyz),det,1500.,tt,sparse=False)
+                    for W, sparse in [(Wxyz,True),(Wxyz,None),(src,None)]:
+                        tS,pS = obs(((x,y,z),W),det,1500.,tt,sparse=sparse)
+                        self.assertTrue(np.allclose(t,tS,rtol=1e-12,atol=0.))
+                        self.assertTrue(np.allclose(p,pS,atol=1e-10*np.abs(p).max()))
+
+
+        def test_errorBoundedPruning(self):
+            """Perform unit test for pruning of small contributions.
+
+            For a source with long tails, discarding the voxels with the
+            smallest contributions has to keep the relative L1 error of the
+            Poisson integral below the reported bound, which in turn must not
+            exceed the requested one, for both detector types.
+            """
+            x, y, z = self.x[::4], self.y[::4], self.z[::4]
+            zz,yy,xx = np.meshgrid(z,y,x,indexing='ij')
+            rr = (xx-0.5*x[-1])**2+(yy-0.5*y[-1])**2
+            Wxyz = np.exp(-rr/(0.05*x[-1])**2-zz/(0.1*z[-1]))*10**6
+            det  = (0.45*(x[0]+x[1]),0.55*(y[0]+y[1]),-0.5*z[-1])
+            (kIdx,jIdx,iIdx), W = sparseSource(Wxyz)
+
+            for lam in [0, 1]:
+                tau, I = cartPoissonIntegralSolver_sparse(x, y, z, 
+                            kIdx, jIdx, iIdx, W, *det, lambertian=lam)
+                for epsL1 in [1e-6, 1e-3]:
+                    src, epsAchieved, nKept = pruneSource(((x,y,z),Wxyz),
+                                                det, epsL1, lam)
+                    (kP,jP,iP), WP = src
+                    tau, IP = cartPoissonIntegralSolver_sparse(x, y, z, 
+                                kP, jP, iP, WP, *det, lambertian=lam)
+                    self.assertTrue(epsAchieved <= epsL1)
+                    self.assertTrue(0 < nKept < Wxyz.size)
+                    self.assertEqual(nKept, WP.size)
+                    self.assertTrue(np.sum(np.abs(I-IP)) <= (1.+1e-8)*epsAchieved*np.sum(I))
+
+            for obs, lam in [(pressure,0), (pressure_LambertianDetector,1)]:
+                src = pruneSource(((x,y,z),Wxyz),det,1e-3,lam)[0]
+                t, p = obs(((x,y,z),src),det,1500.)
+                tP, pP = obs(((x,y,z),Wxyz),det,1500.,epsL1=1e-3)
+                self.assertTrue(np.array_equal(t,tP))
+                self.assertTrue(np.array_equal(p,pP))
+            src = pruneSource(((x,y,z),Wxyz),det,1e-3)[0]
+            t, phi = velocityPotential(((x,y,z),src),det,(1.,1.,1500.))
+            tP, phiP = velocityPotential(((x,y,z),Wxyz),det,(1.,1.,1500.),
+                                         epsL1=1e-3)
+            self.assertTrue(np.array_equal(phi,phiP))
+
+
+        def test_multiResponse(self):
+            """Perform unit test for fused detector response models.
+
+            In a single pass, the signals for a pointlike and a Lambertian 
+            detector have to agree with those of the dedicated solvers up to
+            round-off, and a tabulated cos^2 directivity has to reproduce the 
+            cos^n model for n=2 up to the interpolation error.
+            """
+            x, y, z = self.x[::4], self.y[::4], self.z[::4]
+            zz,yy,xx = np.meshgrid(z,y,x,indexing='ij')
+            Wxyz = np.exp(-(xx+yy+zz)/z[-1])*10**6
+            det  = (0.4*x[-1],0.5*y[-1],-0.6*z[-1])
+            theta = np.linspace(0.,0.5*np.pi,181)
+            models = [dr.point(), dr.lambertian(), dr.cosn(2), 
+                      dr.tabulated(theta,np.cos(theta)**2)]
+
+            t, p = pressure_multiResponse(((x,y,z),Wxyz),det,models,1500.)
+            tP,pP = pressure(((x,y,z),Wxyz),det,1500.)
+            tL,pL = pressure_LambertianDetector(((x,y,z),Wxyz),det,1500.)
+
+            self.assertEqual(p.shape,(4,t.size))
+            self.assertTrue(np.array_equal(t,tP))
+            self.assertTrue(np.allclose(p[0],pP,atol=1e-10*np.abs(pP).max()))
+            self.assertTrue(np.allclose(p[1],pL,atol=1e-10*np.abs(pL).max()))
+            self.assertTrue(np.allclose(p[2],p[3],atol=1e-4*np.abs(p[2]).max()))
+
+
+        def test_finiteAperture(self):
+            """Perform unit test for detectors with finite aperture.
+
+            The quadrature rules of the apertures have to be normalized and 
+            reproduce the second moment of a disc. If the finest rule is used
+            for all voxels, the aperture averaged Poisson integral of a 
+            rectangular detector has to agree with the weighted sum of the 
+            Poisson integrals for pointlike detectors at the sub-points. A 
+            disc much smaller than the z-spacing is integrated with its 
+            center point only and has to reproduce the pointlike detector.
+            """
+            x, y, z = self.x[::4], self.y[::4], self.z[::4]
+            zz,yy,xx = np.meshgrid(z,y,x,indexing='ij')
+            Wxyz = np.exp(-(xx+yy+zz)/z[-1])*10**6
+            xD, yD, zD  = 0.45*(x[0]+x[1]), 0.55*(y[0]+y[1]), -0.5*z[-1]
+            R = 0.2*x[-1]
+
+            for ap in [da.disc(R), da.ring(0.5*R,R), da.rectangle(R,0.5*R)]:
+                us, vs, ws, start, m = da.quadratureLevels(ap, 8)
+                for r in range(start.size-1):
+                    self.assertAlmostEqual(np.sum(ws[start[r]:start[r+1]]), 1.)
+            us, vs, ws = da.subPoints(da.disc(R), 64, 64)
+            self.assertTrue(abs(np.sum(ws*us*us)/(0.25*R*R)-1.) < 1e-2)
+
+            ap = da.rectangle(R,0.5*R)
+            us, vs, ws, start, m = da.quadratureLevels(ap, 4)
+            tau, I = cartPoissonIntegralSolver_aperture(x, y, z, Wxyz, xD, yD, 
+                        zD, us, vs, ws, start, m, 0.5*R, 0.25*R, 0, 0., 1)
+            n0 = start[-2]
+            ISum = np.zeros(tau.size)
+            for u, v, w in zip(us[n0:], vs[n0:], ws[n0:]):
+                tauP, IP = cartPoissonIntegralSolver_Lambertian(x, y, z, 
+                                Wxyz, xD+u, yD+v, zD)
+                ISum[:IP.size] += w*IP
+            self.assertTrue(np.allclose(I,ISum,rtol=1e-12,atol=1e-12*I.max()))
+
+            t, p = pressure(((x,y,z),Wxyz),(xD,yD,zD),1500.)
+            tA, pA = pressure_finiteAperture(((x,y,z),Wxyz),(xD,yD,zD),
+                                da.disc(1e-3*(z[1]-z[0])),1500.)
+            self.assertTrue(np.allclose(t,tA[:t.size],rtol=1e-12,atol=0.))
+            self.assertTrue(np.allclose(p[:-1],pA[:t.size-1],atol=1e-10*np.abs(p).max()))
+
+
+        def test_hierarchicalAggregation(self):
+            """Perform unit test for hierarchical aggregation of voxels.
+
+            The top level of the pyramid of block sums has to hold the sums 
+            over the z-slices. Without aggregation (eps=0), the signals for 
+            pointlike and Lambertian detectors have to agree with those of 
+            the voxel solvers up to round-off. For a distant detector, the 
+            signal obtained with eps=0.5 has to agree with that of the voxel
+            solver within 1 percent relative L2 error.
+            """
+            x, y, z = self.x[::4]-self.x[100], self.y[:-3:4]-self.y[100], self.z[::8]
+            zz,yy,xx = np.meshgrid(z,y,x,indexing='ij')
+            Wxyz = np.exp(-zz/z[-1]-(xx*xx+yy*yy)/(0.25*x[-1])**2)*10**6
+            S, off, shape = sourcePyramid(Wxyz)
+            self.assertTrue(np.array_equal(shape[-1],[z.size,1,1]))
+            self.assertTrue(np.allclose(S[off[-1]:],np.sum(Wxyz,axis=(1,2)),
+                                rtol=1e-12,atol=0.))
+
+            for zD in [-0.1*z[-1], 1.5*z[-1]]:
+                det = (0.3*x[-1],0.1*y[-1],zD)
+                t, p = pressure(((x,y,z),Wxyz),det,1500.)
+                tO, pO = pressure_octree(((x,y,z),(S,off,shape)),det,0.,1500.)
+                self.assertTrue(np.array_equal(t,tO))
+                self.assertTrue(np.allclose(p,pO,rtol=0.,atol=1e-10*np.abs(p).max()))
+                t, p = pressure_LambertianDetector(((x,y,z),Wxyz),det,1500.)
+                tO, pO = pressure_octree(((x,y,z),Wxyz),det,0.,1500.,True)
+                self.assertTrue(np.allclose(p,pO,rtol=0.,atol=1e-10*np.abs(p).max()))
+
+            det = (0.,0.,-20*z[-1])
+            t, p = pressure(((x,y,z),Wxyz),det,1500.)
+            tO, pO = pressure_octree(((x,y,z),(S,off,shape)),det,0.5,1500.)
+            self.assertTrue(np.linalg.norm(p-pO) < 1e-2*np.linalg.norm(p))
+
+
+        def test_streamingSolver(self):
+            """Perform unit test for the slab-wise streaming solver.
+
+            For a memory-mapped ROI read in slabs and for a generator of 
+            float32 slabs of varying thickness, the signals have to agree 
+            with those of the in-memory solvers. Slabs that do not cover 
+            the ROI have to be rejected.
+            """
+            x, y, z = self.x[::4], self.y[::4], self.z[::4]
+            zz,yy,xx = np.meshgrid(z,y,x,indexing='ij')
+            Wxyz = np.exp(-(xx+yy+zz)/z[-1])*10**6
+            det = (0.4*x[-1],0.7*y[-1],-0.5*z[-1])
+
+            fd, fName = tempfile.mkstemp(suffix='.bin')
+            os.close(fd)
+            try:
+                Wxyz.tofile(fName)
+                W = np.memmap(fName, dtype=float, mode='r', shape=Wxyz.shape)
+                t, p = pressure(((x,y,z),Wxyz),det,1500.)
+                tS, pS = pressure_streaming(((x,y,z),W),det,1500.,nSlab=7)
+                self.assertTrue(np.array_equal(t,tS))
+                self.assertTrue(np.array_equal(p,pS))
+                del W
+            finally:
+                os.remove(fName)
+
+            W32 = Wxyz.astype(np.float32)
+            t, p = pressure_LambertianDetector(((x,y,z),W32),det,1500.)
+            bounds = [0, 1, 10, 11, 30, z.size]
+            slabs = (W32[k0:k1] for k0, k1 in zip(bounds[:-1],bounds[1:]))
+            tS, pS = pressure_streaming(((x,y,z),slabs),det,1500.,True)
+            self.assertTrue(np.array_equal(p,pS))
+
+            self.assertRaises(ValueError, pressure_streaming, 
+                              ((x,y,z),iter([Wxyz[:10]])), det, 1500.)
+            self.assertRaises(ValueError, pressure_streaming, 
+                              ((x,y,z),iter([Wxyz,Wxyz[:1]])), det, 1500.)
+
+
+        def test_labelSource(self):
+            """Perform unit test for sources given by label volumes.
+
+            For a read-only int8 label volume, a float32 fluence volume and 
+            a per-label table, the pressure signals (with and without linear
+            time binning) and the velocity potential have to agree with 
+            those for the initial acoustic stress computed beforehand.
+            """
+            x, y, z = self.x[::4], self.y[::4], self.z[::4]
+            rng = np.random.RandomState(3)
+            labels = rng.randint(0,4,size=(z.size,y.size,x.size)).astype(np.int8)
+            labels.flags.writeable = False
+            F = rng.rand(z.size,y.size,x.size).astype(np.float32)
+            table = np.array([0., 1.5, 24., 230.])*10**6
+            p0 = F*table[labels]
+            det = (0.4*x[-1],0.7*y[-1],-0.5*z[-1])
+            src = labelSource(labels,F,table)
+            self.assertTrue(np.all(np.isnan(src[2][table.size:])))
+
+            t, p = pressure(((x,y,z),p0),det,1500.)
+            tL, pL = pressure(((x,y,z),(labels,F,table)),det,1500.)
+            self.assertTrue(np.array_equal(t,tL) and np.array_equal(p,pL))
+            t, p = pressure_LambertianDetector(((x,y,z),p0),det,1500.,t[::2])
+            tL, pL = pressure_LambertianDetector(((x,y,z),src),det,1500.,t)
+            self.assertTrue(np.array_equal(p,pL))
+            t, phi = velocityPotential(((x,y,z),p0),det,(0.2,1.,1500.))
+            tL, phiL = velocityPotential(((x,y,z),src),det,(0.2,1.,1500.))
+            self.assertTrue(np.array_equal(phi,phiL))
+
+            self.assertRaises(ValueError, pressure, ((x,y,z),src), det, 1500., 
+                              None, None, 1e-2)
+
 
 if __name__ == "__main__":
         unittest.main()
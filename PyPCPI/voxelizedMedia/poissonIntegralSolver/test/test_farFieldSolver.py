@@ -0,0 +1,118 @@
+""" FILE: test_farFieldSolver.py
+
+Unittest module for farFieldSolver.py
+"""
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import sys; sys.path.append("../")
+import unittest
+import numpy as np
+from acousticObservables import pressure_LambertianDetector
+import farFieldSolver as ff
+
+class FarFieldSolverTestCase(unittest.TestCase):
+        """Unit test for farFieldSolver.py.
+
+        Implements unit tests comparing far-field projections to the
+        cartesian coordinate based Poisson integral solvers.
+        Inherits from unittest.TestCase.
+        """
+
+        def setUp(self):
+            """Sets up unit test prerequisits.
+
+            Attributes:
+                x: numpy array containing equidistant x-axis gridpoints.
+                y: numpy array containing equidistant y-axis gridpoints.
+                z: numpy array containing equidistant z-axis gridpoints.
+                Wxyz: numpy array containing absorbed volumetric energy density.
+                (x0,y0,z0): center of detection circle.
+                phi: angular positions of detectors.
+            """
+            self.x = np.linspace(0.,40*20e-6,40,endpoint=False)
+            self.y = np.linspace(0.,36*20e-6,36,endpoint=False)
+            self.z = np.linspace(0.,20*20e-6,20,endpoint=False)
+            self.x0, self.y0, self.z0 = self.x[20], self.y[18], self.z[10]
+            zz,yy,xx = np.meshgrid(self.z,self.y,self.x,indexing='ij')
+            self.Wxyz = np.exp(-((xx-self.x0)**2+(yy-self.y0)**2+
+                                 (zz-self.z0)**2)/2/80e-6**2)*10**6
+            self.Wxyz[self.Wxyz < 1.] = 0.
+            self.phi = np.arange(0.,360.,30.)
+
+
+        def tearDown(self):
+            """Deletes all attributes set by method setUp()."""
+            del self.x
+            del self.y
+            del self.z
+            del self.Wxyz
+
+
+        def test_fresnelSwitch(self):
+            """Perform unit test on the near/far-field switch.
+
+            The Fresnel number has to decrease as 1/R, detectors close to
+            the source have to be treated in the near field, distant ones in
+            the far field, where the near-field signals have to agree with
+            those of the Poisson integral solver, with nearest-bin deposition
+            if no time grid is given and linear binning otherwise.
+            """
+            x, y, z = self.x, self.y, self.z
+            src, ctr = ((x,y,z),self.Wxyz), (self.x0,self.y0,self.z0)
+            F1 = ff.fresnelNumber(src,ctr,1e-3,self.phi)
+            F2 = ff.fresnelNumber(src,ctr,1e-1,self.phi)
+            self.assertTrue(np.allclose(F1,100.*F2,rtol=1e-12,atol=0.))
+
+            t, p, farField = ff.sinogram(src,ctr,1e-3,self.phi,1500.,lambertian=True)
+            self.assertEqual(p.shape,(self.phi.size,t.size))
+            self.assertFalse(np.any(farField))
+            cp, sp = np.cos(np.radians(self.phi[2])), np.sin(np.radians(self.phi[2]))
+            det = (self.x0+1e-3*cp,self.y0,self.z0-1e-3*sp)
+            tS, pS = pressure_LambertianDetector(src,det,1500.)
+            self.assertTrue(np.allclose(tS[:t.size],t,rtol=1e-12,atol=0.))
+            self.assertTrue(np.array_equal(pS[:t.size],p[2]))
+            self.assertFalse(np.any(pS[t.size:]))
+
+            t = t[::2]
+            t, p, farField = ff.sinogram(src,ctr,1e-3,self.phi,1500.,t,True)
+            tS, pS = pressure_LambertianDetector(src,det,1500.,t)
+            self.assertTrue(np.array_equal(pS,p[2]))
+
+            t, p, farField = ff.sinogram(src,ctr,1e-1,self.phi,1500.)
+            self.assertTrue(np.all(farField))
+
+
+        def test_farFieldProjection(self):
+            """Perform unit test comparing far- and near-field signals.
+
+            For a Fresnel number below 0.1, the far-field signals of
+            pointlike and Lambertian detectors have to agree with the
+            near-field signals within 0.2 percent relative L2 error, for 
+            nearest-bin deposition and for linear binning. The radius is 
+            not a multiple of the z-spacing, since otherwise the distances
+            to the voxels at phi=0 lie on bin edges, where nearest-bin 
+            deposition is decided by round-off.
+            """
+            x, y, z = self.x, self.y, self.z
+            src, ctr = ((x,y,z),self.Wxyz), (self.x0,self.y0,self.z0)
+            R = 2e-1 + 0.37*(z[1]-z[0])
+            self.assertTrue(np.all(ff.fresnelNumber(src,ctr,R,self.phi) < 0.1))
+            t = ff.sinogram(src,ctr,R,self.phi[:1],1500.)[0]
+            for lam, tt in [(False,None), (True,None), (False,t), (True,t)]:
+                tF, pF, fF = ff.sinogram(src,ctr,R,self.phi,1500.,tt,lam,np.inf)
+                tN, pN, fN = ff.sinogram(src,ctr,R,self.phi,1500.,tt,lam,0.)
+                self.assertTrue(np.all(fF) and not np.any(fN))
+                self.assertTrue(np.array_equal(tF,tN))
+                for m in range(self.phi.size):
+                    self.assertLess(np.linalg.norm(pF[m]-pN[m]),
+                                    2e-3*np.linalg.norm(pN[m]))
+
+
+if __name__ == "__main__":
+        unittest.main()
+
+# EOF: test_farFieldSolver.py
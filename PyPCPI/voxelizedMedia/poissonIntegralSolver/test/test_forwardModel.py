@@ -0,0 +1,98 @@
+""" FILE: test_forwardModel.py
+
+Unittest module for forwardModel.py
+"""
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import sys; sys.path.append("../")
+import os
+import tempfile
+import unittest
+import numpy as np
+from poissonIntegral_cython import cartPoissonIntegralSolver
+from poissonIntegral_cython import cartPoissonIntegralSolver_Lambertian
+import forwardModel as fm
+
+class ForwardModelTestCase(unittest.TestCase):
+        """Unit test for forwardModel.py.
+
+        Implements unit tests comparing the sparse forward model to the
+        cartesian coordinate based Poisson integral solvers.
+        Inherits from unittest.TestCase.
+        """
+
+        def setUp(self):
+            """Sets up unit test prerequisits.
+
+            Attributes:
+                x: numpy array containing equidistant x-axis gridpoints.
+                y: numpy array containing equidistant y-axis gridpoints.
+                z: numpy array containing equidistant z-axis gridpoints.
+                Wxyz: numpy array containing absorbed volumetric energy density.
+                (xD,yD,zD): detector position.
+            """
+            N      = 24
+            self.x = np.linspace(0.,N*20e-6,N,endpoint=False)
+            self.y = np.linspace(0.,N*20e-6,N,endpoint=False)
+            self.z = np.linspace(0.,N*20e-6,N,endpoint=False)
+            zz,yy,xx = np.meshgrid(self.z,self.y,self.x,indexing='ij')
+            self.Wxyz = np.exp(-(xx+yy+zz)/self.z[-1])*10**6
+            self.xD, self.yD, self.zD = 0.4*self.x[-1], 0.5*self.y[-1], -0.6*self.z[-1]
+
+
+        def tearDown(self):
+            """Deletes all attributes set by method setUp()."""
+            del self.x
+            del self.y
+            del self.z
+            del self.Wxyz
+
+
+        def test_forwardModel_matchesSolver(self):
+            """Perform unit test comparing forward model and solvers.
+
+            The sparse matrix-vector product has to reproduce the Poisson
+            integral of the solvers for a pointlike and a Lambertian
+            detector up to round-off. A stack of initial stress profiles is
+            processed as multiple right hand sides.
+            """
+            grid = (self.x,self.y,self.z)
+            det  = (self.xD,self.yD,self.zD)
+            for lambertian, solver in [(False, cartPoissonIntegralSolver),
+                               (True, cartPoissonIntegralSolver_Lambertian)]:
+                tau, I = solver(self.x, self.y, self.z, self.Wxyz, *det)
+                M = fm.forwardModelMatrix(grid, det, lambertian)
+                tauM, IM = fm.applyForwardModel(M, self.Wxyz)
+
+                self.assertTrue(np.allclose(tau,tauM))
+                self.assertTrue(np.allclose(I,IM,rtol=1e-12,atol=0.))
+
+            tauM, IS = fm.applyForwardModel(M, [self.Wxyz, 2*self.Wxyz])
+            self.assertEqual(IS.shape,(2,tau.size))
+            self.assertTrue(np.allclose(IS[1],2*I,rtol=1e-12,atol=0.))
+
+
+        def test_forwardModel_readWrite(self):
+            """Perform unit test on storing and loading the forward model."""
+            tau, A = fm.forwardModelMatrix((self.x,self.y,self.z),
+                                (self.xD,self.yD,self.zD))
+            fd, fName = tempfile.mkstemp(suffix='.npz')
+            os.close(fd)
+            try:
+                fm.writeForwardModel(tau, A, fName)
+                tauR, AR = fm.readForwardModel(fName)
+            finally:
+                os.remove(fName)
+
+            self.assertTrue(np.array_equal(tau,tauR))
+            self.assertEqual((A-AR).nnz, 0)
+
+
+if __name__ == "__main__":
+        unittest.main()
+
+# EOF: test_forwardModel.py
@@ -0,0 +1,93 @@
+""" FILE: test_latticeSolver.py
+
+Unittest module for latticeSolver.py
+"""
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import sys; sys.path.append("../")
+import unittest
+import numpy as np
+from poissonIntegral_cython import cartPoissonIntegralSolver
+from poissonIntegral_cython import cartPoissonIntegralSolver_Lambertian
+from acousticObservables import pressure
+import latticeSolver as ls
+
+class LatticeSolverTestCase(unittest.TestCase):
+        """Unit test for latticeSolver.py.
+
+        Implements unit tests comparing the FFT based lattice solver to the
+        cartesian coordinate based Poisson integral solvers.
+        Inherits from unittest.TestCase.
+        """
+
+        def setUp(self):
+            """Sets up unit test prerequisits.
+
+            Attributes:
+                x: numpy array containing equidistant x-axis gridpoints.
+                y: numpy array containing equidistant y-axis gridpoints.
+                z: numpy array containing equidistant z-axis gridpoints.
+                Wxyz: numpy array containing absorbed volumetric energy density.
+                (sx,sy): offset of detector lattice.
+            """
+            self.x = np.linspace(0.,24*20e-6,24,endpoint=False)
+            self.y = np.linspace(0.,18*20e-6,18,endpoint=False)
+            self.z = np.linspace(0.,12*20e-6,12,endpoint=False)
+            zz,yy,xx = np.meshgrid(self.z,self.y,self.x,indexing='ij')
+            self.Wxyz = np.exp(-(xx+yy+zz)/self.z[-1])*10**6
+            self.sx, self.sy = 0.3e-6, 0.7e-6
+
+
+        def tearDown(self):
+            """Deletes all attributes set by method setUp()."""
+            del self.x
+            del self.y
+            del self.z
+            del self.Wxyz
+
+
+        def test_latticeSolver_matchesSolver(self):
+            """Perform unit test comparing lattice and point solvers.
+
+            For sample elements of two detector planes, in backward and 
+            forward mode, the Poisson integrals obtained by FFT convolution 
+            have to agree with those of the solvers for pointlike and 
+            Lambertian detectors up to round-off.
+            """
+            x, y, z = self.x, self.y, self.z
+            zD = np.array([-0.5*z[-1], 1.7*z[-1]])
+            for lam, solver in [(False, cartPoissonIntegralSolver),
+                               (True, cartPoissonIntegralSolver_Lambertian)]:
+                tau, I = ls.latticePoissonIntegral(((x,y,z),self.Wxyz),zD,
+                                    (self.sx,self.sy),lam)
+                self.assertEqual(I.shape[:3],(2,y.size,x.size))
+                for c in range(zD.size):
+                    for a, b in [(0,0),(5,11),(23,17),(12,3)]:
+                        tS, IS = solver(x, y, z, self.Wxyz, x[a]+self.sx, 
+                                        y[b]+self.sy, zD[c])
+                        self.assertTrue(np.allclose(tS,tau[:tS.size],rtol=1e-12,atol=0.))
+                        self.assertTrue(np.allclose(IS,I[c,b,a,:tS.size],
+                                        rtol=0.,atol=1e-10*IS.max()))
+                        self.assertTrue(np.all(np.abs(I[c,b,a,tS.size:])<1e-10*IS.max()))
+
+
+        def test_pressureLattice(self):
+            """Perform unit test on pressure signals for a single plane."""
+            x, y, z = self.x, self.y, self.z
+            t, p = ls.pressure_lattice(((x,y,z),self.Wxyz),-z[-1],
+                                (self.sx,self.sy),1500.)
+            self.assertEqual(p.shape,(y.size,x.size,t.size))
+            tS, pS = pressure(((x,y,z),self.Wxyz),(x[7]+self.sx,y[4]+self.sy,
+                                -z[-1]),1500.)
+            self.assertTrue(np.allclose(pS[:-1],p[4,7,:tS.size-1],
+                                rtol=0.,atol=1e-10*np.abs(pS).max()))
+
+
+if __name__ == "__main__":
+        unittest.main()
+
+# EOF: test_latticeSolver.py
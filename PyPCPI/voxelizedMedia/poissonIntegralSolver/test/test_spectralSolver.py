@@ -0,0 +1,102 @@
+""" FILE: test_spectralSolver.py
+
+Unittest module for spectralSolver.py
+"""
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import sys; sys.path.append("../")
+import unittest
+import numpy as np
+from acousticObservables import pressure
+import spectralSolver as ss
+
+class SpectralSolverTestCase(unittest.TestCase):
+        """Unit test for spectralSolver.py.
+
+        Implements unit tests comparing the k-space solution for planar
+        detector arrays to the analytic solution for a spherical Gaussian
+        source and to the cartesian coordinate based Poisson integral solver.
+        Inherits from unittest.TestCase.
+        """
+
+        def setUp(self):
+            """Sets up unit test prerequisits.
+
+            Attributes:
+                x: numpy array containing equidistant x-axis gridpoints.
+                y: numpy array containing equidistant y-axis gridpoints.
+                z: numpy array containing equidistant z-axis gridpoints.
+                Wxyz: numpy array containing absorbed volumetric energy density.
+                (xc,yc,zc): center of Gaussian source.
+                s: width of Gaussian source.
+                c0: sonic velocity.
+            """
+            self.x = np.linspace(0.,32*20e-6,32,endpoint=False)
+            self.y = np.linspace(0.,32*20e-6,32,endpoint=False)
+            self.z = np.linspace(0.,32*20e-6,32,endpoint=False)
+            self.xc, self.yc, self.zc = self.x[15], self.y[17], self.z[16]
+            self.s = 60e-6
+            self.c0 = 1500.
+            zz,yy,xx = np.meshgrid(self.z,self.y,self.x,indexing='ij')
+            self.Wxyz = np.exp(-((xx-self.xc)**2+(yy-self.yc)**2+
+                                 (zz-self.zc)**2)/2/self.s**2)
+
+
+        def tearDown(self):
+            """Deletes all attributes set by method setUp()."""
+            del self.x
+            del self.y
+            del self.z
+            del self.Wxyz
+
+
+        def test_planarArray_matchesReference(self):
+            """Perform unit test comparing k-space and reference solutions.
+
+            For sample elements of detector planes in backward and forward
+            mode, the signals have to agree with the analytic solution
+            p(r,t) = [f(r-c0t)+f(r+c0t)]/(2r), f(q) = q exp(-q^2/2s^2), up to
+            the error due to the truncation of the source by the ROI. The
+            ROI extends at least 4.6 widths from the center and the Gaussian
+            is resolved by 3 gridpoints per width, hence truncation and 
+            aliasing errors are of the order of 1e-5. The Poisson integral 
+            solver has to agree with both up to its sampling error, which 
+            amounts to about 5 percent for this grid.
+            """
+            x, y, z, s, c0 = self.x, self.y, self.z, self.s, self.c0
+            f = lambda q: q*np.exp(-q*q/2/s/s)
+            for zD in [-10*(z[1]-z[0]), z[-1]+10*(z[1]-z[0])]:
+                t, p = ss.pressure_planarArray(((x,y,z),self.Wxyz),zD,c0)
+                self.assertEqual(p.shape,(y.size,x.size,t.size))
+                for a, b in [(15,17),(0,0),(31,5),(8,24)]:
+                    r = np.sqrt((x[a]-self.xc)**2+(y[b]-self.yc)**2+(zD-self.zc)**2)
+                    pA = (f(r-c0*t)+f(r+c0*t))/(2*r)
+                    tS, pS = pressure(((x,y,z),self.Wxyz),(x[a],y[b],zD),c0,t=t)
+                    nA = np.linalg.norm(pA)
+                    self.assertLess(np.linalg.norm(p[b,a]-pA)/nA, 1e-5)
+                    self.assertLess(np.linalg.norm(pS-pA)/nA, 0.06)
+
+
+        def test_planarArray_recurrence(self):
+            """Perform unit test on time stepping for equispaced time grids.
+
+            Signals obtained by the Chebyshev recurrence have to agree with
+            those obtained by direct evaluation for a permuted time grid.
+            """
+            x, y, z, c0 = self.x, self.y, self.z, self.c0
+            t = np.linspace(0.,40*(z[1]-z[0])/c0,41)
+            t1, p1 = ss.pressure_planarArray(((x,y,z),self.Wxyz),-z[-1],c0,t)
+            perm = np.random.RandomState(1).permutation(t.size)
+            t2, p2 = ss.pressure_planarArray(((x,y,z),self.Wxyz),-z[-1],c0,t[perm])
+            self.assertTrue(np.allclose(p1[:,:,perm],p2,rtol=0.,
+                                atol=1e-10*np.abs(p1).max()))
+
+
+if __name__ == "__main__":
+        unittest.main()
+
+# EOF: test_spectralSolver.py
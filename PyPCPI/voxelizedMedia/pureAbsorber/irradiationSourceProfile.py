@@ -64,6 +64,28 @@ def Gaussian((x, y), (x0,y0)=(0.5,0.5), sigma=0.1):
         return np.exp(-( (xx-x0)**2 + (yy-y0)**2)/(2*sigma*sigma)) 
 
 
+def ellipticGaussian((x, y), (x0,y0)=(0.5,0.5), (sx,sy)=(0.1,0.05), phi=0.):
+        """Elliptic Gaussian irradiation source profile.
+
+        Args:
+            x (numpy array, ndim=1): Equispaced 1D grid for x coordinate.
+            y (numpy array, ndim=1): Equispaced 1D grid for y coordinate.
+            (x0,y0) (2-tuple, floats): x and y center location of Gaussian
+                profile (default: (x0,y0)=(0.5,0.5)).
+            (sx,sy) (2-tuple, floats): widths of Gaussian profile along its
+                principal axes, see Gaussian (default: (sx,sy)=(0.1,0.05)).
+            phi (float): angle between first principal axis and x-axis in 
+                degrees (default: phi=0.).
+
+        Returns:
+            isp (numpy array, ndim=2) 2D elliptic Gaussian beam profile. 
+        """
+        yy,xx = np.meshgrid(y, x, indexing='ij')
+        c, s = np.cos(np.radians(phi)), np.sin(np.radians(phi))
+        u, v = c*(xx-x0) + s*(yy-y0), -s*(xx-x0) + c*(yy-y0)
+        return np.exp(-u*u/(2*sx*sx) - v*v/(2*sy*sy)) 
+
+
 def topHat((x, y), (x0,y0)=(0.5,0.5), a=0.1):
         """Top-hat irradiation source profile
 
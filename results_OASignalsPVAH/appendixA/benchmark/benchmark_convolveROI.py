@@ -0,0 +1,111 @@
+''' FILE: benchmark_convolveROI.py
+
+Script to benchmark the polar convolution by the fast Hankel transform on
+a logarithmic grid (FFTLogPlan) against that by the trapezoidal rule
+(HankelPlan) on fine radial grids, as obtained from MCML, with mesh-points
+r = (i+0.5)*dr on [0, 4) cm for i = 0, ..., Nr-1.
+
+The pencil beam responses are Gaussians of 1/e-widths in [0.05, 0.5] cm at
+Nz depths, convolved with a Gaussian beam profile of 1/e2-width 0.6 cm, for
+which the convolution is known in closed form. For each number of radial
+mesh-points Nr, the wall-clock time of convolveROI, including the set up
+of the plan, the speedup, the maximal deviation from the exact convolution
+relative to its maximum at each depth, and the peak resident set size of a
+process running the convolution are listed for both transforms.
+
+Usage:
+    python benchmark_convolveROI.py [Nz [nRepetitions]]
+
+AUTHOR: O. Melchert
+'''
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import sys; sys.path.append('../../../')
+import time
+import resource
+import multiprocessing
+import numpy as np
+import PyPCPI.cache
+import PyPCPI.layeredMedia.polarConvolution.irradiationSourceProfile as isp
+from PyPCPI.layeredMedia.polarConvolution.convolveRadiallySymmetricFunctions import convolveROI
+
+
+def modelResponse(Nr, Nz):
+        """Model pencil beam response and its exact convolution
+
+        Args:
+            Nr (int): number of radial mesh-points.
+            Nz (int): number of depths.
+
+        Returns:
+            (r,z) (2-tuple, numpy array, ndim=1): 1D coordinate grids.
+            grz (numpy array, ndim=2): Gaussian pencil beam responses.
+            fr (GaussianProfile): beam profile.
+            Wrz (numpy array, ndim=2): exact convolution of grz and fr.
+        """
+        r = (np.arange(Nr)+0.5)*4./Nr
+        z = np.arange(Nz)
+        a = np.linspace(0.05, 0.5, Nz)
+        grz = np.exp(-r[:,np.newaxis]**2/(2*a*a))
+        fr = isp.GaussianProfile(0., 0.6)
+        b2 = 0.25*0.6**2
+        Wrz = (fr.norm()*2*np.pi*a*a*b2/(a*a+b2)*
+               np.exp(-r[:,np.newaxis]**2/(2*(a*a+b2))))
+        return (r,z), grz, fr, Wrz
+
+
+def timeit(solver, nRep):
+        """Return minimal wall-clock time of nRep calls and solver output."""
+        tMin = None
+        for n in range(nRep):
+            t0 = time.time()
+            res = solver()
+            dt = time.time() - t0
+            tMin = dt if tMin is None else min(tMin, dt)
+        return tMin, res
+
+
+def relDev(W, Wx):
+        """Maximal deviation of W from Wx relative to the maximum of Wx at
+        each depth."""
+        return np.max(np.abs(W-Wx).max(axis=0)/np.abs(Wx).max(axis=0))
+
+
+def _run(queue, Nr, Nz, method, nRep):
+        (r,z), grz, fr, Wx = modelResponse(Nr, Nz)
+        t, W = timeit(lambda: convolveROI(r,z,grz,fr,method=method), nRep)
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.
+        queue.put((t, relDev(W, Wx), rss))
+
+
+def benchmark(Nr, Nz, method, nRep):
+        """Time, deviation and peak RSS [MB] of convolveROI in a separate
+        process, so that peak RSS refers to a single method."""
+        queue = multiprocessing.Queue()
+        proc = multiprocessing.Process(target=_run,
+                                       args=(queue, Nr, Nz, method, nRep))
+        proc.start()
+        res = queue.get()
+        proc.join()
+        return res
+
+
+def main():
+        Nz = int(sys.argv[1]) if len(sys.argv)>1 else 500
+        nRep = int(sys.argv[2]) if len(sys.argv)>2 else 3
+        PyPCPI.cache.disable()
+
+        print "# Nz = ", Nz
+        print "# (Nr) (time trapz) (time fftlog) (speedup) " \
+              "(dev. trapz) (dev. fftlog) (RSS trapz) (RSS fftlog)"
+        for Nr in [500, 1000, 2000, 4000, 8000]:
+            tT, devT, rssT = benchmark(Nr, Nz, 'trapz', nRep)
+            tL, devL, rssL = benchmark(Nr, Nz, 'fftlog', nRep)
+            print Nr, tT, tL, tT/tL, devT, devL, rssT, rssL
+
+main()
+# EOF: benchmark_convolveROI.py
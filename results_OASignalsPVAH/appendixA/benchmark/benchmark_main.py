@@ -0,0 +1,113 @@
+''' FILE: benchmark_main.py
+
+Script to benchmark the cartesian Poisson integral solvers on the source 
+volume of appendixA/useCase3, i.e. on a ROI of 750x750x50 voxels. 
+
+For the pointlike and the Lambertian detector, the wall-clock time of the 
+serial solver, of the tiled multi-threaded solver for an increasing number
+of threads and of the hierarchical solver for different opening parameters
+is listed together with the speedup relative to the serial solver and the 
+maximal deviation of the resulting Poisson integrals. The pyramid of block
+sums used by the hierarchical solver is set up once, outside the timing.
+
+Usage:
+    python benchmark_main.py [nThreadsMax [nRepetitions]]
+
+AUTHOR: O. Melchert
+'''
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import sys; sys.path.append('../../../')
+import time
+import multiprocessing
+import numpy as np
+import PyPCPI.voxelizedMedia.pureAbsorber.sourceVolume as sv 
+import PyPCPI.voxelizedMedia.pureAbsorber.irradiationSourceProfile as isp 
+from PyPCPI.voxelizedMedia.poissonIntegralSolver.poissonIntegral_cython import (
+        cartPoissonIntegralSolver, cartPoissonIntegralSolver_Lambertian, 
+        cartPoissonIntegralSolver_parallel, cartPoissonIntegralSolver_octree)
+from PyPCPI.voxelizedMedia.poissonIntegralSolver.acousticObservables import sourcePyramid
+
+
+def modelSourceVolume():
+        """Model source volume
+
+        Source volume of appendixA/useCase3 for a flat-top beam profile with
+        W0 = 2.4 cm.
+
+        Returns:
+            (x,y,z) (3-tuple, numpy array, ndim=1): 1D coordinate grids.
+            (x0,y0,z0) (2-tuple, floats): x and y center position of ISP 
+                symmetry axis and z position of absorbing layer.
+            roi (numpy array, ndim=3): computational region of interest 
+                containing absorbed energy density in units (J/m^3).
+        """
+        # SOURCE VOLUME PARS --------------------------------------------------
+        xMax, Nx = 10., 750     # bdry, meshpts: x-axis
+        yMax, Ny = 10., 750     # bdry, meshpts: y-axis
+        zMax, Nz = 1., 50       # bdry, meshpts: z-axis
+
+        # ABSORBING LAYER PARS ------------------------------------------------
+        z0, dz = 0.0, 0.9       # start, width of absorbing layer        
+        mu = 1.65               # absorption coeffiecient
+
+        # FLAT TOP BEAM PROFILE  PARS -----------------------------------------
+        x0, y0 = xMax/2, yMax/2 # x,y pos of symmetry axis
+        ftr = 4.
+        fta = 2.4/(1.+1./ftr)   # radius, radius/edge width ratio
+        f0 = 1. # incident fluence (J/cm^2)
+
+        # SET OPTICAL PROPERTIES OF SOURCE VOLUME -----------------------------
+        (x,y,z), roi = sv.setROI((xMax,yMax,zMax), (Nx,Ny,Nz))
+        sv.addAbsorbingLayer(((x,y,z),roi),z0,dz,mu)
+        iProf = f0*isp.flatTop((x, y), (x0, y0), fta, ftr)
+        sv.propagateBeam((z, roi), iProf) 
+        return (x,y,z), (x0,y0,z0), roi*10**6
+
+
+def timeit(solver, nRep):
+        """Return minimal wall-clock time of nRep calls and solver output."""
+        tMin = None
+        for n in range(nRep):
+            t0 = time.time()
+            res = solver()
+            dt = time.time() - t0
+            tMin = dt if tMin is None else min(tMin, dt)
+        return tMin, res
+
+
+def main():
+        nThreadsMax = int(sys.argv[1]) if len(sys.argv)>1 else multiprocessing.cpu_count()
+        nRep = int(sys.argv[2]) if len(sys.argv)>2 else 3
+        zD = 3.150    # detector location 
+
+        (x,y,z), (x0,y0,z0), Wxyz = modelSourceVolume()
+        det = (x0+0.5, y0, zD)
+        S, off, shape = sourcePyramid(Wxyz)
+
+        print "# ROI: (Nz,Ny,Nx) = ", Wxyz.shape
+        print "# (detector) (solver) (nthreads) (time in s) (speedup) (max rel. dev.)"
+        for lam, serial in [(0, cartPoissonIntegralSolver), 
+                            (1, cartPoissonIntegralSolver_Lambertian)]:
+            name = 'lambertian' if lam else 'pointlike'
+            tS, (tau, IS) = timeit(lambda: serial(x,y,z,Wxyz,*det), nRep)
+            print name, 'serial', 1, tS, 1.0, 0.0
+            nthreads = 1
+            while nthreads <= nThreadsMax:
+                tP, (tau, IP) = timeit(lambda: cartPoissonIntegralSolver_parallel(
+                                x,y,z,Wxyz,*det,lambertian=lam,nthreads=nthreads), nRep)
+                print name, 'parallel', nthreads, tP, tS/tP, \
+                      np.max(np.abs(IP-IS))/np.max(np.abs(IS))
+                nthreads *= 2
+            for eps in [0.1, 0.25, 0.5]:
+                tO, (tau, IO) = timeit(lambda: cartPoissonIntegralSolver_octree(
+                                x,y,z,S,off,shape,*det,eps=eps,lambertian=lam), nRep)
+                print name, 'octree(eps=%g)'%eps, 1, tO, tS/tO, \
+                      np.max(np.abs(IO-IS))/np.max(np.abs(IS))
+
+main()
+# EOF: benchmark_main.py
@@ -0,0 +1,115 @@
+''' FILE: benchmark_sinogram.py
+
+Script to benchmark the far-field projection solver for sinograms against
+the cartesian Poisson integral solver on a source volume for which the
+near/far-field switch selects the far-field approximation, i.e. a small
+weakly absorbing sphere (diameter 0.5 mm) on a ROI of 100x100x100 voxels,
+observed by detectors on a circle of radius R = 5 cm about its center.
+
+For pointlike and Lambertian detectors, the number of detectors treated in
+the far field, the wall-clock time of the sinogram with the default switch
+and with all detectors treated in the near field, the speedup, and the
+maximal relative L2 deviation of the signals are listed. For the pointlike
+detector, the maximal relative L2 deviations of the near- and far-field
+signals from the analytic solution p0*(R-c0*t)/(2R), |R-c0*t|<a, of a
+uniform sphere of radius a are listed in addition. Since the sphere has a
+sharp boundary, the latter are dominated by its voxelization. The signals
+are binned linearly onto a shared time grid.
+
+Usage:
+    python benchmark_sinogram.py [nDetectors [nRepetitions]]
+
+AUTHOR: O. Melchert
+'''
+
+__authors__   = "O. Melchert"
+__copyright__ = "(c) 2016, Hannover Centre for Optical Technologies"
+__license__   = "3-clause BSD License"
+__contact__   = "oliver.melchert@hot.uni-hannover.de"
+
+import sys; sys.path.append('../../../')
+import time
+import numpy as np
+import PyPCPI.voxelizedMedia.pureAbsorber.sourceVolume as sv
+import PyPCPI.voxelizedMedia.pureAbsorber.irradiationSourceProfile as isp
+import PyPCPI.voxelizedMedia.poissonIntegralSolver.farFieldSolver as ff
+
+
+def modelSourceVolume():
+        """Model source volume
+
+        Weakly absorbing sphere irradiated by a plane wave, so that the
+        absorbed energy density is uniform within the sphere up to 0.5
+        percent.
+
+        Returns:
+            (x,y,z) (3-tuple, numpy array, ndim=1): 1D coordinate grids.
+            (x0,y0,z0) (3-tuple, floats): center of absorbing sphere.
+            (a,mu) (2-tuple, floats): radius and absorption coefficient of
+                the sphere.
+            roi (numpy array, ndim=3): computational region of interest
+                containing absorbed energy density in units (J/m^3).
+        """
+        # SOURCE VOLUME PARS --------------------------------------------------
+        xMax, Nx = 0.1, 100     # bdry, meshpts: x-axis
+        yMax, Ny = 0.1, 100     # bdry, meshpts: y-axis
+        zMax, Nz = 0.1, 100     # bdry, meshpts: z-axis
+
+        # ABSORBING SPHERE PARS -----------------------------------------------
+        x0, y0, z0 = 0.05, 0.05, 0.05   # center of sphere
+        a, mu = 0.025, 0.1              # radius, absorption coefficient
+
+        # SET OPTICAL PROPERTIES OF SOURCE VOLUME -----------------------------
+        (x,y,z), roi = sv.setROI((xMax,yMax,zMax), (Nx,Ny,Nz))
+        sv.addAbsorbingSphere(((x,y,z),roi),(x0,y0,z0),a,mu)
+        sv.propagateBeam((z, roi), isp.planeWave((x, y)))
+        return (x,y,z), (x0,y0,z0), (a,mu), roi*10**6
+
+
+def timeit(solver, nRep):
+        """Return minimal wall-clock time of nRep calls and solver output."""
+        tMin = None
+        for n in range(nRep):
+            t0 = time.time()
+            res = solver()
+            dt = time.time() - t0
+            tMin = dt if tMin is None else min(tMin, dt)
+        return tMin, res
+
+
+def relDev(p, pRef):
+        """Maximal relative L2 deviation of signals p from pRef."""
+        return np.max(np.sqrt(np.sum((p-pRef)**2,axis=-1)/np.sum(pRef**2,axis=-1)))
+
+
+def main():
+        nDet = int(sys.argv[1]) if len(sys.argv)>1 else 72
+        nRep = int(sys.argv[2]) if len(sys.argv)>2 else 3
+        c0 = 150000.  # speed of sound (cm/s)
+        # RADIUS OF DETECTION CIRCLE (cm), NOT A MULTIPLE OF THE Z-SPACING
+        R = 5.00037
+
+        (x,y,z), ctr, (a,mu), Wxyz = modelSourceVolume()
+        src = ((x,y,z), Wxyz)
+        phi = np.linspace(0.,360.,nDet,endpoint=False)
+        F = ff.fresnelNumber(src,ctr,R,phi)
+        t = ff.sinogram(src,ctr,R,phi[:1],c0)[0]
+        q = R - c0*t
+        pA = np.where(np.abs(q) < a, mu*10**6*q/(2*R), 0.)
+
+        print "# ROI: (Nz,Ny,Nx) = ", Wxyz.shape
+        print "# R = ", R, ", Fresnel numbers in [%g, %g]" % (F.min(), F.max())
+        print "# (detector) (far-field detectors) (time far) (time near) " \
+              "(speedup) (dev. far/near) (dev. near/analytic) (dev. far/analytic)"
+        for lam in [False, True]:
+            name = 'lambertian' if lam else 'pointlike'
+            tN, (t, pN, fN) = timeit(lambda: ff.sinogram(src,ctr,R,phi,c0,
+                                t,lam,0.), nRep)
+            tF, (t, pF, fF) = timeit(lambda: ff.sinogram(src,ctr,R,phi,c0,
+                                t,lam), nRep)
+            devA = '- -' if lam else '%g %g' % (relDev(pN,pA), relDev(pF,pA))
+            print name, "%d/%d" % (np.count_nonzero(fF), nDet), tF, tN, \
+                  tN/tF, relDev(pF,pN), devA
+
+main()
+# EOF: benchmark_sinogram.py